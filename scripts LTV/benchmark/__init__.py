@@ -0,0 +1,3 @@
+# ======================================================
+#  OBL DIGITAL — Benchmarks del ETL y del dashboard (ver bench_ltv.py)
+# ======================================================
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# ======================================================
+#  OBL DIGITAL — Benchmark del ETL y del dashboard sobre datos sintéticos
+#
+#  Desde "scripts LTV":
+#    python -m benchmark.bench_ltv --escalas 10000 100000 1000000 --salida bench.json
+#    python -m benchmark.bench_ltv --escalas 100000 --comparar bench.json
+#  La base es un SQLite local en --dir: nunca toca Railway.
+# ======================================================
+
+ESCALAS = [10_000, 100_000, 1_000_000]
+UMBRAL_REGRESION = 1.25  # nuevo / base por encima de esto se informa como regresión
+MINIMO_MS = 5.0          # tiempos menores son ruido de medición
+CALLBACKS = [
+    "actualizar_opciones",
+    "actualizar_totales",
+    "actualizar_grafico_affiliate",
+    "actualizar_grafico_country",
+    "actualizar_grafico_bar",
+    "actualizar_tabla",
+]
+
+
+def configurar_entorno(directorio):
+    """Antes de importar los módulos del repo: leen DB_URL y rutas al importarse."""
+    os.environ["DB_URL"] = f"sqlite:///{os.path.join(directorio, 'bench_ltv.db')}"
+    os.environ["LTV_SNAPSHOT_PATH"] = os.path.join(directorio, "GENERAL_LTV_snapshot.arrow")
+    os.environ["LTV_REFRESH_SECONDS"] = "0"
+    os.environ["LTV_CACHE_BACKEND"] = "memoria"
+
+
+@contextmanager
+def cronometrar(tiempos, etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[etapa] = tiempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+@contextmanager
+def instrumentar(modulo, nombres, tiempos):
+    """Reemplaza temporalmente funciones del módulo por versiones cronometradas."""
+    originales = {nombre: getattr(modulo, nombre) for nombre in nombres}
+
+    def envolver(nombre, funcion):
+        def cronometrada(*args, **kwargs):
+            with cronometrar(tiempos, nombre):
+                return funcion(*args, **kwargs)
+        return cronometrada
+
+    for nombre, funcion in originales.items():
+        setattr(modulo, nombre, envolver(nombre, funcion))
+    try:
+        yield
+    finally:
+        for nombre, funcion in originales.items():
+            setattr(modulo, nombre, funcion)
+
+
+def medir_etl(etl, df_raw, directorio):
+    """
+    Etapas de limpiar_general_ltv (clasificar, dedupe + orden, tipar) y de
+    guardar_y_cargar_mysql (CSV, carga SQL atómica, snapshot) en segundos.
+    """
+    tiempos = {}
+    with instrumentar(etl, ["clasificar_filas", "tipar_columnas"], tiempos):
+        with cronometrar(tiempos, "limpiar_general_ltv"):
+            df_final = etl.limpiar_general_ltv(df_raw)
+    tiempos["dedupe_y_orden"] = (
+        tiempos["limpiar_general_ltv"] - tiempos["clasificar_filas"] - tiempos["tipar_columnas"]
+    )
+
+    mercado = etl.definir_mercado(
+        "general_ltv_paraguay", "GENERAL_LTV_PGY_CLEAN",
+        csv=os.path.join(directorio, "GENERAL_LTV_preview.csv"),
+        snapshot=os.path.join(directorio, "GENERAL_LTV_etl.arrow"),
+        marca_agua=os.path.join(directorio, "ltv_watermark_PGY.json"),
+    )
+    with instrumentar(etl, ["cargar_mysql", "escribir_snapshot"], tiempos):
+        with cronometrar(tiempos, "guardar_y_cargar_mysql"):
+            cargada = etl.guardar_y_cargar_mysql(df_final, mercado)
+    if not cargada:
+        raise RuntimeError("La carga en SQLite falló: ver el log del ETL.")
+    tiempos["csv"] = (
+        tiempos["guardar_y_cargar_mysql"] - tiempos["cargar_mysql"] - tiempos["escribir_snapshot"]
+    )
+    return df_final, {k: round(v, 4) for k, v in tiempos.items()}
+
+
+def escenarios(ds):
+    """Filtros fijos (mismos valores en todas las corridas con la misma semilla)."""
+    inicio, fin = ds.fecha_min, ds.fecha_max
+    ultimo_mes = fin - pd.Timedelta(days=30)
+    return {
+        "sin_filtros": (inicio, fin, [], [], []),
+        "ultimo_mes": (ultimo_mes, fin, [], [], []),
+        "un_pais": (inicio, fin, [], [], ["Paraguay"]),
+        "cinco_afiliados": (inicio, fin, [f"Aff {i:03d}" for i in range(5)], [], []),
+        "combinado": (ultimo_mes, fin, [f"Aff {i:03d}" for i in range(0, 300, 7)], ["Meta", "Google"],
+                      ["Paraguay", "Peru", "Mexico"]),
+        "sin_resultados": (inicio, fin, ["Afiliado Inexistente"], [], []),
+    }
+
+
+def medir_dashboard(app, repeticiones):
+    """
+    Por escenario y callback: ms en frío (caches vacías, como el primer request
+    con esos filtros), ms en caliente (mejor de N) y bytes de la respuesta.
+    """
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict, to_json
+
+    # actualizar_tabla consulta ctx.triggered_prop_ids: se simula un cambio de filtro
+    context_value.set(AttributeDict(triggered_inputs=[{"prop_id": "filtro-fecha.start_date", "value": None}]))
+    ds = app.datos.actual()
+    argumentos_tabla = (0, app.TABLA_PAGE_SIZE, [], "")
+
+    resultados = {}
+    for nombre, filtros in escenarios(ds).items():
+        # Cambiar de versión y volver purga las caches: el primer callback paga el agregado
+        app.cache.usar_version(None)
+        app.cache_detalle.usar_version(None)
+        app.cache.usar_version(ds.huella)
+        app.cache_detalle.usar_version(ds.huella)
+
+        resultados[nombre] = {}
+        for callback in CALLBACKS:
+            funcion = getattr(app, callback)
+            args = filtros + argumentos_tabla if callback == "actualizar_tabla" else filtros
+            inicio = time.perf_counter()
+            salida = funcion(*args)
+            frio = time.perf_counter() - inicio
+
+            caliente = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                funcion(*args)
+                caliente.append(time.perf_counter() - inicio)
+            resultados[nombre][callback] = {
+                "frio_ms": round(frio * 1000, 3),
+                "caliente_ms": round(min(caliente) * 1000, 3),
+                "bytes": len(to_json(salida)),
+            }
+    return resultados
+
+
+def medir_escala(filas, semilla, directorio, repeticiones):
+    import generar_ltv_master_PGY as etl
+    from snapshot_ltv import SNAPSHOT_PATH, escribir_snapshot, senal_tabla
+    from benchmark.generador_raw import agregar_source, generar_raw
+
+    print(f"\n===> Escala {filas:,} filas")
+    inicio = time.perf_counter()
+    df_raw = generar_raw(filas, semilla)
+    segundos_generar = time.perf_counter() - inicio
+
+    df_final, etapas_etl = medir_etl(etl, df_raw, directorio)
+    del df_raw
+
+    # El dashboard lee el snapshot (con source, como la tabla de producción) sellado con la tabla cargada
+    escribir_snapshot(agregar_source(df_final, semilla), SNAPSHOT_PATH, senal_db=senal_tabla("GENERAL_LTV_PGY_CLEAN"))
+    filas_limpias = len(df_final)
+    del df_final
+
+    # La primera importación ya carga el dataset; se mide siempre la recarga para comparar escalas
+    import dashboard_LTV_app as app
+    inicio = time.perf_counter()
+    app.datos.recargar()
+    segundos_dataset = time.perf_counter() - inicio
+
+    return {
+        "filas_raw": filas,
+        "filas_limpias": filas_limpias,
+        "generar_s": round(segundos_generar, 4),
+        "etl_s": etapas_etl,
+        "carga_dataset_s": round(segundos_dataset, 4),
+        "dashboard": medir_dashboard(app, repeticiones),
+    }
+
+
+def _metricas(resultado, prefijo=""):
+    """Aplana el JSON de una escala a {ruta: valor} (tiempos y bytes, sin conteos de filas)."""
+    planas = {}
+    for clave, valor in resultado.items():
+        ruta = f"{prefijo}{clave}"
+        if isinstance(valor, dict):
+            planas.update(_metricas(valor, ruta + "."))
+        elif isinstance(valor, (int, float)) and not clave.startswith("filas"):
+            planas[ruta] = valor
+    return planas
+
+
+def comparar(base, nuevo, umbral=UMBRAL_REGRESION, minimo_ms=MINIMO_MS):
+    """Métricas que empeoraron más que el umbral (ignora tiempos por debajo de minimo_ms)."""
+    regresiones = []
+    for escala, resultado in nuevo["escalas"].items():
+        if escala not in base["escalas"]:
+            continue
+        antes = _metricas(base["escalas"][escala])
+        for ruta, valor in _metricas(resultado).items():
+            previo = antes.get(ruta)
+            if previo is None:
+                continue
+            en_segundos = ruta.endswith("_s") or ".etl_s." in ruta or ruta.startswith("etl_s.")
+            if previo <= 0 or (previo * 1000 if en_segundos else previo) < minimo_ms:
+                continue
+            if valor / previo > umbral:
+                regresiones.append((escala, ruta, previo, valor, valor / previo))
+    return regresiones
+
+
+def version_git():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del ETL y del dashboard LTV sobre datos sintéticos")
+    parser.add_argument("--escalas", type=int, nargs="+", default=ESCALAS,
+                        help="Filas crudas a generar (10k a 10M).")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=5, help="Llamadas en caliente por callback.")
+    parser.add_argument("--dir", help="Directorio de trabajo (SQLite, CSV, snapshot); por defecto uno temporal.")
+    parser.add_argument("--salida", default="bench_ltv.json", help="JSON con los resultados.")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para detectar regresiones.")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION)
+    parser.add_argument("--minimo-ms", type=float, default=MINIMO_MS)
+    args = parser.parse_args()
+
+    directorio = args.dir or tempfile.mkdtemp(prefix="bench_ltv_")
+    os.makedirs(directorio, exist_ok=True)
+    configurar_entorno(directorio)
+
+    resultados = {
+        "generado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": version_git(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "maquina": {"sistema": platform.platform(), "cpus": os.cpu_count()},
+        "semilla": args.semilla,
+        "escalas": {},
+    }
+    for filas in args.escalas:
+        resultados["escalas"][str(filas)] = medir_escala(filas, args.semilla, directorio, args.repeticiones)
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados guardados: {args.salida}")
+
+    for escala, r in resultados["escalas"].items():
+        etl_s = r["etl_s"]
+        print(f"   {int(escala):>12,} filas: limpiar {etl_s['limpiar_general_ltv']:.2f}s, "
+              f"carga {etl_s['guardar_y_cargar_mysql']:.2f}s, dataset {r['carga_dataset_s']:.2f}s, "
+              f"sin filtros {sum(c['frio_ms'] for c in r['dashboard']['sin_filtros'].values()):.1f} ms")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(base, resultados, args.umbral, args.minimo_ms)
+        for escala, ruta, previo, valor, ratio in regresiones:
+            print(f"   ❌ {escala}: {ruta} {previo} -> {valor} (x{ratio:.2f})")
+        print(f"{'⚠️' if regresiones else '✅'} {len(regresiones)} regresión(es) contra {args.comparar}")
+        raise SystemExit(1 if regresiones else 0)
@@ -0,0 +1,199 @@
+import argparse
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from benchmark.bench_ltv import configurar_entorno, medir_etl
+
+# ======================================================
+#  OBL DIGITAL — Prueba de carga local: muchos navegadores abren el mismo link a la vez
+#
+#  Desde "scripts LTV":
+#    python -m benchmark.carga_concurrente --filas 100000 --usuarios 16 --rondas 3
+#    LTV_SINGLE_FLIGHT=0 python -m benchmark.carga_concurrente ...   (sin coalescer)
+#    python -m benchmark.carga_concurrente --url http://127.0.0.1:8000  (p. ej. gunicorn ya levantado)
+#  Sin --url levanta la app en un servidor local con hilos, sobre un SQLite en --dir.
+# ======================================================
+
+CODIFICACIONES = ["identity", "gzip", "br"]
+
+
+def valores_layout(nodo, valores=None):
+    """{(id, propiedad): valor} de todos los componentes con id del layout serializado."""
+    valores = {} if valores is None else valores
+    if isinstance(nodo, list):
+        for hijo in nodo:
+            valores_layout(hijo, valores)
+    elif isinstance(nodo, dict):
+        props = nodo.get("props", {})
+        if "id" in props:
+            for propiedad, valor in props.items():
+                valores[(props["id"], propiedad)] = valor
+        valores_layout(props.get("children"), valores)
+    return valores
+
+
+def _salidas(output):
+    """"a.b" -> {"id": "a", "property": "b"}; "..a.b...c.d.." -> lista (callback con varias salidas)."""
+    def una(texto):
+        id_, propiedad = texto.rsplit(".", 1)
+        return {"id": id_, "property": propiedad}
+
+    if output.startswith(".."):
+        return [una(parte) for parte in output[2:-2].split("...")]
+    return una(output)
+
+
+def cuerpo_callback(dependencia, valores):
+    """Cuerpo del POST a /_dash-update-component como lo arma el navegador en la carga inicial."""
+    def entradas(lista):
+        return [dict(e, value=valores.get((e["id"], e["property"]))) for e in lista]
+
+    return json.dumps({
+        "output": dependencia["output"],
+        "outputs": _salidas(dependencia["output"]),
+        "inputs": entradas(dependencia["inputs"]),
+        "state": entradas(dependencia["state"]),
+        "changedPropIds": [],
+    }).encode("utf-8")
+
+
+def _get_json(url, ruta):
+    destino = urlparse(url)
+    conexion = http.client.HTTPConnection(destino.hostname, destino.port, timeout=60)
+    conexion.request("GET", ruta)
+    respuesta = conexion.getresponse()
+    datos = json.loads(respuesta.read())
+    conexion.close()
+    return datos
+
+
+def pedir(destino, cuerpo, codificacion):
+    """(segundos, bytes del cuerpo tal como viajan, estado)."""
+    conexion = http.client.HTTPConnection(destino.hostname, destino.port, timeout=120)
+    inicio = time.perf_counter()
+    conexion.request("POST", "/_dash-update-component", body=cuerpo, headers={
+        "Content-Type": "application/json", "Accept-Encoding": codificacion,
+    })
+    respuesta = conexion.getresponse()
+    datos = respuesta.read()  # http.client no descomprime: son los bytes en el cable
+    segundos = time.perf_counter() - inicio
+    conexion.close()
+    return segundos, len(datos), respuesta.status
+
+
+def ronda(destino, cuerpos, usuarios, codificacion):
+    """Todos los usuarios arrancan juntos y piden los mismos callbacks (una carga de página cada uno)."""
+    barrera = threading.Barrier(usuarios)
+    medidas = []
+    lock = threading.Lock()
+
+    def usuario():
+        barrera.wait()
+        for cuerpo in cuerpos:
+            medida = pedir(destino, cuerpo, codificacion)
+            with lock:
+                medidas.append(medida)
+
+    hilos = [threading.Thread(target=usuario) for _ in range(usuarios)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return medidas
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def levantar_local(filas, semilla, directorio):
+    """Dataset sintético (si falta) y la app en un servidor werkzeug con hilos en un puerto libre."""
+    configurar_entorno(directorio)
+    from snapshot_ltv import SNAPSHOT_PATH, escribir_snapshot, senal_tabla
+
+    if not os.path.exists(SNAPSHOT_PATH):
+        import generar_ltv_master_PGY as etl
+        from benchmark.generador_raw import agregar_source, generar_raw
+
+        df_final, _ = medir_etl(etl, generar_raw(filas, semilla), directorio)
+        escribir_snapshot(agregar_source(df_final, semilla), SNAPSHOT_PATH,
+                          senal_db=senal_tabla("GENERAL_LTV_PGY_CLEAN"))
+
+    from werkzeug.serving import make_server
+    import dashboard_LTV_app as app
+
+    servidor = make_server("127.0.0.1", 0, app.server, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}", app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga concurrente de callbacks idénticos del dashboard LTV")
+    parser.add_argument("--url", help="Servidor ya levantado; sin --url se levanta uno local.")
+    parser.add_argument("--filas", type=int, default=100_000, help="Filas crudas del dataset sintético local.")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--dir", help="Directorio del SQLite y el snapshot locales; por defecto uno temporal.")
+    parser.add_argument("--usuarios", type=int, default=16, help="Navegadores simultáneos.")
+    parser.add_argument("--rondas", type=int, default=3, help="Cargas simultáneas por codificación.")
+    parser.add_argument("--codificaciones", nargs="+", default=CODIFICACIONES)
+    parser.add_argument("--salida", help="JSON con los resultados.")
+    args = parser.parse_args()
+
+    app = None
+    url = args.url
+    if url is None:
+        directorio = args.dir or tempfile.mkdtemp(prefix="carga_ltv_")
+        os.makedirs(directorio, exist_ok=True)
+        url, app = levantar_local(args.filas, args.semilla, directorio)
+    destino = urlparse(url)
+
+    valores = valores_layout(_get_json(url, "/_dash-layout"))
+    dependencias = [d for d in _get_json(url, "/_dash-dependencies") if not d.get("clientside_function")]
+    fin = pd.to_datetime(valores[("filtro-fecha", "end_date")])
+
+    resultados = {"url": url, "usuarios": args.usuarios, "callbacks": len(dependencias), "codificaciones": {}}
+    desplazamiento = 0
+    for codificacion in args.codificaciones:
+        medidas = []
+        for _ in range(args.rondas):
+            # Otra fecha de fin en cada ronda: el primer request no encuentra nada en cache
+            desplazamiento += 1
+            valores[("filtro-fecha", "end_date")] = (fin - pd.Timedelta(days=desplazamiento)).strftime("%Y-%m-%d")
+            cuerpos = [cuerpo_callback(d, valores) for d in dependencias]
+            medidas += ronda(destino, cuerpos, args.usuarios, codificacion)
+
+        tiempos = [m[0] * 1000 for m in medidas]
+        resultados["codificaciones"][codificacion] = {
+            "requests": len(medidas),
+            "errores": sum(1 for m in medidas if m[2] >= 400),
+            "p50_ms": round(percentil(tiempos, 50), 1),
+            "p99_ms": round(percentil(tiempos, 99), 1),
+            "bytes_por_carga": round(sum(m[1] for m in medidas) / (args.rondas * args.usuarios)),
+        }
+
+    if app is not None:
+        from respuestas_http import CALLBACKS_EN_CURSO, SINGLE_FLIGHT
+        resultados["single_flight"] = SINGLE_FLIGHT
+        resultados["callbacks_coalescidos"] = CALLBACKS_EN_CURSO.coalescidos
+        resultados["cache"] = app.cache.estadisticas()
+
+    print(f"\n===> {args.usuarios} usuarios x {len(dependencias)} callbacks contra {url}")
+    for codificacion, r in resultados["codificaciones"].items():
+        print(f"   {codificacion:>8}: p50 {r['p50_ms']:8.1f} ms | p99 {r['p99_ms']:8.1f} ms | "
+              f"{r['bytes_por_carga']:>9,} bytes por carga | {r['errores']} errores")
+    if app is not None:
+        print(f"   single-flight {'activo' if resultados['single_flight'] else 'apagado'}: "
+              f"{resultados['callbacks_coalescidos']} callbacks coalescidos, cache {resultados['cache']}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2, default=str)
+        print(f"💾 Resultados guardados: {args.salida}")
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# ======================================================
+#  OBL DIGITAL — Datos sintéticos con el layout crudo de general_ltv_paraguay
+# ======================================================
+
+PAISES = ["Argentina", "Colombia", "Costa Rica", "Ecuador", "Mexico", "Peru", "Brazil", "Paraguay"]
+AFILIADOS = [f"aff {i:03d}" for i in range(300)]
+SOURCES = ["Meta", "Google", "Tiktok", "Organic", "Email"]
+
+COLUMNAS_RAW = ["id", "fecha_registro", "pais", "fecha", "afiliado", "usd_total", "count_ftd", "general_ltv"]
+
+# Proporciones aproximadas de la tabla real
+P_ENCABEZADO = 0.05      # fila de país: el afiliado de las filas siguientes hereda ese país
+P_TOTAL_GENERAL = 0.005  # filas "Total General" que el ETL descarta
+P_DUPLICADA = 0.03       # repetición exacta de la fila anterior
+P_FECHA_INVALIDA = 0.002
+
+
+def _miles(enteros: pd.Series, separador: str) -> pd.Series:
+    return enteros.str.replace(r"\B(?=(\d{3})+(?!\d))", separador, regex=True)
+
+
+def montos_mixtos(rng, filas) -> np.ndarray:
+    """
+    Montos como texto en los formatos que aparecen en la tabla:
+    1,234.56 | 1.234,56 | 1234,56 | $ 1234 | 1234.56 | vacío | NULL.
+    """
+    centavos = rng.integers(0, 5_000_000, filas)
+    enteros = pd.Series(centavos // 100).astype(str)
+    decimales = pd.Series(centavos % 100).astype(str).str.zfill(2)
+
+    formatos = [
+        _miles(enteros, ",") + "." + decimales,
+        _miles(enteros, ".") + "," + decimales,
+        enteros + "," + decimales,
+        "$ " + enteros,
+        enteros + "." + decimales,
+    ]
+    eleccion = rng.choice(len(formatos) + 2, filas, p=[0.3, 0.25, 0.15, 0.1, 0.1, 0.05, 0.05])
+    montos = np.full(filas, None, dtype=object)
+    for k, formato in enumerate(formatos):
+        mascara = eleccion == k
+        montos[mascara] = formato.to_numpy(dtype=object)[mascara]
+    montos[eleccion == len(formatos)] = ""
+    return montos
+
+
+def generar_raw(filas: int, semilla=0, inicio="2023-01-01", dias=730) -> pd.DataFrame:
+    """
+    Tabla cruda con el orden de columnas y las rarezas de general_ltv_paraguay:
+    encabezados de país seguidos de filas de afiliado (en la columna pais),
+    montos con separadores mezclados, filas "Total General" y duplicados exactos.
+    Determinista para una misma semilla.
+    """
+    rng = np.random.default_rng(semilla)
+
+    tipo = rng.random(filas)
+    encabezado = tipo < P_ENCABEZADO
+    encabezado[0] = True
+    total_general = ~encabezado & (tipo < P_ENCABEZADO + P_TOTAL_GENERAL)
+
+    pais = np.array(AFILIADOS, dtype=object)[rng.integers(0, len(AFILIADOS), filas)]
+    pais[encabezado] = np.array(PAISES, dtype=object)[rng.integers(0, len(PAISES), encabezado.sum())]
+    pais[total_general] = np.where(rng.random(total_general.sum()) < 0.5, "Total General", "TOTAL GENERAL")
+
+    fechas = pd.Series(pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias, filas), unit="D"))
+    fecha = fechas.dt.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    fecha[rng.random(filas) < P_FECHA_INVALIDA] = "sin fecha"
+
+    ftds = pd.Series(rng.integers(0, 25, filas)).astype(str).to_numpy(dtype=object)
+    ftds[rng.random(filas) < 0.05] = None
+    ltv = pd.Series(rng.random(filas) * 500).round(4).astype(str).to_numpy(dtype=object)
+    ltv[rng.random(filas) < 0.2] = None
+
+    df = pd.DataFrame({
+        "id": np.arange(1, filas + 1),
+        "fecha_registro": "2025-01-01 00:00:00",
+        "pais": pais,
+        "fecha": fecha,
+        "afiliado": montos_mixtos(rng, filas),
+        "usd_total": ftds,
+        "count_ftd": ltv,
+        "general_ltv": None,
+    }, columns=COLUMNAS_RAW)
+
+    # Los encabezados de país no traen montos
+    df.loc[encabezado, ["fecha", "afiliado", "usd_total", "count_ftd"]] = None
+
+    # Duplicados exactos de la fila anterior (salvo el id, como en la tabla)
+    duplicadas = np.flatnonzero(rng.random(filas) < P_DUPLICADA)
+    duplicadas = duplicadas[duplicadas > 0]
+    columnas = COLUMNAS_RAW[1:]
+    df.loc[duplicadas, columnas] = df.loc[duplicadas - 1, columnas].to_numpy()
+    return df
+
+
+def agregar_source(df: pd.DataFrame, semilla=0) -> pd.DataFrame:
+    """La tabla CLEAN que lee el dashboard trae source; el ETL de esta réplica no la genera."""
+    rng = np.random.default_rng(semilla + 1)
+    return df.assign(source=np.array(SOURCES, dtype=object)[rng.integers(0, len(SOURCES), len(df))])
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+# ======================================================
+#  OBL DIGITAL — Cache de resultados del dashboard (por proceso o compartido)
+# ======================================================
+
+CACHE_BACKEND = os.getenv("LTV_CACHE_BACKEND", "memoria")  # "memoria" | "sqlite"
+# Junto a la app y no en el tmp compartido: la cache guarda pickles que los workers vuelven a cargar
+CACHE_PATH = os.getenv(
+    "LTV_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ltv_dashboard_cache.sqlite")
+)
+CACHE_MAX_ITEMS = int(os.getenv("LTV_CACHE_MAX_ITEMS", "256"))
+CACHE_TTL = int(os.getenv("LTV_CACHE_TTL", "900"))
+
+
+def huella_dataset(df: pd.DataFrame) -> str:
+    """Versión del dataset: igual en todos los workers que cargaron los mismos datos."""
+    h = hashlib.sha1()
+    h.update(str(list(df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def _normalizar_fecha(valor):
+    if not valor:
+        return None
+    return pd.to_datetime(valor).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _normalizar_lista(valores):
+    if not valores:
+        return []
+    return sorted({str(v) for v in valores})
+
+
+def normalizar_filtros(start, end, affiliates, sources, countries):
+    """Forma canónica: listas ordenadas y sin duplicados, None y [] equivalentes."""
+    return {
+        "start": _normalizar_fecha(start),
+        "end": _normalizar_fecha(end),
+        "affiliates": _normalizar_lista(affiliates),
+        "sources": _normalizar_lista(sources),
+        "countries": _normalizar_lista(countries),
+    }
+
+
+def clave_cache(version, filtros: dict) -> str:
+    texto = json.dumps([version, filtros], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Una sola ejecución por clave a la vez: quien pide una clave que ya se está
+    calculando espera ese resultado (o su excepción) en lugar de repetir el trabajo.
+    No guarda nada: al terminar, la clave se libera.
+    """
+
+    def __init__(self):
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self.coalescidos = 0
+
+    def ejecutar(self, clave, funcion):
+        with self._lock:
+            vuelo = self._en_curso.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._en_curso[clave] = {"listo": threading.Event()}
+            else:
+                self.coalescidos += 1
+        if not lider:
+            vuelo["listo"].wait()
+            if "error" in vuelo:
+                raise vuelo["error"]
+            return vuelo["valor"]
+
+        try:
+            vuelo["valor"] = funcion()
+            return vuelo["valor"]
+        except BaseException as e:
+            vuelo["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+            vuelo["listo"].set()
+
+
+class _BackendMemoria:
+    """LRU en memoria del proceso, con TTL por entrada."""
+
+    def __init__(self, max_items, ttl):
+        self.max_items, self.ttl = max_items, ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                return None
+            creado, valor = item
+            if time.time() - creado > self.ttl:
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, version, valor):
+        with self._lock:
+            self._datos[clave] = (time.time(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+
+    def purgar(self, version_actual):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class _BackendSQLite:
+    """
+    Cache compartida entre workers de gunicorn en un archivo SQLite (WAL).
+    Los valores se guardan con pickle: el archivo se crea legible y escribible
+    solo por el usuario del proceso (SQLite copia esos permisos a -wal y -shm).
+    """
+
+    def __init__(self, ruta, max_items, ttl):
+        self.ruta, self.max_items, self.ttl = ruta, max_items, ttl
+        os.close(os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600))
+        with self._conectar() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    clave TEXT PRIMARY KEY,
+                    version TEXT,
+                    creado REAL,
+                    usado REAL,
+                    valor BLOB
+                )
+            """)
+
+    @contextmanager
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=10)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def get(self, clave):
+        ahora = time.time()
+        with self._conectar() as con:
+            fila = con.execute(
+                "SELECT valor FROM cache WHERE clave = ? AND creado >= ?", (clave, ahora - self.ttl)
+            ).fetchone()
+            if fila is None:
+                return None
+            con.execute("UPDATE cache SET usado = ? WHERE clave = ?", (ahora, clave))
+        return pickle.loads(fila[0])
+
+    def set(self, clave, version, valor):
+        ahora = time.time()
+        blob = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO cache (clave, version, creado, usado, valor) VALUES (?, ?, ?, ?, ?)",
+                (clave, version, ahora, ahora, blob),
+            )
+            con.execute("DELETE FROM cache WHERE creado < ?", (ahora - self.ttl,))
+            con.execute("""
+                DELETE FROM cache WHERE clave IN (
+                    SELECT clave FROM cache ORDER BY usado DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_items,))
+
+    def purgar(self, version_actual):
+        with self._conectar() as con:
+            con.execute("DELETE FROM cache WHERE version <> ?", (version_actual,))
+
+    def __len__(self):
+        with self._conectar() as con:
+            return con.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class CacheResultados:
+    """
+    Memoiza las salidas de actualizar_dashboard por (versión del dataset, filtros normalizados).
+    Cuando cambia la versión, las entradas anteriores dejan de coincidir y se purgan.
+    Requests concurrentes con la misma clave comparten un único cálculo (SingleFlight).
+    """
+
+    def __init__(self, backend=CACHE_BACKEND, ruta=CACHE_PATH, max_items=CACHE_MAX_ITEMS, ttl=CACHE_TTL):
+        if backend == "sqlite":
+            self._backend = _BackendSQLite(ruta, max_items, ttl)
+        else:
+            self._backend = _BackendMemoria(max_items, ttl)
+        self.backend = backend
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        # Los contadores se exportan como counters de Prometheus: sin incrementos perdidos entre hilos
+        self._lock = threading.Lock()
+        self._en_curso = SingleFlight()
+
+    def usar_version(self, version):
+        """Fija la versión del dataset; si cambió, descarta lo cacheado para versiones viejas."""
+        if version != self.version:
+            self._backend.purgar(version)
+            self.version = version
+
+    def _contar(self, acierto):
+        with self._lock:
+            if acierto:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def obtener_o_calcular(self, filtros: dict, calcular, version=None):
+        """version: la del dataset que usará calcular() (por defecto la vigente en la cache)."""
+        version = self.version if version is None else version
+        clave = clave_cache(version, filtros)
+        valor = self._backend.get(clave)
+        if valor is not None:
+            self._contar(True)
+            return valor
+
+        def calcular_y_guardar():
+            # Otro hilo pudo terminar el mismo cálculo entre el get y este punto
+            valor = self._backend.get(clave)
+            if valor is not None:
+                self._contar(True)
+                return valor
+            self._contar(False)
+            valor = calcular()
+            self._backend.set(clave, version, valor)
+            return valor
+
+        return self._en_curso.ejecutar(clave, calcular_y_guardar)
+
+    @property
+    def coalescidos(self):
+        return self._en_curso.coalescidos
+
+    def estadisticas(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": self.backend,
+            "version": self.version,
+            "hits": hits,
+            "misses": misses,
+            "coalescidos": self.coalescidos,
+            "hit_rate": hits / total if total else 0.0,
+            "entradas": len(self._backend),
+        }
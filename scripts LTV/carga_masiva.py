@@ -0,0 +1,455 @@
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+import pandas as pd
+
+# ======================================================
+#  OBL DIGITAL — Carga masiva atómica (staging + RENAME)
+# ======================================================
+
+COLUMNAS_CLEAN = [
+    ("date", "DATETIME"),
+    ("country", "VARCHAR(100)"),
+    ("affiliate", "VARCHAR(150)"),
+    ("usd_total", "DECIMAL(18,2)"),
+    ("count_ftd", "INT"),
+    ("general_ltv", "DECIMAL(18,4)"),
+]
+
+CLAVES_CLEAN = ["date", "country", "affiliate"]
+
+# Índices para el modo SQL del dashboard: rango de fechas con dimensiones y cada dimensión con fecha.
+# Se omiten las columnas que la tabla no tiene (la réplica de PGY no trae source).
+INDICES_CLEAN = [
+    ["date", "country", "affiliate", "source"],
+    ["country", "date"],
+    ["affiliate", "date"],
+    ["source", "date"],
+]
+
+BATCH_SIZE = 5000
+
+# Rollups materializados junto a la tabla CLEAN (sufijo del nombre por nivel), del más fino al más grueso
+ROLLUPS = {"diario": "_DIARIO", "mensual": "_MENSUAL", "total": "_TOTAL"}
+DIMENSIONES_ROLLUP = ["country", "affiliate", "source"]
+# Sumas de cada nivel: el diario cuenta registros de la tabla, los demás suman las del nivel anterior
+AGREGADOS_ROLLUP = {
+    "diario": "SUM(usd_total), SUM(count_ftd), COUNT(*)",
+    "mensual": "SUM(usd_total), SUM(count_ftd), SUM(filas)",
+    "total": "SUM(usd_total), SUM(count_ftd), SUM(filas)",
+}
+
+
+def es_sqlite(conexion):
+    # Las conexiones del pool SQLAlchemy envuelven la conexión del driver
+    return isinstance(getattr(conexion, "driver_connection", conexion), sqlite3.Connection)
+
+
+def marcador_sql(conexion):
+    """Placeholder del driver para una conexión DB-API o un engine SQLAlchemy."""
+    if hasattr(conexion, "dialect"):
+        return "?" if conexion.dialect.paramstyle == "qmark" else "%s"
+    return "?" if es_sqlite(conexion) else "%s"
+
+
+def _existe_tabla(cursor, conexion, tabla):
+    if es_sqlite(conexion):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,))
+    else:
+        cursor.execute("SHOW TABLES LIKE %s", (tabla,))
+    return cursor.fetchone() is not None
+
+
+def _columna_a_lista(serie: pd.Series, tipo_sql: str):
+    """Convierte una columna completa a valores Python aptos para el driver."""
+    if tipo_sql == "DATETIME":
+        fechas = pd.to_datetime(serie)
+        return fechas.dt.strftime("%Y-%m-%d %H:%M:%S").where(fechas.notna(), None).tolist()
+    if tipo_sql == "INT":
+        return pd.to_numeric(serie, errors="coerce").fillna(0).astype("int64").tolist()
+    if tipo_sql.startswith("DECIMAL"):
+        numeros = pd.to_numeric(serie, errors="coerce").astype(float)
+        return numeros.astype(object).where(numeros.notna(), None).tolist()
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def crear_tabla(cursor, tabla, columnas=COLUMNAS_CLEAN):
+    definicion = ",\n                ".join(f"{nombre} {tipo}" for nombre, tipo in columnas)
+    cursor.execute(f"""
+            CREATE TABLE {tabla} (
+                {definicion}
+            );
+        """)
+
+
+def crear_indices(cursor, tabla, columnas=COLUMNAS_CLEAN, indices=INDICES_CLEAN):
+    """
+    Crea los índices después de la carga (más rápido que mantenerlos fila a fila).
+    El sufijo evita choques de nombre en SQLite, donde los nombres de índice son
+    globales y sobreviven al RENAME de la tabla.
+    """
+    presentes = {nombre for nombre, _ in columnas}
+    sufijo = uuid.uuid4().hex[:8]
+    creados = []
+    for indice in indices:
+        if indice[0] not in presentes:
+            continue
+        columnas_indice = [c for c in indice if c in presentes]
+        if columnas_indice in creados:
+            continue
+        cursor.execute(f"CREATE INDEX ix_{tabla}_{len(creados)}_{sufijo} ON {tabla} ({', '.join(columnas_indice)})")
+        creados.append(columnas_indice)
+    return creados
+
+
+def insertar_por_lotes(cursor, conexion, tabla, df, columnas, tamano_lote):
+    nombres = [nombre for nombre, _ in columnas]
+    valores = [_columna_a_lista(df[nombre], tipo) for nombre, tipo in columnas]
+    filas = list(zip(*valores))
+
+    if es_sqlite(conexion):
+        limite = conexion.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        tamano_lote = max(1, min(tamano_lote, limite // len(nombres)))
+
+    marca = marcador_sql(conexion)
+    fila_sql = "(" + ", ".join([marca] * len(nombres)) + ")"
+    encabezado = f"INSERT INTO {tabla} ({', '.join(nombres)}) VALUES "
+
+    sql_lote_completo = None
+    for inicio in range(0, len(filas), tamano_lote):
+        lote = filas[inicio:inicio + tamano_lote]
+        if len(lote) == tamano_lote:
+            if sql_lote_completo is None:
+                sql_lote_completo = encabezado + ", ".join([fila_sql] * tamano_lote)
+            sql = sql_lote_completo
+        else:
+            sql = encabezado + ", ".join([fila_sql] * len(lote))
+        cursor.execute(sql, [v for fila in lote for v in fila])
+
+
+def _columna_a_tsv(serie: pd.Series, tipo_sql: str) -> pd.Series:
+    """
+    Columna como texto para LOAD DATA con ESCAPED BY '': NULL sin comillas es SQL NULL y
+    todo texto va entre comillas (con "" para la comilla), así "NULL" o "a\\b" llegan literales.
+    """
+    if tipo_sql == "DATETIME":
+        fechas = pd.to_datetime(serie)
+        return fechas.dt.strftime("%Y-%m-%d %H:%M:%S").where(fechas.notna(), "NULL")
+    if tipo_sql == "INT":
+        return pd.to_numeric(serie, errors="coerce").fillna(0).astype("int64").astype(str)
+    if tipo_sql.startswith("DECIMAL"):
+        numeros = pd.to_numeric(serie, errors="coerce").astype(float)
+        return numeros.astype(str).where(numeros.notna(), "NULL")
+    textos = serie.astype(object).where(serie.notna(), None).astype(str)
+    return ('"' + textos.str.replace('"', '""', regex=False) + '"').where(serie.notna(), "NULL")
+
+
+def _cargar_con_load_data(cursor, tabla, df, columnas):
+    """Ruta LOAD DATA LOCAL INFILE (requiere allow_local_infile=True en la conexión)."""
+    nombres = [nombre for nombre, _ in columnas]
+    textos = [_columna_a_tsv(df[nombre], tipo) for nombre, tipo in columnas]
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False, encoding="utf-8", newline="") as tmp:
+        ruta = tmp.name
+    # Literal SQL: las barras invertidas de una ruta Windows serían escapes para MySQL
+    ruta_sql = ruta.replace("\\", "/").replace("'", "''")
+    try:
+        if len(df):
+            filas = textos[0].str.cat([t.to_numpy() for t in textos[1:]], sep="\t")
+            with open(ruta, "w", encoding="utf-8", newline="") as tsv:
+                tsv.writelines(fila + "\n" for fila in filas)
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE '{ruta_sql}'
+            INTO TABLE {tabla}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            ({', '.join(nombres)})
+        """)
+    finally:
+        os.remove(ruta)
+
+
+def _intercambiar_tablas(cursor, conexion, pares):
+    """
+    Publica cada staging como tabla viva, todas en un único paso atómico.
+    pares: lista de (tabla, staging, anterior).
+    """
+    for _, _, anterior in pares:
+        cursor.execute(f"DROP TABLE IF EXISTS {anterior}")
+    renombres = []
+    for tabla, staging, anterior in pares:
+        if _existe_tabla(cursor, conexion, tabla):
+            renombres.append((tabla, anterior))
+        renombres.append((staging, tabla))
+
+    if es_sqlite(conexion):
+        # En SQLite el DDL es transaccional: todos los RENAME se publican en el mismo commit
+        cursor.execute("BEGIN")
+        for origen, destino in renombres:
+            cursor.execute(f"ALTER TABLE {origen} RENAME TO {destino}")
+    else:
+        # Un solo RENAME TABLE de varias tablas es atómico en MySQL
+        cursor.execute("RENAME TABLE " + ", ".join(f"{origen} TO {destino}" for origen, destino in renombres))
+    conexion.commit()
+
+    for _, _, anterior in pares:
+        cursor.execute(f"DROP TABLE IF EXISTS {anterior}")
+    conexion.commit()
+
+
+def cargar_tabla_atomica(conexion, df, tabla, columnas=COLUMNAS_CLEAN,
+                         tamano_lote=BATCH_SIZE, usar_load_data=False, con_rollups=False):
+    """
+    Carga df en una tabla staging y la intercambia con la tabla viva
+    mediante RENAME, de modo que los lectores nunca ven la tabla vacía.
+    df puede ser un DataFrame o un iterable de bloques (modo streaming):
+    si el iterable falla a mitad de camino no hay intercambio.
+    Con con_rollups, los rollups se arman desde el staging y se publican en el
+    mismo RENAME que la tabla; si fallan, se publica solo la tabla.
+    Devuelve un dict con filas, segundos, filas_por_segundo y rollups (filas por nivel).
+    """
+    staging = f"{tabla}_staging"
+    anterior = f"{tabla}_old"
+    inicio = time.perf_counter()
+
+    cursor = conexion.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    crear_tabla(cursor, staging, columnas)
+    conexion.commit()
+
+    filas = 0
+    for bloque in [df] if isinstance(df, pd.DataFrame) else df:
+        if usar_load_data and not es_sqlite(conexion):
+            _cargar_con_load_data(cursor, staging, bloque, columnas)
+        else:
+            insertar_por_lotes(cursor, conexion, staging, bloque, columnas, tamano_lote)
+        conexion.commit()
+        filas += len(bloque)
+
+    inicio_indices = time.perf_counter()
+    indices = crear_indices(cursor, staging, columnas)
+    conexion.commit()
+    print(f"   🔸 {len(indices)} índices creados en {time.perf_counter() - inicio_indices:.2f}s")
+
+    pares = [(tabla, staging, anterior)]
+    filas_rollups = None
+    if con_rollups:
+        try:
+            filas_rollups, pares_rollups = _preparar_rollups(cursor, conexion, tabla, staging)
+            pares += pares_rollups
+        except Exception as e:
+            conexion.rollback()
+            print(f"⚠️ No se pudieron armar los rollups de {tabla}: {e}")
+    _intercambiar_tablas(cursor, conexion, pares)
+    cursor.close()
+
+    segundos = time.perf_counter() - inicio
+    filas_por_segundo = filas / segundos if segundos > 0 else float("inf")
+    print(f"   🔸 {filas} filas cargadas en {tabla} en {segundos:.2f}s ({filas_por_segundo:,.0f} filas/s)")
+    return {"filas": filas, "segundos": segundos, "filas_por_segundo": filas_por_segundo, "rollups": filas_rollups}
+
+
+def upsert_por_claves(conexion, df, tabla, columnas=COLUMNAS_CLEAN, claves=CLAVES_CLEAN,
+                      tamano_lote=BATCH_SIZE):
+    """
+    Reemplaza en la tabla viva las claves (date, country, affiliate) que trae el lote:
+    borra sus filas y las vuelve a insertar junto con las del lote. df ya llega
+    deduplicado contra lo cargado con la regla de la carga completa (texto de fecha,
+    afiliado y monto, ver limpiar_general_ltv): aquí no se descarta ninguna fila.
+    Todo ocurre en una transacción: los lectores ven el estado anterior hasta el commit.
+    """
+    inicio = time.perf_counter()
+    if df.empty:
+        return {"filas": 0, "claves": 0, "reemplazadas": 0, "segundos": 0.0}
+
+    nombres = [nombre for nombre, _ in columnas]
+    marca = marcador_sql(conexion)
+    nuevas = df[nombres].copy()
+    nuevas["date"] = pd.to_datetime(nuevas["date"])
+    claves_lote = nuevas[claves].drop_duplicates()
+
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(
+            f"SELECT {', '.join(nombres)} FROM {tabla} WHERE date BETWEEN {marca} AND {marca}",
+            (
+                nuevas["date"].min().strftime("%Y-%m-%d %H:%M:%S"),
+                nuevas["date"].max().strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+        existentes = pd.DataFrame(cursor.fetchall(), columns=nombres)
+        existentes["date"] = pd.to_datetime(existentes["date"])
+        existentes = existentes.merge(claves_lote, on=claves)
+
+        condicion = " AND ".join(f"{c} = {marca}" for c in claves)
+        cursor.executemany(
+            f"DELETE FROM {tabla} WHERE {condicion}",
+            list(zip(*[_columna_a_lista(claves_lote[c], dict(columnas)[c]) for c in claves])),
+        )
+        insertar_por_lotes(
+            cursor, conexion, tabla, pd.concat([existentes, nuevas], ignore_index=True), columnas, tamano_lote,
+        )
+        conexion.commit()
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    segundos = time.perf_counter() - inicio
+    print(f"   🔸 {len(claves_lote)} claves reemplazadas en {tabla} ({len(existentes)} filas existentes + "
+          f"{len(nuevas)} nuevas) en {segundos:.2f}s")
+    return {"filas": len(nuevas), "claves": len(claves_lote), "reemplazadas": len(existentes), "segundos": segundos}
+
+
+def nombre_rollup(tabla, nivel):
+    return f"{tabla}{ROLLUPS[nivel]}"
+
+
+def _columnas_tabla(cursor, tabla):
+    cursor.execute(f"SELECT * FROM {tabla} WHERE 1 = 0")
+    columnas = [d[0] for d in cursor.description]
+    cursor.fetchall()
+    return columnas
+
+
+def _periodos_rollup(conexion):
+    """Expresiones SQL que truncan date al día y al primer día del mes."""
+    if es_sqlite(conexion):
+        return "strftime('%Y-%m-%d 00:00:00', date)", "strftime('%Y-%m-01 00:00:00', date)"
+    return "DATE(date)", "DATE_FORMAT(date, '%Y-%m-01')"
+
+
+def _preparar_rollups(cursor, conexion, tabla, origen):
+    """
+    Arma en staging los rollups de tabla agregando origen (la tabla viva o su staging).
+    Devuelve las filas por nivel y los pares (rollup, staging, anterior) a publicar.
+    """
+    dims = [d for d in DIMENSIONES_ROLLUP if d in _columnas_tabla(cursor, origen)]
+    tipos = dict(COLUMNAS_CLEAN)
+    columnas_dims = [(d, tipos.get(d, "VARCHAR(150)")) for d in dims]
+    sumas = [("usd_total", "DECIMAL(18,2)"), ("count_ftd", "BIGINT"), ("filas", "BIGINT")]
+    dia, mes = _periodos_rollup(conexion)
+
+    # Cada nivel se agrega del staging del nivel anterior (aún no publicado)
+    niveles = [
+        ("diario", origen, dia, AGREGADOS_ROLLUP["diario"]),
+        ("mensual", f"{nombre_rollup(tabla, 'diario')}_staging", mes, AGREGADOS_ROLLUP["mensual"]),
+        ("total", f"{nombre_rollup(tabla, 'mensual')}_staging", None, AGREGADOS_ROLLUP["total"]),
+    ]
+    filas, pares = {}, []
+    for nivel, desde, periodo, agregados in niveles:
+        destino = nombre_rollup(tabla, nivel)
+        staging = f"{destino}_staging"
+        columnas = ([("date", "DATETIME")] if periodo else []) + columnas_dims + sumas
+        grupo = ", ".join(([periodo] if periodo else []) + dims)
+
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        crear_tabla(cursor, staging, columnas)
+        cursor.execute(f"""
+            INSERT INTO {staging} ({', '.join(nombre for nombre, _ in columnas)})
+            SELECT {grupo}, {agregados}
+            FROM {desde}
+            {'WHERE date IS NOT NULL' if periodo else ''}
+            GROUP BY {grupo}
+        """)
+        crear_indices(cursor, staging, columnas)
+        conexion.commit()
+        cursor.execute(f"SELECT COUNT(*) FROM {staging}")
+        filas[nivel] = cursor.fetchone()[0]
+        pares.append((destino, staging, f"{destino}_old"))
+    return filas, pares
+
+
+def reconstruir_rollups(conexion, tabla):
+    """
+    Rehace los rollups de tabla con sumas de usd_total y count_ftd (el LTV se
+    recalcula al leer) y filas (registros originales agregados):
+    - diario: (date, dimensiones) con date truncada al día;
+    - mensual: (primer día del mes, dimensiones), agregando el diario;
+    - total: (dimensiones), agregando el mensual.
+    Se arman en staging y se publican los tres en un único RENAME, como la tabla CLEAN.
+    """
+    inicio = time.perf_counter()
+    cursor = conexion.cursor()
+    filas, pares = _preparar_rollups(cursor, conexion, tabla, tabla)
+    _intercambiar_tablas(cursor, conexion, pares)
+    cursor.close()
+
+    print(f"   🔸 Rollups de {tabla} ({', '.join(f'{n}: {f} filas' for n, f in filas.items())}) "
+          f"en {time.perf_counter() - inicio:.2f}s")
+    return filas
+
+
+def actualizar_rollups_por_fechas(conexion, tabla, fechas):
+    """
+    Después de un upsert, rehace en los rollups solo los días y meses de `fechas`
+    (desde la tabla y desde el diario) y el total desde el mensual, que es chico.
+    Todo en una transacción. Devuelve las filas reescritas por nivel; si al terminar
+    el total no cuadra con la tabla (rollups ya atrasados), se reconstruyen completos.
+    """
+    inicio = time.perf_counter()
+    dias = pd.to_datetime(pd.Series(fechas)).dropna().dt.normalize().drop_duplicates().sort_values()
+    meses = dias.dt.to_period("M").dt.to_timestamp().drop_duplicates()
+    if dias.empty:
+        return {"diario": 0, "mensual": 0, "total": 0}
+
+    marca = marcador_sql(conexion)
+    cursor = conexion.cursor()
+    dims = [d for d in DIMENSIONES_ROLLUP if d in _columnas_tabla(cursor, tabla)]
+    dia, mes = _periodos_rollup(conexion)
+    sumas = "usd_total, count_ftd, filas"
+    texto = "%Y-%m-%d %H:%M:%S"
+
+    niveles = [
+        ("diario", tabla, dia, [(d, d + pd.Timedelta(days=1)) for d in dias]),
+        ("mensual", nombre_rollup(tabla, "diario"), mes, [(m, m + pd.DateOffset(months=1)) for m in meses]),
+    ]
+    filas = {}
+    try:
+        for nivel, desde, periodo, tramos in niveles:
+            destino = nombre_rollup(tabla, nivel)
+            grupo = ", ".join([periodo] + dims)
+            filas[nivel] = 0
+            for inicio_tramo, fin_tramo in tramos:
+                limites = (inicio_tramo.strftime(texto), fin_tramo.strftime(texto))
+                cursor.execute(f"DELETE FROM {destino} WHERE date >= {marca} AND date < {marca}", limites)
+                cursor.execute(f"""
+                    INSERT INTO {destino} (date, {', '.join(dims)}, {sumas})
+                    SELECT {grupo}, {AGREGADOS_ROLLUP[nivel]}
+                    FROM {desde}
+                    WHERE date >= {marca} AND date < {marca}
+                    GROUP BY {grupo}
+                """, limites)
+                filas[nivel] += max(cursor.rowcount, 0)
+
+        total, mensual = nombre_rollup(tabla, "total"), nombre_rollup(tabla, "mensual")
+        cursor.execute(f"DELETE FROM {total}")
+        cursor.execute(f"""
+            INSERT INTO {total} ({', '.join(dims)}, {sumas})
+            SELECT {', '.join(dims)}, {AGREGADOS_ROLLUP['total']}
+            FROM {mensual}
+            GROUP BY {', '.join(dims)}
+        """)
+        filas["total"] = max(cursor.rowcount, 0)
+        conexion.commit()
+
+        cursor.execute(f"SELECT SUM(filas) FROM {total}")
+        en_rollup = cursor.fetchone()[0] or 0
+        cursor.execute(f"SELECT COUNT(date) FROM {tabla}")
+        en_tabla = cursor.fetchone()[0] or 0
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    if int(en_rollup) != int(en_tabla):
+        print(f"⚠️ Rollups de {tabla} atrasados ({en_rollup} filas agregadas, {en_tabla} en la tabla): "
+              "se reconstruyen.")
+        return reconstruir_rollups(conexion, tabla)
+    print(f"   🔸 Rollups de {tabla}: {len(dias)} días y {len(meses)} meses rehechos "
+          f"en {time.perf_counter() - inicio:.2f}s")
+    return filas
@@ -1,22 +1,145 @@
-import mysql.connector
-from mysql.connector import Error
+import os
+import threading
+import time
+from contextlib import contextmanager
 
-# === CONFIGURACIÓN RAILWAY ===
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL
+
+# === CONFIGURACIÓN RAILWAY (sobrescribible por variables de entorno) ===
+# La contraseña no tiene valor por defecto: sin DB_PASSWORD (ni DB_URL) no se conecta
 DB_CONFIG = {
-    "host": "yamanote.proxy.rlwy.net",
-    "user": "root",
-    "password": "ROEtoKkghFtmkUjJfPVQzHlvwFcHnCJn",  # la que me diste
-    "database": "railway",
-    "port": 27508
+    "host": os.getenv("DB_HOST", "yamanote.proxy.rlwy.net"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD"),
+    "database": os.getenv("DB_NAME", "railway"),
+    "port": int(os.getenv("DB_PORT", "27508")),
+}
+
+# DB_URL permite apuntar a cualquier base SQLAlchemy (p. ej. sqlite:///ltv_local.db para pruebas)
+DB_URL = os.getenv("DB_URL")
+
+# === POOL DE CONEXIONES ===
+POOL_CONFIG = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
 }
 
-def crear_conexion():
-    """Crea y retorna una conexión MySQL válida (Railway)."""
+_engine = None
+_engine_lock = threading.Lock()
+_local = threading.local()
+_stats = {"conexiones_nuevas": 0, "checkouts": 0, "segundos_conexion": 0.0}
+# Los eventos del pool llegan desde los hilos de cada request: los contadores se suman bajo lock
+_stats_lock = threading.Lock()
+
+
+def _url():
+    if DB_URL:
+        return DB_URL
+    if not DB_CONFIG["password"]:
+        raise RuntimeError("Falta DB_PASSWORD: definila (o DB_URL) en el entorno para conectar a MySQL.")
+    return URL.create(
+        "mysql+mysqlconnector",
+        username=DB_CONFIG["user"],
+        password=DB_CONFIG["password"],
+        host=DB_CONFIG["host"],
+        port=DB_CONFIG["port"],
+        database=DB_CONFIG["database"],
+    )
+
+
+def _registrar_eventos(engine):
+    @event.listens_for(engine, "do_connect")
+    def _antes_de_conectar(dialect, conn_rec, cargs, cparams):
+        _local.inicio = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _al_conectar(dbapi_connection, connection_record):
+        segundos = time.perf_counter() - getattr(_local, "inicio", time.perf_counter())
+        with _stats_lock:
+            _stats["conexiones_nuevas"] += 1
+            _stats["segundos_conexion"] += segundos
+        if engine.dialect.name == "sqlite":
+            # WAL: una lectura en curso (p. ej. el ETL por bloques) no bloquea la escritura en otra conexión
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "checkout")
+    def _al_prestar(dbapi_connection, connection_record, connection_proxy):
+        with _stats_lock:
+            _stats["checkouts"] += 1
+
+
+def obtener_engine():
+    """Engine SQLAlchemy compartido (uno por proceso) con pool de conexiones."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = _url()
+                opciones = {} if str(url).startswith("sqlite") else dict(POOL_CONFIG)
+                _engine = create_engine(url, **opciones)
+                _registrar_eventos(_engine)
+                print(f"✅ Pool de conexiones listo ({_engine.dialect.name}, {opciones or 'por defecto'})")
+    return _engine
+
+
+def descartar_pool_heredado():
+    """
+    En un proceso recién forkeado (worker de gunicorn con --preload): olvida las
+    conexiones que el pool heredó del padre sin cerrarlas (siguen siendo del padre)
+    y las próximas se abren en este proceso.
+    """
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+def crear_conexion(**opciones):
+    """
+    Retorna una conexión DB-API del pool (close() la devuelve al pool).
+    Con opciones extra del conector MySQL (p. ej. allow_local_infile) abre una conexión
+    dedicada a la misma base que el pool (DB_URL o DB_CONFIG). En otras bases
+    (p. ej. SQLite por DB_URL) esas opciones no aplican y se usa el pool.
+    """
     try:
-        conexion = mysql.connector.connect(**DB_CONFIG)
-        if conexion.is_connected():
-            print("✅ Conectado correctamente a Railway MySQL")
-        return conexion
-    except Error as e:
+        engine = obtener_engine()
+        if opciones and engine.dialect.name == "mysql":
+            cargs, cparams = engine.dialect.create_connect_args(engine.url)
+            conexion = engine.dialect.connect(*cargs, **{**cparams, **opciones})
+            print(f"✅ Conexión dedicada a {engine.url.host} ({', '.join(opciones)})")
+            return conexion
+        return engine.raw_connection()
+    except Exception as e:
         print(f"❌ Error al conectar a MySQL: {e}")
         return None
+
+
+@contextmanager
+def conexion_db():
+    """Conexión DB-API del pool: commit al salir, rollback si hay error y devolución al pool."""
+    conexion = obtener_engine().raw_connection()
+    try:
+        yield conexion
+        conexion.commit()
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        conexion.close()
+
+
+def estadisticas_pool():
+    """Conexiones nuevas vs préstamos del pool y tiempo medio de conexión."""
+    with _stats_lock:
+        nuevas, checkouts, segundos = _stats["conexiones_nuevas"], _stats["checkouts"], _stats["segundos_conexion"]
+    pool = _engine.pool if _engine is not None else None
+    return {
+        "conexiones_nuevas": nuevas,
+        "checkouts": checkouts,
+        "hit_rate": (1 - nuevas / checkouts) if checkouts else 0.0,
+        "segundos_conexion_promedio": (segundos / nuevas) if nuevas else 0.0,
+        "en_uso": pool.checkedout() if hasattr(pool, "checkedout") else 0,
+        "estado": pool.status() if pool is not None else "sin engine",
+    }
@@ -0,0 +1,226 @@
+import math
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+from conexion_mysql import obtener_engine
+from cubo_ltv import DIMENSIONES, calcular_ltv
+from carga_masiva import ROLLUPS, nombre_rollup
+
+# ======================================================
+#  OBL DIGITAL — Consultas agregadas en la base (modo SQL, sin cargar la tabla)
+# ======================================================
+
+# Columnas por las que la tabla detalle puede ordenarse en SQL
+COLUMNAS_ORDEN = ["date"] + DIMENSIONES + ["usd_total", "count_ftd", "general_ltv"]
+
+
+def _fecha_sql(valor, dias=0):
+    return (pd.to_datetime(valor).normalize() + pd.Timedelta(days=dias)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def senal_rollups(tabla, engine=None):
+    """
+    Filas y monto agregados en el rollup total de tabla (None si no existe). Los tres
+    rollups se publican juntos: cuando se ponen al día, esta señal cambia.
+    """
+    try:
+        with (engine or obtener_engine()).connect() as conexion:
+            fila = conexion.exec_driver_sql(
+                f"SELECT SUM(filas), SUM(usd_total) FROM {nombre_rollup(tabla, 'total')}"
+            ).fetchone()
+            return (int(fila[0] or 0), str(fila[1]))
+    except Exception:
+        return None
+
+
+class ConsultasSQL:
+    """
+    Misma interfaz que CuboLTV (resumen, detalle_filtrado), resuelta con WHERE
+    parametrizado + GROUP BY sobre la tabla CLEAN: cada worker solo recibe los
+    agregados. Se apoya en los índices que crea el ETL (date, country, affiliate, source)
+    y, cuando están al día, en sus rollups diario / mensual / total: cada consulta usa
+    el más grueso que responde el rango de fechas pedido. A diferencia del modo en
+    memoria no descarta claves (date, country, affiliate, source) repetidas: la
+    tabla CLEAN ya llega deduplicada por el ETL.
+    """
+
+    def __init__(self, tabla, engine=None):
+        self.tabla = tabla
+        self.engine = engine or obtener_engine()
+        with self.engine.connect() as conexion:
+            columnas = list(conexion.execute(text(f"SELECT * FROM {tabla} WHERE 1 = 0")).keys())
+        self.dimensiones = [d for d in DIMENSIONES if d in columnas]
+        self.fecha_min, self.fecha_max = self.rango_fechas()
+        self.rollups = self._rollups_vigentes()
+
+    def _consultar(self, sql, params=None, expandibles=()):
+        consulta = text(sql)
+        if expandibles:
+            consulta = consulta.bindparams(*[bindparam(nombre, expanding=True) for nombre in expandibles])
+        with self.engine.connect() as conexion:
+            resultado = conexion.execute(consulta, params or {})
+            return pd.DataFrame(resultado.fetchall(), columns=list(resultado.keys()))
+
+    def _rollups_vigentes(self):
+        """
+        Rollups del ETL que cuadran con la tabla (filas agregadas y monto total).
+        Si una carga no llegó a rehacerlos, quedan fuera y se consulta la tabla.
+        """
+        tabla = self._consultar(f"SELECT COUNT(date) AS filas, SUM(usd_total) AS usd FROM {self.tabla}").iloc[0]
+        vigentes = {}
+        for nivel in ROLLUPS:
+            nombre = nombre_rollup(self.tabla, nivel)
+            try:
+                rollup = self._consultar(f"SELECT SUM(filas) AS filas, SUM(usd_total) AS usd FROM {nombre}").iloc[0]
+            except Exception:
+                continue
+            if (int(rollup["filas"] or 0) == int(tabla["filas"] or 0)
+                    and abs(float(rollup["usd"] or 0) - float(tabla["usd"] or 0)) < 0.01):
+                vigentes[nivel] = nombre
+            else:
+                print(f"⚠️ Rollup {nombre} desactualizado respecto de {self.tabla}: no se usa.")
+        return vigentes
+
+    def tabla_para(self, start=None, end=None):
+        """
+        (tabla, start, end) más gruesa que responde el rango, con el rango a filtrar en
+        ella: el total si cubre todas las fechas (sin filtro), el mensual si empieza y
+        termina en bordes de mes, si no el diario. Las filas del mensual llevan la fecha
+        del día 1: si el rango arranca antes de la primera fecha pero no en un día 1,
+        el filtro se corre al día 1 de ese mes para no perder el primer mes.
+        """
+        desde = pd.to_datetime(start).normalize() if start and end else None
+        hasta = pd.to_datetime(end).normalize() if start and end else None
+        cubre_inicio = desde is None or desde <= self.fecha_min
+        cubre_fin = hasta is None or hasta >= self.fecha_max
+        if cubre_inicio and cubre_fin and "total" in self.rollups:
+            return self.rollups["total"], None, None
+        if ((cubre_inicio or desde.day == 1) and (cubre_fin or (hasta + pd.Timedelta(days=1)).day == 1)
+                and "mensual" in self.rollups):
+            if desde is not None:
+                desde = desde.to_period("M").to_timestamp()
+            return self.rollups["mensual"], desde, hasta
+        return self.rollups.get("diario", self.tabla), start, end
+
+    def _where(self, start, end, affiliates, sources, countries):
+        """Condiciones equivalentes a MotorFiltros.filtrar (filas sin dimensión no cuentan)."""
+        condiciones = [f"{dim} IS NOT NULL" for dim in self.dimensiones]
+        params = {}
+        if start and end:
+            condiciones.append("date >= :desde AND date < :hasta")
+            params.update(desde=_fecha_sql(start), hasta=_fecha_sql(end, dias=1))
+        expandibles = []
+        for dim, valores in (("affiliate", affiliates), ("source", sources), ("country", countries)):
+            if valores and dim in self.dimensiones:
+                condiciones.append(f"{dim} IN :{dim}")
+                params[dim] = sorted({str(v) for v in valores})
+                expandibles.append(dim)
+        return " AND ".join(condiciones) or "1 = 1", params, expandibles
+
+    @staticmethod
+    def _numericas(df):
+        for col in ["usd_total", "count_ftd"]:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(float)
+        df["general_ltv"] = calcular_ltv(df["usd_total"], df["count_ftd"])
+        return df
+
+    def resumen(self, start=None, end=None, affiliates=None, sources=None, countries=None, con_detalle=True):
+        """Totales y rollups con una sola consulta agrupada por (country, affiliate)."""
+        tabla, desde, hasta = self.tabla_para(start, end)
+        where, params, expandibles = self._where(desde, hasta, affiliates, sources, countries)
+        por_celda = self._numericas(self._consultar(
+            f"""
+            SELECT country, affiliate, SUM(usd_total) AS usd_total, SUM(count_ftd) AS count_ftd
+            FROM {tabla}
+            WHERE {where}
+            GROUP BY country, affiliate
+            ORDER BY country, affiliate
+            """,
+            params, expandibles,
+        ))
+
+        def por(columnas):
+            out = por_celda.groupby(columnas, as_index=False, sort=True).agg({"usd_total": "sum", "count_ftd": "sum"})
+            return self._numericas(out)
+
+        return {
+            "total_usd": float(por_celda["usd_total"].sum()),
+            "total_ftd": float(por_celda["count_ftd"].sum()),
+            "por_affiliate": por(["affiliate"]),
+            "por_country": por(["country"]),
+            "por_country_affiliate": por_celda,
+            "detalle": self.detalle_filtrado(start, end, affiliates, sources, countries) if con_detalle else None,
+        }
+
+    def _consulta_detalle(self, where):
+        dims = ", ".join(self.dimensiones)
+        return f"""
+            SELECT DATE(date) AS date, {dims},
+                   SUM(usd_total) AS usd_total, SUM(count_ftd) AS count_ftd,
+                   CASE WHEN SUM(count_ftd) > 0 THEN SUM(usd_total) / SUM(count_ftd) ELSE 0 END AS general_ltv
+            FROM {self.rollups.get("diario", self.tabla)}
+            WHERE {where}
+            GROUP BY DATE(date), {dims}
+        """
+
+    def _tipar_detalle(self, df):
+        df["date"] = pd.to_datetime(df["date"])
+        return self._numericas(df)[["date"] + self.dimensiones + ["usd_total", "count_ftd", "general_ltv"]]
+
+    def detalle_filtrado(self, start=None, end=None, affiliates=None, sources=None, countries=None):
+        """Detalle (date, dimensiones) en el mismo orden que CuboLTV.detalle_filtrado."""
+        where, params, expandibles = self._where(start, end, affiliates, sources, countries)
+        orden = ", ".join(["date"] + self.dimensiones)
+        return self._tipar_detalle(
+            self._consultar(f"{self._consulta_detalle(where)} ORDER BY {orden}", params, expandibles)
+        )
+
+    def pagina_detalle(self, start, end, affiliates, sources, countries, page_current, page_size, sort_by=None):
+        """
+        Una página del detalle ordenada en la base (LIMIT/OFFSET): el worker
+        nunca arma el detalle completo. Devuelve (DataFrame de la página, total, páginas, página).
+        """
+        where, params, expandibles = self._where(start, end, affiliates, sources, countries)
+        detalle = self._consulta_detalle(where)
+        total = int(self._consultar(f"SELECT COUNT(*) AS n FROM ({detalle}) AS d", params, expandibles)["n"].iloc[0])
+
+        page_size = page_size or 15
+        paginas = max(1, math.ceil(total / page_size))
+        pagina = min(max(page_current or 0, 0), paginas - 1)
+
+        # El orden pedido y, para empates, el orden natural del detalle (como el sort estable)
+        columnas = [c for c in COLUMNAS_ORDEN if c not in DIMENSIONES or c in self.dimensiones]
+        orden = [
+            f"{s['column_id']} {'ASC' if s.get('direction') == 'asc' else 'DESC'}"
+            for s in (sort_by or []) if s.get("column_id") in columnas
+        ] + ["date"] + self.dimensiones
+        consulta = (
+            f"SELECT * FROM ({detalle}) AS d ORDER BY {', '.join(orden)} "
+            "LIMIT :limite OFFSET :desplazamiento"
+        )
+        params = dict(params, limite=page_size, desplazamiento=pagina * page_size)
+        return self._tipar_detalle(self._consultar(consulta, params, expandibles)), total, paginas, pagina
+
+    def opciones(self):
+        """Valores distintos por dimensión para los dropdowns (uno por consulta, sobre su índice)."""
+        return {
+            dim: sorted(self._consultar(
+                f"SELECT DISTINCT {dim} AS valor FROM {self.tabla} WHERE {dim} IS NOT NULL"
+            )["valor"].astype(str))
+            if dim in self.dimensiones else []
+            for dim in DIMENSIONES
+        }
+
+    def combinaciones(self):
+        """(mes, dimensiones) distintos para IndiceOpciones: del rollup mensual si está al día."""
+        dims = ", ".join(self.dimensiones)
+        if "mensual" in self.rollups:
+            return self._consultar(f"SELECT DISTINCT date, {dims} FROM {self.rollups['mensual']}")
+        mes = ("strftime('%Y-%m-01', date)" if self.engine.dialect.name == "sqlite"
+               else "DATE_FORMAT(date, '%Y-%m-01')")
+        where, params, _ = self._where(None, None, None, None, None)
+        return self._consultar(f"SELECT DISTINCT {mes} AS date, {dims} FROM {self.tabla} WHERE {where}", params)
+
+    def rango_fechas(self):
+        fila = self._consultar(f"SELECT MIN(date) AS desde, MAX(date) AS hasta FROM {self.tabla}")
+        return pd.to_datetime(fila["desde"].iloc[0]), pd.to_datetime(fila["hasta"].iloc[0])
@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+# ======================================================
+#  OBL DIGITAL — Cubo de sumas acumuladas por fecha
+# ======================================================
+
+DIMENSIONES = ["country", "affiliate", "source"]
+
+
+def calcular_ltv(usd_total, count_ftd):
+    """LTV = monto / FTDs, 0 cuando no hay FTDs (arrays o Series)."""
+    usd = np.asarray(usd_total, dtype=float)
+    ftd = np.asarray(count_ftd, dtype=float)
+    return np.divide(usd, ftd, out=np.zeros_like(usd), where=ftd > 0)
+
+
+class CuboLTV:
+    """
+    Pre-agrega usd_total y count_ftd por celda (country, affiliate, source) y fecha,
+    y guarda sus sumas acumuladas. El total de una celda en cualquier rango de fechas
+    es cum[fin] - cum[inicio]: dos búsquedas y una resta, sin groupby por request.
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensiones=DIMENSIONES):
+        self.dimensiones = list(dimensiones)
+        detalle = (
+            df.groupby(self.dimensiones + ["date"], as_index=False, observed=True)
+            .agg({"usd_total": "sum", "count_ftd": "sum"})
+        )
+        # Una fila por (celda, fecha), ordenadas por celda y luego por fecha
+        self.detalle = detalle
+        self.fechas = np.unique(detalle["date"].to_numpy(dtype="datetime64[ns]"))
+
+        id_celda = detalle.groupby(self.dimensiones, sort=True, observed=True).ngroup().to_numpy(dtype=np.int64)
+        celdas = detalle.drop_duplicates(self.dimensiones)[self.dimensiones].reset_index(drop=True)
+
+        self.categorias = {}
+        self.codigos = {}
+        for dim in self.dimensiones:
+            cat = pd.Categorical(celdas[dim])
+            self.categorias[dim] = pd.Index(cat.categories)
+            self.codigos[dim] = cat.codes.astype(np.int64)
+        self.n_celdas = len(celdas)
+
+        indice_fecha = np.searchsorted(self.fechas, detalle["date"].to_numpy(dtype="datetime64[ns]"))
+        self.id_celda = id_celda
+        self.claves = id_celda * len(self.fechas) + indice_fecha
+
+        self.cum_usd = np.concatenate([[0.0], np.cumsum(detalle["usd_total"].to_numpy(dtype=float))])
+        self.cum_ftd = np.concatenate([[0.0], np.cumsum(detalle["count_ftd"].to_numpy(dtype=float))])
+
+    def _celdas_seleccionadas(self, filtros):
+        mascara = np.ones(self.n_celdas, dtype=bool)
+        for dim, valores in filtros.items():
+            if valores:
+                codigos = self.categorias[dim].get_indexer(list(valores))
+                mascara &= np.isin(self.codigos[dim], codigos[codigos >= 0])
+        return np.flatnonzero(mascara)
+
+    def _limites(self, start, end, filtros):
+        """Para cada celda seleccionada, el tramo [lo, hi) de filas dentro del rango de fechas."""
+        celdas = self._celdas_seleccionadas(filtros)
+        if start and end:
+            desde = np.searchsorted(self.fechas, np.datetime64(pd.to_datetime(start), "ns"), side="left")
+            hasta = np.searchsorted(self.fechas, np.datetime64(pd.to_datetime(end), "ns"), side="right")
+            hasta = max(desde, hasta)
+        else:
+            desde, hasta = 0, len(self.fechas)
+        base = celdas * len(self.fechas)
+        lo = np.searchsorted(self.claves, base + desde, side="left")
+        hi = np.searchsorted(self.claves, base + hasta, side="left")
+        return celdas, lo, hi
+
+    def _rollup(self, dims, celdas, usd, ftd, presentes):
+        """Suma por una o varias dimensiones usando bincount sobre los códigos de celda."""
+        codigo = np.zeros(len(celdas), dtype=np.int64)
+        tamano = 1
+        for dim in dims:
+            n = len(self.categorias[dim])
+            codigo = codigo * n + self.codigos[dim][celdas]
+            tamano *= n
+        usd_g = np.bincount(codigo, weights=usd, minlength=tamano)
+        ftd_g = np.bincount(codigo, weights=ftd, minlength=tamano)
+        con_filas = np.flatnonzero(np.bincount(codigo, weights=presentes, minlength=tamano) > 0)
+
+        out = {}
+        resto = con_filas
+        for dim in reversed(dims):
+            n = len(self.categorias[dim])
+            out[dim] = self.categorias[dim][resto % n]
+            resto = resto // n
+        out = pd.DataFrame({dim: out[dim] for dim in dims})
+        out["usd_total"] = usd_g[con_filas]
+        out["count_ftd"] = ftd_g[con_filas]
+        out["general_ltv"] = calcular_ltv(out["usd_total"], out["count_ftd"])
+        return out
+
+    def _limites_filtros(self, start, end, affiliates, sources, countries):
+        filtros = {"affiliate": affiliates, "source": sources, "country": countries}
+        return self._limites(start, end, {k: v for k, v in filtros.items() if k in self.codigos})
+
+    def resumen(self, start=None, end=None, affiliates=None, sources=None, countries=None, con_detalle=True):
+        """
+        Totales y rollups para los mismos filtros que actualizar_dashboard.
+        Devuelve dict con total_usd, total_ftd, por_affiliate, por_country,
+        por_country_affiliate y detalle (date, country, affiliate, source).
+        con_detalle=False omite el detalle (la tabla lo pide aparte, paginado).
+        """
+        celdas, lo, hi = self._limites_filtros(start, end, affiliates, sources, countries)
+
+        usd = self.cum_usd[hi] - self.cum_usd[lo]
+        ftd = self.cum_ftd[hi] - self.cum_ftd[lo]
+        presentes = (hi > lo).astype(float)
+
+        return {
+            "total_usd": float(usd.sum()),
+            "total_ftd": float(ftd.sum()),
+            "por_affiliate": self._rollup(["affiliate"], celdas, usd, ftd, presentes),
+            "por_country": self._rollup(["country"], celdas, usd, ftd, presentes),
+            "por_country_affiliate": self._rollup(["country", "affiliate"], celdas, usd, ftd, presentes),
+            "detalle": self._detalle(lo, hi) if con_detalle else None,
+        }
+
+    def detalle_filtrado(self, start=None, end=None, affiliates=None, sources=None, countries=None):
+        """Solo el detalle (date, country, affiliate, source) para los filtros dados."""
+        _, lo, hi = self._limites_filtros(start, end, affiliates, sources, countries)
+        return self._detalle(lo, hi)
+
+    def _detalle(self, lo, hi):
+        """Filas (celda, fecha) del rango, en el orden de groupby por date, country, affiliate, source."""
+        largos = hi - lo
+        total = int(largos.sum())
+        inicios = np.repeat(lo - (np.cumsum(largos) - largos), largos)
+        posiciones = np.arange(total) + inicios
+        posiciones = posiciones[np.lexsort((self.id_celda[posiciones], self.claves[posiciones] % len(self.fechas)))]
+
+        detalle = self.detalle.take(posiciones).reset_index(drop=True)
+        return detalle[["date"] + self.dimensiones + ["usd_total", "count_ftd"]].assign(
+            general_ltv=calcular_ltv(detalle["usd_total"], detalle["count_ftd"])
+        )
+
+
+def ranking_afiliados(por_affiliate: pd.DataFrame, criterio="general_ltv") -> list:
+    """Afiliados de mayor a menor según criterio (general_ltv o count_ftd); empates por nombre."""
+    orden = por_affiliate.assign(affiliate=por_affiliate["affiliate"].astype(str)).sort_values(
+        [criterio, "affiliate"], ascending=[False, True], kind="stable"
+    )
+    return orden["affiliate"].tolist()
+
+
+def top_n_con_otros(df: pd.DataFrame, ranking, n, desde=0, otros="Other", por=()):
+    """
+    Conserva los afiliados ranking[desde:desde + n] y suma el resto (ranking[desde + n:])
+    en una fila otros por cada combinación de `por` (p. ej. country), con el LTV
+    recalculado de los montos y FTDs sumados. Los afiliados anteriores a `desde`
+    quedan fuera: es la vista de "dentro de Other" al hacer drill-down.
+    Devuelve (df, hay_otros).
+    """
+    if not n or n <= 0:
+        return df, False
+    visibles = set(ranking[desde:desde + n])
+    resto = set(ranking[desde + n:])
+    nombres = df["affiliate"].astype(str)
+
+    arriba = df[nombres.isin(visibles).to_numpy()]
+    abajo = df[nombres.isin(resto).to_numpy()]
+    if abajo.empty:
+        return arriba, False
+
+    por = list(por)
+    if por:
+        otros_df = abajo.groupby(por, as_index=False, observed=True).agg({"usd_total": "sum", "count_ftd": "sum"})
+    else:
+        otros_df = pd.DataFrame({"usd_total": [abajo["usd_total"].sum()], "count_ftd": [abajo["count_ftd"].sum()]})
+    otros_df["affiliate"] = otros
+    otros_df["general_ltv"] = calcular_ltv(otros_df["usd_total"], otros_df["count_ftd"])
+
+    arriba = arriba.assign(affiliate=arriba["affiliate"].astype(str))
+    for col in por:
+        arriba[col] = arriba[col].astype(str)
+        otros_df[col] = otros_df[col].astype(str)
+    return pd.concat([arriba, otros_df[arriba.columns]], ignore_index=True), True
+
+
+def resumen_con_groupby(df_filtrado: pd.DataFrame, dimensiones=DIMENSIONES):
+    """Ruta de respaldo: mismo resultado que CuboLTV.resumen agregando las filas ya filtradas."""
+    df_agregado = (
+        df_filtrado.groupby(["date"] + list(dimensiones), as_index=False, observed=True)
+        .agg({"usd_total": "sum", "count_ftd": "sum"})
+    )
+    df_agregado["general_ltv"] = calcular_ltv(df_agregado["usd_total"], df_agregado["count_ftd"])
+
+    def por(columnas):
+        out = df_agregado.groupby(columnas, as_index=False, observed=True).agg({"usd_total": "sum", "count_ftd": "sum"})
+        out["general_ltv"] = calcular_ltv(out["usd_total"], out["count_ftd"])
+        return out
+
+    return {
+        "total_usd": float(df_agregado["usd_total"].sum()),
+        "total_ftd": float(df_agregado["count_ftd"].sum()),
+        "por_affiliate": por("affiliate"),
+        "por_country": por("country"),
+        "por_country_affiliate": por(["country", "affiliate"]),
+        "detalle": df_agregado,
+    }
@@ -1,325 +1,517 @@
-import re
-import pandas as pd
+import time
+
+# Arranque en frío: se informa por fases (import, dataset, app) al terminar este módulo
+_INICIO_ARRANQUE = time.perf_counter()
+
+import os
+
 import dash
-from dash import html, dcc, Input, Output, dash_table
+from dash import html, dcc, Input, Output, State, dash_table, ctx, Patch, no_update
+import pandas as pd
 import plotly.express as px
-from conexion_mysql import crear_conexion
+from cubo_ltv import ranking_afiliados, resumen_con_groupby, top_n_con_otros
+from cache_resultados import CacheResultados, normalizar_filtros
+from conexion_mysql import estadisticas_pool
+from datos_dashboard import ARRANQUE, RefrescoDatos
+from exportar_detalle import registrar_exportacion
+from metricas_ltv import METRICAS, Lectura, etapa, exponer_caches, exponer_pool, instrumentar_servidor, registrar
+from respuestas_http import (
+    CALLBACKS_EN_CURSO, SINGLE_FLIGHT, coalescer_callbacks, comprimir_respuestas, configurar_json,
+)
+from tabla_detalle import pagina_tabla, registros_tabla
 
 # ======================================================
 # === OBL DIGITAL DASHBOARD — GENERAL LTV (Dark Gold, + Filtro SOURCE)
 # ======================================================
 
-def cargar_datos():
-    """Carga datos desde MySQL o CSV local."""
-    try:
-        conexion = crear_conexion()
-        if conexion:
-            print("✅ Leyendo GENERAL_LTV_PGY_CLEAN desde Railway MySQL...")
-            query = "SELECT * FROM GENERAL_LTV_PGY_CLEAN"
-            df = pd.read_sql(query, conexion)
-            conexion.close()
-            return df
-    except Exception as e:
-        print(f"⚠️ Error conectando a SQL, leyendo CSV local: {e}")
-
-    print("📁 Leyendo GENERAL_LTV_preview.csv (local)...")
-    return pd.read_csv("GENERAL_LTV_preview.csv", dtype=str)
-
-
-# === 1️⃣ Cargar datos ===
-df = cargar_datos()
-df.columns = [c.strip().lower() for c in df.columns]
-
-# === 2️⃣ Normalizar columnas ===
-if "usd_total" not in df.columns:
-    for alt in ["usd", "total_amount"]:
-        if alt in df.columns:
-            df.rename(columns={alt: "usd_total"}, inplace=True)
-            break
-
-if "count_ftd" not in df.columns:
-    for alt in ["ftd", "ftds", "count"]:
-        if alt in df.columns:
-            df.rename(columns={alt: "count_ftd"}, inplace=True)
-            break
-
-# === 3️⃣ Normalizar fechas ===
-def convertir_fecha(valor):
-    try:
-        s = str(valor).strip()
-        if "/" in s:
-            return pd.to_datetime(s, format="%d/%m/%Y", errors="coerce")
-        elif "-" in s:
-            return pd.to_datetime(s.split(" ")[0], errors="coerce")
-    except Exception:
-        return pd.NaT
-    return pd.NaT
-
-df["date"] = df["date"].astype(str).str.strip().apply(convertir_fecha)
-df = df[df["date"].notna()]
-df["date"] = pd.to_datetime(df["date"], utc=False).dt.tz_localize(None)
-
-# === 4️⃣ Limpieza de montos ===
-def limpiar_usd(valor):
-    if pd.isna(valor):
-        return 0.0
-    s = str(valor).strip()
-    s = re.sub(r"[^\d,.\-]", "", s)
-    if "." in s and "," in s:
-        if s.rfind(",") > s.rfind("."):
-            s = s.replace(".", "").replace(",", ".")
-        else:
-            s = s.replace(",", "")
-    elif "," in s and "." not in s:
-        partes = s.split(",")
-        s = s.replace(",", ".") if len(partes[-1]) == 2 else s.replace(",", "")
-    elif s.count(".") > 1:
-        s = s.replace(".", "")
-    try:
-        return float(s)
-    except:
-        return 0.0
-
-df["usd_total"] = df["usd_total"].apply(limpiar_usd)
-df["count_ftd"] = pd.to_numeric(df.get("count_ftd", 0), errors="coerce").fillna(0).astype(float)
-df["general_ltv"] = pd.to_numeric(df.get("general_ltv", 0), errors="coerce").fillna(0.0)
-
-# === 5️⃣ Limpieza de texto ===
-for col in ["country", "affiliate", "source"]:
-    if col in df.columns:
-        df[col] = df[col].astype(str).str.strip().str.title()
-        df[col].replace({"Nan": None, "None": None, "": None}, inplace=True)
-
-# === 6️⃣ Eliminar duplicados exactos ===
-df = df.drop_duplicates(subset=["date", "country", "affiliate", "source"], keep="last")
-
-fecha_min, fecha_max = df["date"].min(), df["date"].max()
-
-# === 7️⃣ Formato K/M ===
-def formato_km(valor):
-    """Mostrar los montos completos con separadores de miles y dos decimales."""
-    try:
-        return f"{valor:,.2f}"
-    except:
-        return "0.00"
-
+fases_arranque = {"importar": time.perf_counter() - _INICIO_ARRANQUE}
+
+# === 1️⃣ Cargar datos (recarga en caliente cuando cambia la fuente) ===
+# Con LTV_ARRANQUE=snapshot se sirve la copia local y la base se lee en segundo plano
+datos = RefrescoDatos()
+_marca = time.perf_counter()
+datos.arrancar()
+fases_arranque["dataset"] = time.perf_counter() - _marca
+_marca = time.perf_counter()
+
+# Cache del agregado filtrado (totales + rollups) que comparten KPIs y gráficos,
+# invalidada cuando se publica un dataset nuevo
+cache = CacheResultados()
+datos.al_actualizar(lambda ds: cache.usar_version(ds.huella))
+
+# Detalle agregado por filtros (DataFrame), del que la tabla recorta cada página
+cache_detalle = CacheResultados(backend="memoria", max_items=32)
+datos.al_actualizar(lambda ds: cache_detalle.usar_version(ds.huella))
+exponer_caches({"resultados": cache, "detalle": cache_detalle})
+
+TABLA_PAGE_SIZE = 15
+
+# Afiliados con porción / barra propia en los gráficos; el resto se suma en "Other"
+# (0 = todos). Criterio del ranking: general_ltv o count_ftd.
+TOP_AFILIADOS = int(os.getenv("LTV_TOP_AFILIADOS", "15"))
+CRITERIO_TOP = os.getenv("LTV_TOP_CRITERIO", "general_ltv")
+OTROS = "Other"
+
+# === 7️⃣ Formato K/M (en el navegador) ===
+# Montos completos con separadores de miles y dos decimales; LTV = amount / FTD's.
+FORMATO_KPIS_JS = """
+function(totales) {
+    if (!totales) { return window.dash_clientside.no_update; }
+    const monto = (v) => "$" + Number(v || 0).toLocaleString("en-US", {
+        minimumFractionDigits: 2, maximumFractionDigits: 2
+    });
+    const ftds = totales.ftds || 0;
+    const ltv = ftds > 0 ? totales.amount / ftds : 0;
+    return [Math.trunc(ftds).toLocaleString("en-US"), monto(totales.amount), monto(ltv)];
+}
+"""
+
+# Enlaces de descarga del detalle con los filtros vigentes (sin ida y vuelta al servidor)
+ENLACES_EXPORTACION_JS = """
+function(start, end, affiliates, sources, countries) {
+    const params = new URLSearchParams();
+    if (start && end) { params.set("start_date", start); params.set("end_date", end); }
+    (affiliates || []).forEach((v) => params.append("affiliate", v));
+    (sources || []).forEach((v) => params.append("source", v));
+    (countries || []).forEach((v) => params.append("country", v));
+    const query = params.toString() ? "?" + params.toString() : "";
+    return ["/export/detalle.csv" + query, "/export/detalle.parquet" + query];
+}
+"""
+
+ENLACE_STYLE = {"color": "#D4AF37", "marginLeft": "15px", "fontSize": "14px"}
+
+CARD_STYLE = {
+    "backgroundColor": "#1a1a1a",
+    "borderRadius": "10px",
+    "padding": "20px",
+    "width": "80%",
+    "textAlign": "center",
+    "boxShadow": "0 0 10px rgba(212,175,55,0.3)",
+}
+
+
+def tarjeta_kpi(titulo, id_valor):
+    """Tarjeta fija del layout; los callbacks solo actualizan el texto del valor."""
+    return html.Div([
+        html.H4(titulo, style={"color": "#D4AF37", "fontWeight": "bold"}),
+        html.H2(id=id_valor, style={"color": "#FFFFFF", "fontSize": "36px"})
+    ], style=CARD_STYLE)
+
+
+# === Gráficos: layout fijo + trazas por filtro ===
+def figura_pie(df, nombres, titulo):
+    return px.pie(df, names=nombres, values="general_ltv",
+                  title=titulo, color_discrete_sequence=px.colors.sequential.YlOrBr)
+
+
+def figura_bar(df):
+    return px.bar(df, x="country", y="general_ltv", color="affiliate", custom_data=["affiliate"],
+                  title="GENERAL LTV by Country and Affiliate", barmode="group",
+                  color_discrete_sequence=px.colors.sequential.YlOrBr)
+
+
+def figura_base(fig):
+    """Figura vacía con título, colores y template: se envía una vez con el layout."""
+    fig.update_layout(paper_bgcolor="#0d0d0d", plot_bgcolor="#0d0d0d",
+                      font_color="#f2f2f2", title_font_color="#D4AF37")
+    return fig
+
+
+_VACIO = pd.DataFrame({c: pd.Series(dtype=object) for c in ["country", "affiliate"]}).assign(general_ltv=0.0)
+FIGURA_AFFILIATE = figura_base(figura_pie(_VACIO, "affiliate", "GENERAL LTV by Affiliate"))
+FIGURA_COUNTRY = figura_base(figura_pie(_VACIO, "country", "GENERAL LTV by Country"))
+FIGURA_BAR = figura_base(figura_bar(_VACIO)).update_layout(legend_title_text="affiliate")
 
 
 # === 8️⃣ Inicializar app ===
 app = dash.Dash(__name__)
 server = app.server
+instrumentar_servidor(server)
+exponer_pool(estadisticas_pool)
+# Después de las métricas: así miden los bytes ya comprimidos
+comprimir_respuestas(server)
+if SINGLE_FLIGHT:
+    coalescer_callbacks(server)
+    METRICAS.append(Lectura(
+        "ltv_callbacks_coalescidos_total", "Callbacks idénticos que esperaron uno igual en curso.",
+        lambda: {(): CALLBACKS_EN_CURSO.coalescidos},
+    ))
+configurar_json()
 app.title = "OBL Digital — GENERAL LTV Dashboard"
 
+
+@server.before_request
+def _iniciar_refresco():
+    datos.iniciar()
+
 # === 9️⃣ Layout (agregamos filtro de Source) ===
-app.layout = html.Div(
-    style={
-        "backgroundColor": "#0d0d0d",
-        "color": "#000000",
-        "fontFamily": "Arial",
-        "padding": "20px",
-    },
-    children=[
-        html.H1("📊 DASHBOARD GENERAL LTV", style={
-            "textAlign": "center",
-            "color": "#D4AF37",
-            "marginBottom": "30px",
-            "fontWeight": "bold"
-        }),
-
-        html.Div(
-            style={"display": "flex", "justifyContent": "space-between"},
-            children=[
-                # --- Panel de Filtros ---
-                html.Div(
-                    style={
-                        "width": "25%",
-                        "backgroundColor": "#1a1a1a",
-                        "padding": "20px",
-                        "borderRadius": "12px",
-                        "boxShadow": "0 0 15px rgba(212,175,55,0.3)",
-                        "textAlign": "center",
-                    },
-                    children=[
-                        html.H4("Date", style={"color": "#D4AF37"}),
-                        dcc.DatePickerRange(
-                            id="filtro-fecha",
-                            start_date=fecha_min,
-                            end_date=fecha_max,
-                            display_format="YYYY-MM-DD",
-                            style={"marginBottom": "25px"},
-                        ),
-
-                        html.H4("Affiliate", style={"color": "#D4AF37"}),
-                        dcc.Dropdown(
-                            sorted(df["affiliate"].dropna().unique()),
-                            [],
-                            multi=True,
-                            id="filtro-affiliate",
-                            style={"marginBottom": "20px"},
-                        ),
-
-                        html.H4("Source", style={"color": "#D4AF37"}),
-                        dcc.Dropdown(
-                            sorted(df["source"].dropna().unique()),
-                            [],
-                            multi=True,
-                            id="filtro-source",
-                            style={"marginBottom": "20px"},
-                        ),
-
-                        html.H4("Country", style={"color": "#D4AF37"}),
-                        dcc.Dropdown(
-                            sorted(df["country"].dropna().unique()),
-                            [],
-                            multi=True,
-                            id="filtro-country",
-                        ),
-                    ],
-                ),
-
-                # --- Panel de contenido ---
-                html.Div(
-                    style={"width": "72%"},
-                    children=[
-                        html.Div(
-                            style={"display": "flex", "justifyContent": "space-around"},
-                            children=[
-                                html.Div(id="indicador-ftds", style={"width": "30%"}),
-                                html.Div(id="indicador-amount", style={"width": "30%"}),
-                                html.Div(id="indicador-ltv", style={"width": "30%"}),
-                            ],
-                        ),
-                        html.Br(),
-                        html.Div(
-                            style={"display": "flex", "flexWrap": "wrap", "gap": "20px"},
-                            children=[
-                                dcc.Graph(id="grafico-ltv-affiliate", style={"width": "48%", "height": "340px"}),
-                                dcc.Graph(id="grafico-ltv-country", style={"width": "48%", "height": "340px"}),
-                                dcc.Graph(id="grafico-bar-country-aff", style={"width": "100%", "height": "360px"}),
-                            ],
-                        ),
-                        html.Br(),
-                        html.H4("📋 Detalle General LTV", style={"color": "#D4AF37"}),
-                        dash_table.DataTable(
-                            id="tabla-detalle",
-                            columns=[
-                                {"name": "DATE", "id": "date"},
-                                {"name": "COUNTRY", "id": "country"},
-                                {"name": "AFFILIATE", "id": "affiliate"},
-                                {"name": "SOURCE", "id": "source"},
-                                {"name": "TOTAL AMOUNT", "id": "usd_total"},
-                                {"name": "FTD'S", "id": "count_ftd"},
-                                {"name": "GENERAL LTV", "id": "general_ltv"},
-                            ],
-                            style_table={"overflowX": "auto", "backgroundColor": "#0d0d0d"},
-                            page_size=15,
-                            style_cell={"textAlign": "center", "color": "#f2f2f2", "backgroundColor": "#1a1a1a"},
-                            style_header={"backgroundColor": "#D4AF37", "color": "#000", "fontWeight": "bold"},
-                        ),
-                    ],
-                ),
-            ],
-        ),
+def construir_layout():
+    """Se evalúa en cada carga de página: opciones y fechas siguen al dataset vigente."""
+    ds = datos.actual()
+    return html.Div(
+        style={
+            "backgroundColor": "#0d0d0d",
+            "color": "#000000",
+            "fontFamily": "Arial",
+            "padding": "20px",
+        },
+        children=[
+            html.H1("📊 DASHBOARD GENERAL LTV", style={
+                "textAlign": "center",
+                "color": "#D4AF37",
+                "marginBottom": "30px",
+                "fontWeight": "bold"
+            }),
+
+            html.Div(
+                style={"display": "flex", "justifyContent": "space-between"},
+                children=[
+                    # --- Panel de Filtros ---
+                    html.Div(
+                        style={
+                            "width": "25%",
+                            "backgroundColor": "#1a1a1a",
+                            "padding": "20px",
+                            "borderRadius": "12px",
+                            "boxShadow": "0 0 15px rgba(212,175,55,0.3)",
+                            "textAlign": "center",
+                        },
+                        children=[
+                            html.H4("Date", style={"color": "#D4AF37"}),
+                            dcc.DatePickerRange(
+                                id="filtro-fecha",
+                                start_date=ds.fecha_min,
+                                end_date=ds.fecha_max,
+                                display_format="YYYY-MM-DD",
+                                style={"marginBottom": "25px"},
+                            ),
+
+                            html.H4("Affiliate", style={"color": "#D4AF37"}),
+                            dcc.Dropdown(
+                                ds.opciones["affiliate"],
+                                [],
+                                multi=True,
+                                id="filtro-affiliate",
+                                style={"marginBottom": "20px"},
+                            ),
+
+                            html.H4("Source", style={"color": "#D4AF37"}),
+                            dcc.Dropdown(
+                                ds.opciones["source"],
+                                [],
+                                multi=True,
+                                id="filtro-source",
+                                style={"marginBottom": "20px"},
+                            ),
+
+                            html.H4("Country", style={"color": "#D4AF37"}),
+                            dcc.Dropdown(
+                                ds.opciones["country"],
+                                [],
+                                multi=True,
+                                id="filtro-country",
+                            ),
+                        ],
+                    ),
+
+                    # --- Panel de contenido ---
+                    html.Div(
+                        style={"width": "72%"},
+                        children=[
+                            html.Div(
+                                style={"display": "flex", "justifyContent": "space-around"},
+                                children=[
+                                    html.Div(tarjeta_kpi("FTD'S", "valor-ftds"),
+                                             id="indicador-ftds", style={"width": "30%"}),
+                                    html.Div(tarjeta_kpi("TOTAL AMOUNT", "valor-amount"),
+                                             id="indicador-amount", style={"width": "30%"}),
+                                    html.Div(tarjeta_kpi("GENERAL LTV (AMOUNT / FTD'S)", "valor-ltv"),
+                                             id="indicador-ltv", style={"width": "30%"}),
+                                ],
+                            ),
+                            dcc.Store(id="totales-kpi"),
+                            # Posición en el ranking de afiliados: > 0 al abrir "Other"
+                            dcc.Store(id="afiliados-desde", data=0),
+                            html.Br(),
+                            html.Button(
+                                "◀ Top affiliates", id="boton-top-afiliados", n_clicks=0,
+                                style={"display": "none"},
+                            ),
+                            html.Div(
+                                style={"display": "flex", "flexWrap": "wrap", "gap": "20px"},
+                                children=[
+                                    dcc.Graph(id="grafico-ltv-affiliate", figure=FIGURA_AFFILIATE,
+                                              style={"width": "48%", "height": "340px"}),
+                                    dcc.Graph(id="grafico-ltv-country", figure=FIGURA_COUNTRY,
+                                              style={"width": "48%", "height": "340px"}),
+                                    dcc.Graph(id="grafico-bar-country-aff", figure=FIGURA_BAR,
+                                              style={"width": "100%", "height": "360px"}),
+                                ],
+                            ),
+                            html.Br(),
+                            html.H4([
+                                "📋 Detalle General LTV",
+                                html.A("⬇ CSV", id="exportar-csv", href="/export/detalle.csv", style=ENLACE_STYLE),
+                                html.A("⬇ Parquet", id="exportar-parquet", href="/export/detalle.parquet",
+                                       style=ENLACE_STYLE),
+                            ], style={"color": "#D4AF37"}),
+                            html.Div(id="tabla-total", style={"color": "#f2f2f2", "marginBottom": "8px"}),
+                            dash_table.DataTable(
+                                id="tabla-detalle",
+                                columns=[
+                                    {"name": "DATE", "id": "date"},
+                                    {"name": "COUNTRY", "id": "country"},
+                                    {"name": "AFFILIATE", "id": "affiliate"},
+                                    {"name": "SOURCE", "id": "source"},
+                                    {"name": "TOTAL AMOUNT", "id": "usd_total"},
+                                    {"name": "FTD'S", "id": "count_ftd"},
+                                    {"name": "GENERAL LTV", "id": "general_ltv"},
+                                ],
+                                style_table={"overflowX": "auto", "backgroundColor": "#0d0d0d"},
+                                # Paginación, orden y filtro se resuelven en el servidor
+                                page_current=0,
+                                page_size=TABLA_PAGE_SIZE,
+                                page_action="custom",
+                                sort_action="custom",
+                                sort_mode="multi",
+                                sort_by=[],
+                                filter_action="custom",
+                                filter_query="",
+                                style_cell={"textAlign": "center", "color": "#f2f2f2", "backgroundColor": "#1a1a1a"},
+                                style_header={"backgroundColor": "#D4AF37", "color": "#000", "fontWeight": "bold"},
+                            ),
+                        ],
+                    ),
+                ],
+            ),
+        ],
+    )
+
+app.layout = construir_layout
+
+# === 🔟 Callbacks (se agrega parámetro filtro-source) ===
+# Cada salida tiene su propio callback: el más rápido no espera al más lento,
+# y todos leen el mismo agregado filtrado desde la cache.
+FILTROS = [
+    Input("filtro-fecha", "start_date"),
+    Input("filtro-fecha", "end_date"),
+    Input("filtro-affiliate", "value"),
+    Input("filtro-source", "value"),
+    Input("filtro-country", "value"),
+]
+
+
+# === Opciones en cascada: cada dropdown ofrece solo valores con datos para los demás filtros ===
+@app.callback(
+    [
+        Output("filtro-affiliate", "options"),
+        Output("filtro-source", "options"),
+        Output("filtro-country", "options"),
+    ],
+    FILTROS,
+)
+def actualizar_opciones(start, end, affiliates, sources, countries):
+    # Se responde desde el índice de co-ocurrencias del dataset, sin tocar el frame
+    ds = datos.actual()
+    with etapa("opciones"):
+        opciones = ds.indice_opciones.opciones(start, end, affiliates, sources, countries)
+    # Lo ya elegido sigue en la lista aunque no tenga datos: así se puede quitar
+    return [
+        sorted(set(opciones[dim]).union(elegidos or []))
+        for dim, elegidos in (("affiliate", affiliates), ("source", sources), ("country", countries))
+    ]
+
+
+def resumen_filtrado(start, end, affiliates, sources, countries):
+    # Un único dataset por request, aunque el refresco publique otro mientras tanto
+    ds = datos.actual()
+    filtros = normalizar_filtros(start, end, affiliates, sources, countries)
+    return cache.obtener_o_calcular(
+        filtros,
+        lambda: calcular_resumen(ds, start, end, affiliates, sources, countries),
+        version=ds.huella,
+    )
+
+
+def calcular_resumen(ds, start, end, affiliates, sources, countries):
+    if ds.cubo is not None:
+        # El cubo filtra y agrega en un solo paso
+        with etapa("agregar"):
+            return ds.cubo.resumen(start, end, affiliates, sources, countries, con_detalle=False)
+    with etapa("filtrar"):
+        df = ds.motor.filtrar(start, end, affiliates, sources, countries)
+    with etapa("agregar"):
+        resumen = resumen_con_groupby(df, ds.dimensiones)
+    resumen["detalle"] = None
+    return resumen
+
+
+@app.callback(Output("totales-kpi", "data"), FILTROS)
+def actualizar_totales(start, end, affiliates, sources, countries):
+    resumen = resumen_filtrado(start, end, affiliates, sources, countries)
+    return {"ftds": resumen["total_ftd"], "amount": resumen["total_usd"]}
+
+
+app.clientside_callback(
+    FORMATO_KPIS_JS,
+    [
+        Output("valor-ftds", "children"),
+        Output("valor-amount", "children"),
+        Output("valor-ltv", "children"),
+    ],
+    Input("totales-kpi", "data"),
+)
+
+
+def _patch_pie(df, nombres):
+    """Solo cambian etiquetas y valores de la única traza del pie."""
+    with etapa("figura"):
+        figura = Patch()
+        traza = figura_pie(df, nombres, None).data[0]
+        figura["data"][0]["labels"] = traza.labels
+        figura["data"][0]["values"] = traza.values
+    return figura
+
+
+# === Top-N de afiliados + "Other" (clic en "Other" para abrirlo) ===
+BOTON_TOP_STYLE = {
+    "backgroundColor": "#1a1a1a", "color": "#D4AF37", "border": "1px solid #D4AF37",
+    "borderRadius": "6px", "padding": "4px 12px", "marginBottom": "10px", "cursor": "pointer",
+}
+
+
+def _afiliado_clicado(click):
+    punto = ((click or {}).get("points") or [{}])[0]
+    return punto.get("label") or (punto.get("customdata") or [None])[0]
+
+
+@app.callback(
+    [Output("afiliados-desde", "data"), Output("boton-top-afiliados", "style")],
+    FILTROS + [
+        Input("grafico-ltv-affiliate", "clickData"),
+        Input("grafico-bar-country-aff", "clickData"),
+        Input("boton-top-afiliados", "n_clicks"),
     ],
+    State("afiliados-desde", "data"),
 )
+def navegar_otros(start, end, affiliates, sources, countries, click_pie, click_bar, n_clicks, desde):
+    """Un clic en "Other" muestra los siguientes TOP_AFILIADOS; filtros o el botón vuelven al top."""
+    desde = desde or 0
+    click = {"grafico-ltv-affiliate": click_pie, "grafico-bar-country-aff": click_bar}.get(ctx.triggered_id)
+    if click is not None:
+        if not TOP_AFILIADOS or _afiliado_clicado(click) != OTROS:
+            return no_update, no_update
+        desde += TOP_AFILIADOS
+    elif desde == 0:
+        return no_update, no_update
+    else:
+        desde = 0
+    return desde, dict(BOTON_TOP_STYLE) if desde else {"display": "none"}
+
+
+def _desde_vigente(desde):
+    """Con un cambio de filtros el ranking vuelve a empezar (navegar_otros resetea el Store)."""
+    return (desde or 0) if "afiliados-desde.data" in ctx.triggered_prop_ids else 0
+
+
+def afiliados_top(resumen, desde):
+    """por_affiliate y por_country_affiliate con los afiliados fuera del top sumados en OTROS."""
+    ranking = ranking_afiliados(resumen["por_affiliate"], CRITERIO_TOP)
+    with etapa("top_afiliados"):
+        por_affiliate, _ = top_n_con_otros(resumen["por_affiliate"], ranking, TOP_AFILIADOS, desde, OTROS)
+        por_celda, _ = top_n_con_otros(
+            resumen["por_country_affiliate"], ranking, TOP_AFILIADOS, desde, OTROS, por=["country"]
+        )
+    return por_affiliate, por_celda
+
 
-# === 🔟 Callback (se agrega parámetro filtro-source) ===
+@app.callback(
+    Output("grafico-ltv-affiliate", "figure"), FILTROS + [Input("afiliados-desde", "data")]
+)
+def actualizar_grafico_affiliate(start, end, affiliates, sources, countries, desde=0):
+    resumen = resumen_filtrado(start, end, affiliates, sources, countries)
+    return _patch_pie(afiliados_top(resumen, _desde_vigente(desde))[0], "affiliate")
+
+
+@app.callback(Output("grafico-ltv-country", "figure"), FILTROS)
+def actualizar_grafico_country(start, end, affiliates, sources, countries):
+    return _patch_pie(resumen_filtrado(start, end, affiliates, sources, countries)["por_country"], "country")
+
+
+@app.callback(
+    Output("grafico-bar-country-aff", "figure"), FILTROS + [Input("afiliados-desde", "data")]
+)
+def actualizar_grafico_bar(start, end, affiliates, sources, countries, desde=0):
+    # Una traza por affiliate del top (+ Other): se reemplaza la lista de trazas, el layout no viaja
+    resumen = resumen_filtrado(start, end, affiliates, sources, countries)
+    por_celda = afiliados_top(resumen, _desde_vigente(desde))[1]
+    with etapa("figura"):
+        figura = Patch()
+        figura["data"] = figura_bar(por_celda).data
+    return figura
+
+
+# === 1️⃣1️⃣ Tabla detalle: solo viaja la página visible ===
 @app.callback(
     [
-        Output("indicador-ftds", "children"),
-        Output("indicador-amount", "children"),
-        Output("indicador-ltv", "children"),
-        Output("grafico-ltv-affiliate", "figure"),
-        Output("grafico-ltv-country", "figure"),
-        Output("grafico-bar-country-aff", "figure"),
         Output("tabla-detalle", "data"),
+        Output("tabla-detalle", "page_count"),
+        Output("tabla-detalle", "page_current"),
+        Output("tabla-total", "children"),
     ],
-    [
-        Input("filtro-fecha", "start_date"),
-        Input("filtro-fecha", "end_date"),
-        Input("filtro-affiliate", "value"),
-        Input("filtro-source", "value"),
-        Input("filtro-country", "value"),
+    FILTROS + [
+        Input("tabla-detalle", "page_current"),
+        Input("tabla-detalle", "page_size"),
+        Input("tabla-detalle", "sort_by"),
+        Input("tabla-detalle", "filter_query"),
     ],
 )
-def actualizar_dashboard(start, end, affiliates, sources, countries):
-    df_filtrado = df.copy()
-
-    if start and end:
-        start_dt, end_dt = pd.to_datetime(start), pd.to_datetime(end)
-        df_filtrado = df_filtrado[(df_filtrado["date"] >= start_dt) & (df_filtrado["date"] <= end_dt)]
-    if affiliates:
-        df_filtrado = df_filtrado[df_filtrado["affiliate"].isin(affiliates)]
-    if sources:
-        df_filtrado = df_filtrado[df_filtrado["source"].isin(sources)]
-    if countries:
-        df_filtrado = df_filtrado[df_filtrado["country"].isin(countries)]
-
-    # === Agrupar por fecha, país, afiliado y source ===
-    df_agregado = (
-        df_filtrado.groupby(["date", "country", "affiliate", "source"], as_index=False)
-        .agg({"usd_total": "sum", "count_ftd": "sum"})
-    )
-    df_agregado["general_ltv"] = df_agregado.apply(
-        lambda r: r["usd_total"] / r["count_ftd"] if r["count_ftd"] > 0 else 0, axis=1
+def actualizar_tabla(start, end, affiliates, sources, countries, page_current, page_size, sort_by, filter_query):
+    ds = datos.actual()
+
+    # Si cambian los filtros u orden, se vuelve a la primera página
+    if "tabla-detalle.page_current" not in ctx.triggered_prop_ids:
+        page_current = 0
+
+    if hasattr(ds.cubo, "pagina_detalle") and not filter_query:
+        # Modo SQL: la base ordena y recorta, el worker solo recibe la página
+        with etapa("tabla"):
+            filas, total, paginas, pagina = ds.cubo.pagina_detalle(
+                start, end, affiliates, sources, countries, page_current, page_size, sort_by
+            )
+            registros = registros_tabla(filas)
+        return registros, paginas, pagina, f"{total:,} filas"
+
+    filtros = normalizar_filtros(start, end, affiliates, sources, countries)
+    detalle = cache_detalle.obtener_o_calcular(
+        filtros,
+        lambda: calcular_detalle(ds, start, end, affiliates, sources, countries),
+        version=ds.huella,
     )
+    with etapa("tabla"):
+        registros, total, paginas, pagina = pagina_tabla(detalle, page_current, page_size, sort_by, filter_query)
+    return registros, paginas, pagina, f"{total:,} filas"
 
-    # === Totales ===
-    total_amount = df_agregado["usd_total"].sum()
-    total_ftds = df_agregado["count_ftd"].sum()
-    general_ltv_total = total_amount / total_ftds if total_ftds > 0 else 0
-
-    card_style = {
-        "backgroundColor": "#1a1a1a",
-        "borderRadius": "10px",
-        "padding": "20px",
-        "width": "80%",
-        "textAlign": "center",
-        "boxShadow": "0 0 10px rgba(212,175,55,0.3)",
-    }
-
-    indicador_ftds = html.Div([
-        html.H4("FTD'S", style={"color": "#D4AF37", "fontWeight": "bold"}),
-        html.H2(f"{int(total_ftds):,}", style={"color": "#FFFFFF", "fontSize": "36px"})
-    ], style=card_style)
-
-    indicador_amount = html.Div([
-        html.H4("TOTAL AMOUNT", style={"color": "#D4AF37", "fontWeight": "bold"}),
-        html.H2(f"${formato_km(total_amount)}", style={"color": "#FFFFFF", "fontSize": "36px"})
-    ], style=card_style)
-
-    indicador_ltv = html.Div([
-        html.H4("GENERAL LTV (AMOUNT / FTD'S)", style={"color": "#D4AF37", "fontWeight": "bold"}),
-        html.H2(f"${general_ltv_total:,.2f}", style={"color": "#FFFFFF", "fontSize": "36px"})
-    ], style=card_style)
-
-    # === Gráficos ===
-    df_aff = df_agregado.groupby("affiliate", as_index=False).agg({"usd_total": "sum", "count_ftd": "sum"})
-    df_aff["general_ltv"] = df_aff.apply(lambda r: r["usd_total"] / r["count_ftd"] if r["count_ftd"] > 0 else 0, axis=1)
-    fig_affiliate = px.pie(df_aff, names="affiliate", values="general_ltv",
-                           title="GENERAL LTV by Affiliate", color_discrete_sequence=px.colors.sequential.YlOrBr)
-
-    df_cty = df_agregado.groupby("country", as_index=False).agg({"usd_total": "sum", "count_ftd": "sum"})
-    df_cty["general_ltv"] = df_cty.apply(lambda r: r["usd_total"] / r["count_ftd"] if r["count_ftd"] > 0 else 0, axis=1)
-    fig_country = px.pie(df_cty, names="country", values="general_ltv",
-                         title="GENERAL LTV by Country", color_discrete_sequence=px.colors.sequential.YlOrBr)
-
-    df_bar = df_agregado.groupby(["country", "affiliate"], as_index=False).agg({"usd_total": "sum", "count_ftd": "sum"})
-    df_bar["general_ltv"] = df_bar.apply(lambda r: r["usd_total"] / r["count_ftd"] if r["count_ftd"] > 0 else 0, axis=1)
-    fig_bar = px.bar(df_bar, x="country", y="general_ltv", color="affiliate",
-                     title="GENERAL LTV by Country and Affiliate", barmode="group",
-                     color_discrete_sequence=px.colors.sequential.YlOrBr)
-
-    for fig in [fig_affiliate, fig_country, fig_bar]:
-        fig.update_layout(paper_bgcolor="#0d0d0d", plot_bgcolor="#0d0d0d",
-                          font_color="#f2f2f2", title_font_color="#D4AF37")
-
-    # === Tabla ===
-    tabla = df_agregado.copy()
-    tabla["date"] = tabla["date"].dt.strftime("%Y-%m-%d")
-    tabla_data = tabla.round(2).to_dict("records")
-
-    return indicador_ftds, indicador_amount, indicador_ltv, fig_affiliate, fig_country, fig_bar, tabla_data
+
+def calcular_detalle(ds, start, end, affiliates, sources, countries):
+    if ds.cubo is not None:
+        with etapa("agregar_detalle"):
+            return ds.cubo.detalle_filtrado(start, end, affiliates, sources, countries)
+    with etapa("filtrar"):
+        df = ds.motor.filtrar(start, end, affiliates, sources, countries)
+    with etapa("agregar_detalle"):
+        return resumen_con_groupby(df, ds.dimensiones)["detalle"]
+
+
+# === Exportación del detalle filtrado (CSV / Parquet en streaming) ===
+registrar_exportacion(server, datos, calcular_detalle)
+
+app.clientside_callback(
+    ENLACES_EXPORTACION_JS,
+    [Output("exportar-csv", "href"), Output("exportar-parquet", "href")],
+    FILTROS,
+)
 
 
 # === 9️⃣ Captura PDF/PPT desde iframe ===
@@ -364,6 +556,13 @@ app.index_string = '''
 </html>
 '''
 
+fases_arranque["app"] = time.perf_counter() - _marca
+registrar(
+    "arranque", modo=ARRANQUE, pid=os.getpid(),
+    fases_ms={fase: round(segundos * 1000, 1) for fase, segundos in fases_arranque.items()},
+    total_ms=round((time.perf_counter() - _INICIO_ARRANQUE) * 1000, 1),
+)
+
 
 if __name__ == "__main__":
     app.run_server(debug=True, port=8053)
@@ -0,0 +1,388 @@
+import hashlib
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from conexion_mysql import obtener_engine
+from limpieza_montos import parse_amounts
+from motor_filtros import MotorFiltros
+from cubo_ltv import DIMENSIONES, CuboLTV
+from cache_resultados import huella_dataset
+from consultas_sql import ConsultasSQL, senal_rollups
+from opciones_filtros import IndiceOpciones
+from metricas_ltv import etapa, registrar
+from snapshot_ltv import SNAPSHOT_PATH, leer_snapshot, metadatos_snapshot, senal_tabla, snapshot_vigente
+
+# ======================================================
+#  OBL DIGITAL — Carga, limpieza y recarga en caliente del dataset del dashboard
+# ======================================================
+
+CSV_PATH = "GENERAL_LTV_preview.csv"
+TABLA_CLEAN = "GENERAL_LTV_PGY_CLEAN"
+
+# Cada cuántos segundos se consulta la señal de cambio (0 = sin recarga automática)
+REFRESH_SECONDS = int(os.getenv("LTV_REFRESH_SECONDS", "300"))
+
+# Representación compacta en memoria (categóricas, enteros) y float32 opcional para montos
+COMPACTAR = os.getenv("LTV_COMPACTAR", "1") == "1"
+USAR_FLOAT32 = os.getenv("LTV_FLOAT32", "0") == "1"
+
+# "memoria": la tabla completa vive en cada worker | "sql": filtros y agregados se resuelven en la base
+BACKEND = os.getenv("LTV_BACKEND", "memoria")
+
+# "bloqueante": el import espera el dataset (snapshot vigente, base o CSV) |
+# "snapshot": se publica al instante la copia local y la base se lee en segundo plano
+ARRANQUE = os.getenv("LTV_ARRANQUE", "bloqueante")
+
+COLUMNAS_DATASET = ["date", "country", "affiliate", "source", "usd_total", "count_ftd", "general_ltv"]
+
+
+def cargar_datos():
+    """Carga datos desde el snapshot local (si está al día), MySQL o CSV local."""
+    meta = metadatos_snapshot()
+    if meta is not None and snapshot_vigente(meta, senal_tabla(TABLA_CLEAN)):
+        print(f"⚡ Leyendo snapshot {SNAPSHOT_PATH} (generado {meta['generado']})...")
+        return leer_snapshot()
+
+    try:
+        with obtener_engine().connect() as conexion:
+            print("✅ Leyendo GENERAL_LTV_PGY_CLEAN desde Railway MySQL...")
+            query = f"SELECT * FROM {TABLA_CLEAN}"
+            return pd.read_sql(query, conexion)
+    except Exception as e:
+        print(f"⚠️ Error conectando a SQL, leyendo copia local: {e}")
+
+    if meta is not None:
+        print(f"📁 Leyendo snapshot {SNAPSHOT_PATH} (local)...")
+        return leer_snapshot()
+    print("📁 Leyendo GENERAL_LTV_preview.csv (local)...")
+    return pd.read_csv(CSV_PATH, dtype=str)
+
+
+def cargar_local():
+    """
+    Snapshot o CSV local sin tocar la base. Devuelve (df, señal con la que se selló
+    el snapshot o None); sin copia local, un dataset vacío.
+    """
+    meta = metadatos_snapshot()
+    if meta is not None:
+        print(f"⚡ Leyendo snapshot {SNAPSHOT_PATH} (generado {meta['generado']}, sin consultar la base)...")
+        return leer_snapshot(), tuple(meta["senal_db"]) if meta["senal_db"] else None
+    if os.path.exists(CSV_PATH):
+        print("📁 Leyendo GENERAL_LTV_preview.csv (local, sin consultar la base)...")
+        return pd.read_csv(CSV_PATH, dtype=str), None
+    print("⚠️ Sin copia local: se publica un dataset vacío hasta que responda la base.")
+    return pd.DataFrame({c: pd.Series(dtype=object) for c in COLUMNAS_DATASET}), None
+
+
+def convertir_fecha(valor):
+    try:
+        s = str(valor).strip()
+        if "/" in s:
+            return pd.to_datetime(s, format="%d/%m/%Y", errors="coerce")
+        elif "-" in s:
+            return pd.to_datetime(s.split(" ")[0], errors="coerce")
+    except Exception:
+        return pd.NaT
+    return pd.NaT
+
+
+def _limpiar_texto(serie: pd.Series) -> pd.Series:
+    """strip + title sobre los valores distintos; 'Nan'/'None'/'' quedan como None."""
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    limpios = pd.Series(unicos, dtype=object).astype(str).str.strip().str.title()
+    limpios = limpios.replace({"Nan": None, "None": None, "": None}).to_numpy(dtype=object)
+    return pd.Series(limpios[codigos], index=serie.index, dtype=object)
+
+
+def _a_float(serie: pd.Series) -> pd.Series:
+    """Columnas ya float64 y sin nulos (snapshot tipado) se conservan sin copiar."""
+    if serie.dtype == "float64" and not serie.hasnans:
+        return serie
+    return pd.to_numeric(serie, errors="coerce").fillna(0).astype(float)
+
+
+def preparar_datos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza columnas, fechas, montos y textos del dataset crudo.
+    Con columnas ya tipadas (snapshot) evita re-parsear y copiar lo que ya está limpio.
+    """
+    df = df.copy(deep=False)
+    df.columns = [c.strip().lower() for c in df.columns]
+
+    # === Normalizar columnas ===
+    if "usd_total" not in df.columns:
+        for alt in ["usd", "total_amount"]:
+            if alt in df.columns:
+                df.rename(columns={alt: "usd_total"}, inplace=True)
+                break
+
+    if "count_ftd" not in df.columns:
+        for alt in ["ftd", "ftds", "count"]:
+            if alt in df.columns:
+                df.rename(columns={alt: "count_ftd"}, inplace=True)
+                break
+
+    # === Normalizar fechas ===
+    with etapa("preparar_fechas"):
+        if pd.api.types.is_datetime64_dtype(df["date"]):
+            # Mismo resultado que convertir_fecha: solo la parte de fecha
+            dias = df["date"].dt.normalize()
+            if not dias.equals(df["date"]):
+                df["date"] = dias
+        else:
+            df["date"] = df["date"].astype(str).str.strip().apply(convertir_fecha)
+        if df["date"].hasnans:
+            df = df[df["date"].notna()]
+        if not pd.api.types.is_datetime64_dtype(df["date"]):
+            df["date"] = pd.to_datetime(df["date"], utc=False).dt.tz_localize(None)
+
+    # === Limpieza de montos ===
+    with etapa("preparar_montos"):
+        if pd.api.types.is_float_dtype(df["usd_total"]):
+            df["usd_total"] = _a_float(df["usd_total"])
+        else:
+            df["usd_total"] = parse_amounts(df["usd_total"])
+        df["count_ftd"] = _a_float(df["count_ftd"]) if "count_ftd" in df.columns else 0.0
+        df["general_ltv"] = _a_float(df["general_ltv"]) if "general_ltv" in df.columns else 0.0
+
+    # === Limpieza de texto ===
+    with etapa("preparar_texto"):
+        for col in ["country", "affiliate", "source"]:
+            if col in df.columns:
+                df[col] = _limpiar_texto(df[col])
+
+    # === Eliminar duplicados exactos ===
+    # (el CSV y el snapshot del ETL no traen source)
+    with etapa("preparar_duplicados"):
+        claves = [c for c in ["date", "country", "affiliate", "source"] if c in df.columns]
+        duplicadas = df.duplicated(subset=claves, keep="last")
+        return df[~duplicadas] if duplicadas.any() else df
+
+
+def compactar_datos(df: pd.DataFrame, float32=USAR_FLOAT32) -> pd.DataFrame:
+    """
+    Tipos compactos para el frame que vive en cada worker:
+    - country/affiliate/source como categóricas (un diccionario de valores por dimensión,
+      que reutilizan el motor de filtros y el cubo);
+    - count_ftd entero cuando todos los valores lo son;
+    - usd_total/general_ltv en float32 si float32=True y el redondeo no mueve ningún centavo.
+    """
+    df = df.copy(deep=False)
+    for col in ["country", "affiliate", "source"]:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(pd.CategoricalDtype(sorted(df[col].dropna().unique())))
+
+    if "count_ftd" in df.columns:
+        ftd = df["count_ftd"].to_numpy()
+        if ftd.dtype.kind == "f" and np.array_equal(ftd, np.round(ftd)) and np.abs(ftd).max(initial=0) < 2**31:
+            df["count_ftd"] = ftd.astype(np.int32)
+
+    if float32:
+        for col in ["usd_total", "general_ltv"]:
+            valores = df[col].to_numpy(dtype=float)
+            reducidos = valores.astype(np.float32)
+            if np.abs(reducidos.astype(float) - valores).max(initial=0) < 0.005:
+                df[col] = reducidos
+    return df
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(index=True, deep=True).sum() / 1024 ** 2
+
+
+def reportar_memoria(df: pd.DataFrame, df_original: pd.DataFrame = None):
+    """Log por worker: tamaño del frame (y del original sin compactar) y RSS máximo del proceso."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    detalle = f" (sin compactar {memoria_mb(df_original):.1f} MB)" if df_original is not None else ""
+    print(f"🧠 pid {os.getpid()}: dataset {memoria_mb(df):.1f} MB{detalle}, RSS máx. {rss:.0f} MB")
+
+
+def senal_cambio():
+    """
+    Señal barata de cambio: filas y fecha máxima de la tabla (y, en modo SQL, estado de
+    sus rollups), o mtime del snapshot / CSV local.
+    """
+    senal = senal_tabla(TABLA_CLEAN)
+    if BACKEND == "sql":
+        # En modo SQL importan la tabla y sus rollups: si se publican después que la tabla,
+        # el próximo DatasetSQL vuelve a evaluar si están al día
+        return senal + (senal_rollups(TABLA_CLEAN),) if senal is not None else None
+    if senal is not None:
+        meta = metadatos_snapshot()
+        if meta is not None and meta["senal_db"] is None:
+            # Snapshot más nuevo que la tabla: también cuentan su fecha de escritura y si
+            # sigue vigente (deja de estarlo cuando cambia la tabla o vence su plazo)
+            return senal + (meta["mtime"], snapshot_vigente(meta, senal))
+        return senal
+    if os.path.exists(SNAPSHOT_PATH):
+        return ("snapshot", os.path.getmtime(SNAPSHOT_PATH))
+    if os.path.exists(CSV_PATH):
+        return ("csv", os.path.getmtime(CSV_PATH))
+    return None
+
+
+class DatasetLTV:
+    """Dataset limpio + índices derivados. Inmutable una vez construido."""
+
+    def __init__(self, df: pd.DataFrame, version: int, senal=None):
+        self.motor = MotorFiltros(df)
+        self.df = self.motor.df
+        # El CSV y el snapshot del ETL no traen source: cubo y respaldo usan las dimensiones presentes
+        self.dimensiones = [d for d in DIMENSIONES if d in self.df.columns]
+        self.cubo = (
+            CuboLTV(self.df, dimensiones=self.dimensiones)
+            if {"country", "affiliate"} <= set(self.dimensiones) else None
+        )
+        self.fecha_min, self.fecha_max = self.df["date"].min(), self.df["date"].max()
+        self.opciones = {
+            col: sorted(self.df[col].dropna().unique()) if col in self.df.columns else []
+            for col in ["country", "affiliate", "source"]
+        }
+        # Opciones en cascada de los dropdowns (combinaciones por mes)
+        self.indice_opciones = IndiceOpciones.desde_motor(self.motor)
+        self.huella = huella_dataset(self.df)
+        self.version = version
+        self.senal = senal
+
+
+class DatasetSQL:
+    """
+    Mismo contrato que DatasetLTV sin cargar filas: cubo consulta la base y las
+    opciones de los dropdowns y el rango de fechas se leen una vez por versión.
+    """
+
+    def __init__(self, version: int, senal=None, tabla=TABLA_CLEAN):
+        self.cubo = ConsultasSQL(tabla)
+        self.dimensiones = self.cubo.dimensiones
+        self.motor = None
+        self.df = None
+        self.fecha_min, self.fecha_max = self.cubo.fecha_min, self.cubo.fecha_max
+        self.opciones = self.cubo.opciones()
+        self.indice_opciones = IndiceOpciones.desde_frame(self.cubo.combinaciones())
+        # La señal (filas + fecha máxima) identifica el contenido para las caches
+        self.huella = hashlib.sha1(repr((tabla, senal)).encode()).hexdigest()[:16]
+        self.version = version
+        self.senal = senal
+
+
+class RefrescoDatos:
+    """
+    Mantiene el DatasetLTV vigente. Un hilo en segundo plano consulta senal_cambio()
+    y, si cambió, reconstruye el dataset fuera del camino de los requests y lo publica
+    con un único cambio de referencia: cada request ve un dataset completo, viejo o nuevo.
+    """
+
+    def __init__(self, intervalo=REFRESH_SECONDS):
+        self.intervalo = intervalo
+        self._actual = None
+        self._lock = threading.Lock()
+        self._lock_inicial = threading.Lock()
+        self._suscriptores = []
+        self._pid_hilo = None
+        self._lock_hilo = threading.Lock()
+        # Arranque desde la copia local: falta la primera lectura de la base
+        self._pendiente = False
+
+    def al_actualizar(self, funcion):
+        """Registra funcion(dataset), llamada cada vez que se publica un dataset nuevo."""
+        self._suscriptores.append(funcion)
+        if self._actual is not None:
+            funcion(self._actual)
+
+    def actual(self) -> DatasetLTV:
+        if self._actual is None:
+            with self._lock_inicial:
+                if self._actual is None:
+                    self.recargar()
+        return self._actual
+
+    def recargar(self):
+        with self._lock:
+            # La señal se toma antes de leer para no perder cambios ocurridos durante la carga
+            senal = senal_cambio()
+            inicio = time.perf_counter()
+            version = self._actual.version + 1 if self._actual is not None else 1
+            if BACKEND == "sql":
+                with etapa("opciones_sql", log=True):
+                    nuevo = DatasetSQL(version, senal)
+                self._actual = nuevo
+                print(f"🔄 Dataset v{version} publicado (modo SQL sobre {TABLA_CLEAN}, "
+                      f"{time.perf_counter() - inicio:.2f}s)")
+            else:
+                with etapa("cargar_datos", log=True) as medida:
+                    crudo = cargar_datos()
+                    medida["filas"] = len(crudo)
+                nuevo = self._publicar(crudo, version, senal, inicio)
+        for funcion in self._suscriptores:
+            funcion(nuevo)
+        return nuevo
+
+    def _publicar(self, crudo, version, senal, inicio):
+        df = preparar_datos(crudo)
+        del crudo
+        with etapa("compactar_datos"):
+            compacto = compactar_datos(df) if COMPACTAR else df
+        with etapa("indices_dataset", log=True) as medida:
+            nuevo = DatasetLTV(compacto, version, senal)
+            medida["filas"] = len(nuevo.df)
+        self._actual = nuevo
+        print(f"🔄 Dataset v{version} publicado ({len(nuevo.df)} filas, {time.perf_counter() - inicio:.2f}s)")
+        reportar_memoria(nuevo.df, df if COMPACTAR else None)
+        return nuevo
+
+    def arrancar(self, modo=ARRANQUE):
+        """
+        Dataset para servir el primer request. En modo "snapshot" se publica la copia
+        local sin consultar la base y el hilo de refresco (iniciar) hace la primera
+        lectura apenas arranca; con gunicorn --preload esto corre una vez en el master
+        y los workers heredan el frame por copy-on-write. El modo SQL necesita la base
+        para todo: siempre es bloqueante.
+        """
+        if modo != "snapshot" or BACKEND == "sql":
+            return self.actual()
+        with self._lock_inicial:
+            if self._actual is None:
+                with self._lock:
+                    inicio = time.perf_counter()
+                    with etapa("cargar_local", log=True) as medida:
+                        crudo, senal = cargar_local()
+                        medida["filas"] = len(crudo)
+                    nuevo = self._publicar(crudo, 1, senal, inicio)
+                    self._pendiente = True
+                for funcion in self._suscriptores:
+                    funcion(nuevo)
+        return self._actual
+
+    def _bucle(self):
+        # Tras un arranque desde la copia local, la primera consulta a la base es inmediata
+        espera = 0 if self._pendiente else self.intervalo
+        while True:
+            time.sleep(espera)
+            espera = self.intervalo
+            inicio = time.perf_counter()
+            try:
+                actual = self._actual
+                recargado = actual is None or senal_cambio() != actual.senal
+                if recargado:
+                    self.recargar()
+            except Exception as e:
+                recargado = False
+                print(f"⚠️ Error recargando datos en segundo plano: {e}")
+            if self._pendiente:
+                self._pendiente = False
+                registrar("arranque_base", pid=os.getpid(), recargado=recargado,
+                          segundos=round(time.perf_counter() - inicio, 4))
+            if self.intervalo <= 0:
+                return
+
+    def iniciar(self):
+        """Arranca el hilo de refresco una vez por proceso (seguro tras el fork de gunicorn)."""
+        with self._lock_hilo:
+            if (self.intervalo <= 0 and not self._pendiente) or self._pid_hilo == os.getpid():
+                return
+            self._pid_hilo = os.getpid()
+        threading.Thread(target=self._bucle, name="ltv-refresco", daemon=True).start()
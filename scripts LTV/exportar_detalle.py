@@ -0,0 +1,158 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ======================================================
+#  OBL DIGITAL — Exportación en streaming del detalle filtrado (CSV / Parquet)
+# ======================================================
+
+# Días de detalle que se arman por vez: la memoria depende del bloque, no del total exportado
+DIAS_POR_BLOQUE = int(os.getenv("LTV_EXPORT_DIAS", "7"))
+
+# Esquema de una exportación sin filas (mismas columnas que la tabla detalle)
+ESQUEMA_VACIO = pa.schema([
+    ("date", pa.timestamp("ns")), ("country", pa.string()), ("affiliate", pa.string()), ("source", pa.string()),
+    ("usd_total", pa.float64()), ("count_ftd", pa.float64()), ("general_ltv", pa.float64()),
+])
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def bloques_fechas(start, end, fecha_min, fecha_max, dias=DIAS_POR_BLOQUE):
+    """Tramos [desde, hasta] consecutivos de `dias` días dentro del rango pedido y del dataset."""
+    if pd.isna(fecha_min) or pd.isna(fecha_max):
+        return
+    desde = max(pd.to_datetime(start).normalize(), fecha_min) if start and end else fecha_min
+    fin = min(pd.to_datetime(end).normalize(), fecha_max) if start and end else fecha_max
+    while desde <= fin:
+        hasta = min(desde + pd.Timedelta(days=dias - 1), fin)
+        yield desde, hasta
+        desde = hasta + pd.Timedelta(days=1)
+
+
+def bloques_detalle(calcular_detalle, ds, start, end, affiliates, sources, countries, dias=DIAS_POR_BLOQUE):
+    """Detalle agregado por tramos de fecha, en el mismo orden que la tabla (date, dimensiones)."""
+    for desde, hasta in bloques_fechas(start, end, ds.fecha_min, ds.fecha_max, dias):
+        bloque = calcular_detalle(ds, desde, hasta, affiliates, sources, countries)
+        if len(bloque):
+            yield bloque
+
+
+def _para_csv(bloque: pd.DataFrame) -> pd.DataFrame:
+    bloque = bloque.round({"usd_total": 2, "general_ltv": 2})
+    ftd = bloque["count_ftd"]
+    if ftd.dtype.kind == "f" and (ftd == ftd.round()).all():
+        bloque["count_ftd"] = ftd.astype("int64")
+    return bloque
+
+
+def csv_por_bloques(bloques):
+    """Encabezado y luego un trozo de CSV por bloque (nunca el archivo completo en memoria)."""
+    encabezado = True
+    for bloque in bloques:
+        yield _para_csv(bloque).to_csv(index=False, header=encabezado, date_format="%Y-%m-%d", lineterminator="\n")
+        encabezado = False
+    if encabezado:
+        yield ",".join(ESQUEMA_VACIO.names) + "\n"
+
+
+class _Salida:
+    """Archivo de solo escritura para ParquetWriter: acumula lo escrito hasta que se vacía."""
+
+    def __init__(self):
+        self.partes, self.posicion, self.closed = [], 0, False
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self):
+        datos, self.partes = b"".join(self.partes), []
+        return datos
+
+
+def parquet_por_bloques(bloques):
+    """Un row group por bloque; cada uno se envía apenas se escribe."""
+    salida = _Salida()
+    escritor = None
+    for bloque in bloques:
+        # Categóricas como texto: el diccionario de cada bloque puede cambiar de tipo de índice
+        categoricas = {c: str for c in bloque.columns if isinstance(bloque[c].dtype, pd.CategoricalDtype)}
+        tabla = pa.Table.from_pandas(bloque.astype(categoricas), preserve_index=False)
+        if escritor is None:
+            escritor = pq.ParquetWriter(salida, tabla.schema)
+        escritor.write_table(tabla.cast(escritor.schema))
+        yield salida.vaciar()
+    if escritor is None:
+        escritor = pq.ParquetWriter(salida, ESQUEMA_VACIO)
+    escritor.close()
+    yield salida.vaciar()
+
+
+def fecha_parametro(valor):
+    """Fecha de un parámetro de la URL (sin zona horaria); ValueError si no es una fecha válida."""
+    if not valor:
+        return None
+    fecha = pd.to_datetime(valor)
+    if pd.isna(fecha) or fecha.tzinfo is not None:
+        raise ValueError(f"fecha inválida: {valor!r}")
+    return fecha.normalize()
+
+
+def _lista(args, nombre):
+    """?affiliate=a&affiliate=b o ?affiliate=a,b"""
+    return [v for valor in args.getlist(nombre) for v in valor.split(",") if v]
+
+
+def registrar_exportacion(server, datos, calcular_detalle, ruta="/export/detalle.<formato>"):
+    """
+    GET ruta?start_date=&end_date=&affiliate=&source=&country= con los mismos filtros que
+    los callbacks. La respuesta se genera por bloques de fechas (chunked): el worker
+    nunca arma el detalle completo ni la lista de registros.
+    """
+    from flask import Response, abort, request, stream_with_context
+
+    @server.route(ruta)
+    def _exportar_detalle(formato):
+        if formato not in FORMATOS:
+            abort(404)
+        args = request.args
+        # Antes de armar la respuesta: una vez enviado el encabezado 200 ya no hay error que informar
+        try:
+            start, end = fecha_parametro(args.get("start_date")), fecha_parametro(args.get("end_date"))
+        except (ValueError, TypeError, OverflowError) as e:
+            abort(400, description=f"start_date / end_date: {e}")
+        # Un único dataset para toda la descarga, aunque se publique otro mientras tanto
+        ds = datos.actual()
+        bloques = bloques_detalle(
+            calcular_detalle, ds, start, end,
+            _lista(args, "affiliate"), _lista(args, "source"), _lista(args, "country"),
+        )
+        if formato == "parquet":
+            cuerpo = parquet_por_bloques(bloques)
+        else:
+            cuerpo = (texto.encode("utf-8") for texto in csv_por_bloques(bloques))
+
+        rango = f"_{start:%Y-%m-%d}_{end:%Y-%m-%d}" if start and end else ""
+        return Response(
+            stream_with_context(cuerpo),
+            mimetype=FORMATOS[formato],
+            headers={"Content-Disposition": f'attachment; filename="general_ltv_detalle{rango}.{formato}"'},
+        )
+
+    return server
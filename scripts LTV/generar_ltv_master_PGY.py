@@ -1,9 +1,25 @@
-import re
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
-from conexion_mysql import crear_conexion
+from pandas.tseries.api import guess_datetime_format
+from conexion_mysql import crear_conexion, obtener_engine
+from limpieza_montos import parse_amounts
+from carga_masiva import (
+    actualizar_rollups_por_fechas, cargar_tabla_atomica, marcador_sql, reconstruir_rollups, upsert_por_claves,
+)
+from snapshot_ltv import (
+    SNAPSHOT_PATH, EscritorSnapshot, anexar_snapshot, escribir_snapshot, metadatos_snapshot, senal_tabla,
+    senales_para_sellar,
+)
+from metricas_ltv import CONTEXTO, etapa, registrar
 
 # ======================================================
-#  OBL DIGITAL — GENERAL_LTV_PARAGUAY_CLEAN (Power BI replica)
+#  OBL DIGITAL — GENERAL_LTV_PARAGUAY_CLEAN (Power BI replica) y demás mercados
 # ======================================================
 
 POSSIBLE_COUNTRIES = {
@@ -12,55 +28,276 @@ POSSIBLE_COUNTRIES = {
 
 ROWS_TO_SKIP = 1113
 
+# Carga de GENERAL_LTV_PGY_CLEAN: INSERT multi-fila por lotes o LOAD DATA LOCAL INFILE
+USE_LOAD_DATA_INFILE = False
 
-def leer_tabla_original():
-    """Lee la tabla general_ltv_paraguay desde Railway MySQL."""
-    conexion = crear_conexion()
-    if conexion is None:
-        print("❌ No se pudo conectar a Railway.")
+# Marca de agua del modo incremental (último id leído + país vigente)
+WATERMARK_FILE = "ltv_watermark_PGY.json"
+
+# Columnas del dedupe de filas repetidas (fecha, país/afiliado y monto tal como vienen)
+CLAVES_DEDUPE = ["date_str", "country_affiliate", "total_amount_str"]
+
+# Modo streaming: filas por bloque leído de general_ltv_paraguay
+CHUNK_SIZE = int(os.getenv("LTV_CHUNK_SIZE", "50000"))
+
+# Modo incremental: CSV, snapshot y rollups se parchean con el lote; con 1 (o --refresco-completo)
+# se rehacen leyendo la tabla destino completa, como una carga completa
+REFRESCO_COMPLETO = os.getenv("LTV_REFRESCO_COMPLETO", "0") == "1"
+
+# Textos que pd.to_datetime salta al inferir el formato (NaT, vacíos, "now" / "today")
+TEXTOS_SIN_FECHA = {"", "NaT", "nat", "NAT", "nan", "NaN", "NAN", "now", "today"}
+
+# Mercado histórico de este script; otros pares origen -> destino llegan por --config / --mercado
+MERCADO_PGY = {
+    "nombre": "PGY",
+    "origen": "general_ltv_paraguay",
+    "destino": "GENERAL_LTV_PGY_CLEAN",
+    "filas_a_saltar": ROWS_TO_SKIP,
+    "csv": "GENERAL_LTV_preview.csv",
+    "snapshot": SNAPSHOT_PATH,
+    "marca_agua": WATERMARK_FILE,
+}
+
+
+def definir_mercado(origen, destino, filas_a_saltar=ROWS_TO_SKIP, nombre=None, **archivos):
+    """
+    Par origen -> destino con su regla de skip y sus archivos locales
+    (csv, snapshot, marca_agua). PGY conserva los nombres de archivo de siempre.
+    """
+    nombre = nombre or destino.upper().replace("GENERAL_LTV_", "").replace("_CLEAN", "")
+    if destino == MERCADO_PGY["destino"]:
+        mercado = dict(MERCADO_PGY)
+    else:
+        mercado = {
+            "csv": f"GENERAL_LTV_{nombre}_preview.csv",
+            "snapshot": f"GENERAL_LTV_{nombre}_snapshot.arrow",
+            "marca_agua": f"ltv_watermark_{nombre}.json",
+        }
+    mercado.update(nombre=nombre, origen=origen, destino=destino, filas_a_saltar=int(filas_a_saltar))
+    mercado.update(archivos)
+    return mercado
+
+
+def leer_tabla_original(tabla=MERCADO_PGY["origen"]):
+    """Lee la tabla original (general_ltv_paraguay por defecto) desde Railway MySQL."""
+    engine = obtener_engine()
+    print(f"===> Leyendo tabla original {tabla} ...")
+    try:
+        with engine.connect() as conexion:
+            df = pd.read_sql(f"SELECT * FROM {tabla}", conexion)
+    except Exception as e:
+        print(f"❌ No se pudo leer de Railway: {e}")
         return None, pd.DataFrame()
 
-    print("===> Leyendo tabla original general_ltv_paraguay ...")
-    df = pd.read_sql("SELECT * FROM general_ltv_paraguay", conexion)
     print(f"   🔸 Columnas originales: {list(df.columns)}")
     print(f"   🔸 Registros brutos: {len(df)}")
-    return conexion, df
+    return engine, df
 
 
-def limpiar_monto(valor):
-    """Normaliza montos estilo Power BI (TOTAL AMOUNT, GENERAL LTV)."""
-    if pd.isna(valor):
-        return 0.0
-    s = str(valor).strip()
-    if s == "":
-        return 0.0
+def leer_tabla_por_bloques(tamano_bloque=CHUNK_SIZE, tabla=MERCADO_PGY["origen"]):
+    """
+    Lee la tabla original por páginas de id (WHERE id > último ORDER BY id LIMIT n):
+    cada consulta trae a lo sumo un bloque. Un cursor del lado del servidor no alcanza:
+    mysql-connector no lo soporta y SQLAlchemy ignora stream_results (trae todo el SELECT).
+    """
+    engine = obtener_engine()
+    m = marcador_sql(engine)
+    print(f"===> Leyendo tabla original {tabla} en bloques de {tamano_bloque} ...")
+    ultimo = None
+    while True:
+        if ultimo is None:
+            query, params = f"SELECT * FROM {tabla} ORDER BY id LIMIT {m}", (tamano_bloque,)
+        else:
+            query, params = f"SELECT * FROM {tabla} WHERE id > {m} ORDER BY id LIMIT {m}", (ultimo, tamano_bloque)
+        with engine.connect() as conexion:
+            bloque = pd.read_sql(query, conexion, params=params)
+        if bloque.empty:
+            return
+        yield bloque
+        if len(bloque) < tamano_bloque:
+            return
+        ultimo = int(pd.to_numeric(bloque["id"]).max())
 
-    s = re.sub(r"[^\d,.\-]", "", s)
 
-    if "." in s and "," in s:
-        if s.rfind(",") > s.rfind("."):
-            s = s.replace(".", "").replace(",", ".")
-        else:
-            s = s.replace(",", "")
-    elif "," in s and "." not in s:
-        partes = s.split(",")
-        s = s.replace(",", ".") if len(partes[-1]) == 2 else s.replace(",", "")
-    elif s.count(".") > 1:
-        s = s.replace(".", "")
+def leer_tabla_incremental(marca, tabla=MERCADO_PGY["origen"]):
+    """Lee solo las filas de la tabla original posteriores a la marca de agua."""
+    engine = obtener_engine()
+    m = marcador_sql(engine)
+    if marca.get("ultimo_id") is not None:
+        query = f"SELECT * FROM {tabla} WHERE id > {m} ORDER BY id"
+        params = (marca["ultimo_id"],)
+    else:
+        query = f"SELECT * FROM {tabla} WHERE fecha_registro > {m} ORDER BY fecha_registro"
+        params = (marca["ultima_fecha_registro"],)
 
+    print(f"===> Leyendo {tabla} desde la marca {marca} ...")
     try:
-        return float(s)
-    except Exception:
-        return 0.0
+        with engine.connect() as conexion:
+            df = pd.read_sql(query, conexion, params=params)
+    except Exception as e:
+        print(f"❌ No se pudo leer de Railway: {e}")
+        return None, pd.DataFrame()
+    print(f"   🔸 Registros nuevos: {len(df)}")
+    return engine, df
+
+
+def leer_marca_agua(ruta=WATERMARK_FILE):
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ruta_claves(mercado):
+    """Hashes del dedupe ya cargados, junto a la marca de agua del mercado."""
+    return f"{os.path.splitext(mercado['marca_agua'])[0]}_claves.npy"
+
+
+def leer_claves_vistas(ruta):
+    if not os.path.exists(ruta):
+        return None
+    return np.load(ruta)
+
+
+def guardar_claves_vistas(vistas, ruta):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "wb") as f:
+        np.save(f, vistas)
+    os.replace(temporal, ruta)
+    print(f"💾 Claves del dedupe guardadas: {ruta} ({len(vistas)} claves)")
+
 
+def guardar_marca_agua(marca, ruta=WATERMARK_FILE):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(marca, f, ensure_ascii=False, indent=2)
+    print(f"💾 Marca de agua guardada: {marca}")
 
-def limpiar_general_ltv(df_raw: pd.DataFrame) -> pd.DataFrame:
+
+def calcular_marca_agua(df_raw: pd.DataFrame, marca_anterior=None, filas_saltadas=0) -> dict:
+    """Último id/fecha_registro leídos y último encabezado de país visto (después del skip)."""
+    marca = dict(marca_anterior or {"ultimo_id": None, "ultima_fecha_registro": None, "ultimo_pais": None})
+    if df_raw.empty:
+        return marca
+
+    # Máximo con la marca anterior: en streaming se acumula bloque a bloque
+    if "id" in df_raw.columns:
+        ultimo = int(pd.to_numeric(df_raw["id"]).max())
+        marca["ultimo_id"] = max(ultimo, marca["ultimo_id"] or ultimo)
+    if "fecha_registro" in df_raw.columns:
+        ultima = str(df_raw["fecha_registro"].max())
+        marca["ultima_fecha_registro"] = max(ultima, marca["ultima_fecha_registro"] or ultima)
+
+    paises = df_raw["pais"].iloc[filas_saltadas:].astype(str).str.strip()
+    paises = paises[paises.isin(POSSIBLE_COUNTRIES)]
+    if not paises.empty:
+        marca["ultimo_pais"] = paises.iloc[-1]
+    return marca
+
+
+def limpiar_general_ltv(df_raw: pd.DataFrame, filas_a_saltar=ROWS_TO_SKIP, pais_inicial=None,
+                        estado=None) -> pd.DataFrame:
     """
     Replica paso a paso el M-code del Advanced Editor
     y devuelve un DataFrame con columnas:
     date, country, affiliate, usd_total, count_ftd, general_ltv
+
+    En modo incremental se llama con filas_a_saltar=0 y pais_inicial
+    con el último encabezado de país del lote anterior.
+    Con estado (dict), el dedupe usa y actualiza estado["vistas"]: los hashes de las
+    claves ya cargadas, para que un lote incremental descarte lo mismo que una carga completa.
+    """
+    with etapa("clasificar_filas", log=True, filas_entrada=len(df_raw)) as medida:
+        df = clasificar_filas(df_raw, filas_a_saltar, pais_inicial)
+        medida["filas"] = len(df)
+    with etapa("dedupe", log=True, filas_entrada=len(df)) as medida:
+        if estado is None:
+            df = df.drop_duplicates(subset=CLAVES_DEDUPE).reset_index(drop=True)
+        else:
+            vistas = estado.get("vistas")
+            nuevas, estado["vistas"] = filtrar_vistas(
+                claves_dedupe(df), np.empty(0, dtype=np.uint64) if vistas is None else vistas,
+            )
+            df = df.loc[nuevas].reset_index(drop=True)
+        medida["filas"] = len(df)
+
+    with etapa("tipar_columnas", log=True, filas_entrada=len(df)) as medida:
+        df_final = tipar_columnas(df)
+        medida["filas"] = len(df_final)
+    with etapa("ordenar", log=True, filas=len(df_final)):
+        df_final = df_final.sort_values("date").reset_index(drop=True)
+
+    print(f"✅ GENERAL_LTV_CLEAN generado correctamente con {len(df_final)} registros.")
+    return df_final
+
+
+def claves_dedupe(df: pd.DataFrame) -> np.ndarray:
+    """Hash de 64 bits de las columnas del dedupe, fila por fila."""
+    return pd.util.hash_pandas_object(df[CLAVES_DEDUPE], index=False).to_numpy()
+
+
+def filtrar_vistas(claves, vistas):
     """
+    Máscara de las claves que aparecen por primera vez y no están en vistas (arreglo
+    ordenado), y vistas con esas claves intercaladas por searchsorted, sin reordenar.
+    """
+    posiciones = np.searchsorted(vistas, claves)
+    vista = posiciones < len(vistas)
+    vista[vista] = vistas[posiciones[vista]] == claves[vista]
+    nuevas = ~pd.Series(claves).duplicated().to_numpy() & ~vista
+    agregar = np.sort(claves[nuevas])
+    return nuevas, np.insert(vistas, np.searchsorted(vistas, agregar), agregar)
+
 
+def limpiar_por_bloques(bloques_raw, filas_a_saltar=ROWS_TO_SKIP, estado=None):
+    """
+    Versión streaming de limpiar_general_ltv: mismas filas de salida, bloque a bloque.
+    - el skip inicial se aplica sobre las primeras filas del stream (aunque crucen bloques);
+    - el país vigente pasa de un bloque al siguiente (mismo rol que pais_inicial);
+    - el dedupe recuerda un hash de 64 bits por clave ya emitida (8 bytes por fila),
+      en un arreglo ordenado: cada bloque se busca con searchsorted y solo sus claves
+      nuevas se intercalan, sin reordenar lo ya visto.
+    No ordena por fecha: cada bloque sale en el orden de lectura.
+    estado (dict) acumula filas_leidas, filas_limpias, la marca de agua y las claves vistas.
+    """
+    estado = estado if estado is not None else {}
+    estado.update(filas_leidas=0, filas_limpias=0, marca=None, vistas=np.empty(0, dtype=np.uint64))
+    pendientes = []
+    formato = None
+
+    def procesar(bloque, saltar):
+        nonlocal formato
+        pais_previo = (estado["marca"] or {}).get("ultimo_pais")
+        estado["marca"] = calcular_marca_agua(bloque, estado["marca"], filas_saltadas=saltar)
+
+        df = clasificar_filas(bloque, saltar, pais_previo)
+        nuevas, estado["vistas"] = filtrar_vistas(claves_dedupe(df), estado["vistas"])
+        df = df.loc[nuevas].reset_index(drop=True)
+        if formato is None:
+            # Se infiere una sola vez, con el primer valor del stream, como en memoria
+            formato = formato_fecha(df["date"])
+        df = tipar_columnas(df, formato)
+        estado["filas_limpias"] += len(df)
+        return df
+
+    for bloque in bloques_raw:
+        estado["filas_leidas"] += len(bloque)
+        if pendientes is None:
+            yield procesar(bloque.reset_index(drop=True), 0)
+            continue
+        # Se juntan bloques hasta superar el skip (como en memoria: sin skip si la tabla es más corta)
+        pendientes.append(bloque)
+        if estado["filas_leidas"] > filas_a_saltar:
+            inicial = pd.concat(pendientes, ignore_index=True)
+            pendientes = None
+            yield procesar(inicial, filas_a_saltar)
+
+    if pendientes:
+        print(f"⚠️ El dataset tiene menos de {filas_a_saltar} filas, no se hará skip.")
+        yield procesar(pd.concat(pendientes, ignore_index=True), 0)
+
+
+def clasificar_filas(df_raw: pd.DataFrame, filas_a_saltar=ROWS_TO_SKIP, pais_inicial=None) -> pd.DataFrame:
+    """Skip inicial, país por encabezado (ffill) y descarte de encabezados y totales."""
     df = df_raw.copy()
 
     for col in ["id", "fecha_registro", "general_ltv"]:
@@ -76,29 +313,21 @@ def limpiar_general_ltv(df_raw: pd.DataFrame) -> pd.DataFrame:
     }
     df.rename(columns=rename_map, inplace=True)
 
-    if len(df) > ROWS_TO_SKIP:
-        df = df.iloc[ROWS_TO_SKIP:].reset_index(drop=True)
+    if len(df) > filas_a_saltar:
+        df = df.iloc[filas_a_saltar:].reset_index(drop=True)
     else:
-        print(f"⚠️ El dataset tiene menos de {ROWS_TO_SKIP} filas, no se hará skip.")
+        print(f"⚠️ El dataset tiene menos de {filas_a_saltar} filas, no se hará skip.")
         df = df.copy()
 
     df["country_affiliate"] = df["country_affiliate"].astype(str).str.strip()
 
-    def tipo_fila(valor):
-        return "PAIS" if valor in POSSIBLE_COUNTRIES else "AFILIADO"
+    es_pais = df["country_affiliate"].isin(POSSIBLE_COUNTRIES)
+    df["tipo"] = np.where(es_pais, "PAIS", "AFILIADO")
 
-    df["tipo"] = df["country_affiliate"].apply(tipo_fila)
-
-    df["PaisTemp"] = df.apply(
-        lambda r: r["country_affiliate"] if r["tipo"] == "PAIS" else pd.NA,
-        axis=1,
-    )
-    df["PaisTemp"] = df["PaisTemp"].ffill()
-
-    df["affiliate"] = df.apply(
-        lambda r: r["country_affiliate"] if r["tipo"] == "AFILIADO" else pd.NA,
-        axis=1,
-    )
+    df["PaisTemp"] = df["country_affiliate"].where(es_pais, pd.NA).ffill()
+    if pais_inicial is not None:
+        df["PaisTemp"] = df["PaisTemp"].fillna(pais_inicial)
+    df["affiliate"] = df["country_affiliate"].where(~es_pais, pd.NA)
 
     # ============================
     # 🔹 CORRECCIÓN: ASIGNAR Y LIMPIAR PAISES
@@ -130,15 +359,29 @@ def limpiar_general_ltv(df_raw: pd.DataFrame) -> pd.DataFrame:
 
     df["date_str"] = df["date"].astype(str)
     df["total_amount_str"] = df["total_amount"].astype(str)
+    return df
 
-    df = df.drop_duplicates(
-        subset=["date_str", "country_affiliate", "total_amount_str"]
-    ).reset_index(drop=True)
 
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+def formato_fecha(fechas: pd.Series):
+    """
+    El formato que pd.to_datetime infiere del primer valor no nulo de la columna
+    ("mixed" si no puede inferirlo, None si aún no hay valores). Fijarlo permite
+    parsear por bloques igual que en memoria.
+    """
+    for valor in fechas.dropna():
+        if isinstance(valor, str) and valor in TEXTOS_SIN_FECHA:
+            continue
+        # Como pd.to_datetime: solo se infiere desde texto
+        return (guess_datetime_format(valor) if type(valor) is str else None) or "mixed"
+    return None
+
+
+def tipar_columnas(df: pd.DataFrame, formato=None) -> pd.DataFrame:
+    """Fecha, montos, FTDs y LTV tipados; columnas finales sin ordenar."""
+    df["date"] = pd.to_datetime(df["date"], errors="coerce", format=formato)
     df = df[df["date"].notna()].copy()
 
-    df["usd_total"] = df["total_amount"].apply(limpiar_monto)
+    df["usd_total"] = parse_amounts(df["total_amount"])
     df["count_ftd"] = pd.to_numeric(df["ftds"], errors="coerce").fillna(0).astype(float)
 
     if "general_ltv_raw" in df.columns:
@@ -148,80 +391,370 @@ def limpiar_general_ltv(df_raw: pd.DataFrame) -> pd.DataFrame:
     else:
         df["general_ltv"] = 0.0
 
-    df["general_ltv"] = df.apply(
-        lambda r: (r["usd_total"] / r["count_ftd"])
-        if r["count_ftd"] not in (0, None) else r["general_ltv"],
-        axis=1,
-    ).fillna(0.0)
+    # LTV = usd_total / count_ftd; si no hay FTDs se conserva el valor original
+    con_ftd = df["count_ftd"] != 0
+    df["general_ltv"] = (
+        df["usd_total"].div(df["count_ftd"].where(con_ftd))
+        .where(con_ftd, df["general_ltv"])
+        .fillna(0.0)
+    )
 
     df["country"] = df["country"].astype(str).str.strip().str.title()
     df["affiliate"] = df["affiliate"].astype(str).str.strip().str.title()
 
-    df_final = df[["date", "country", "affiliate", "usd_total", "count_ftd", "general_ltv"]].copy()
-    df_final = df_final.sort_values("date").reset_index(drop=True)
+    return df[["date", "country", "affiliate", "usd_total", "count_ftd", "general_ltv"]].copy()
 
-    print(f"✅ GENERAL_LTV_CLEAN generado correctamente con {len(df_final)} registros.")
-    return df_final
 
+def guardar_y_cargar_mysql(df_final: pd.DataFrame, mercado=MERCADO_PGY):
+    """Guarda CSV y snapshot local y sube la tabla destino (GENERAL_LTV_PGY_CLEAN) a Railway."""
+    with etapa("guardar_csv", log=True, filas=len(df_final)):
+        df_final.to_csv(mercado["csv"], index=False, encoding="utf-8-sig")
+    print(f"💾 Vista previa guardada: {mercado['csv']}")
 
-def guardar_y_cargar_mysql(df_final: pd.DataFrame):
-    """Guarda CSV y sube la tabla GENERAL_LTV_PGY_CLEAN a Railway."""
-    df_final.to_csv("GENERAL_LTV_preview.csv", index=False, encoding="utf-8-sig")
-    print("💾 Vista previa guardada: GENERAL_LTV_preview.csv")
+    with etapa("cargar_mysql", log=True, filas=len(df_final)) as medida:
+        cargada = medida["ok"] = cargar_mysql(df_final, mercado["destino"])
 
+    # El snapshot registra la señal de la tabla que contiene sus mismos datos
+    # (si no se cargó, la que tenía la tabla al escribirlo)
     try:
-        conexion = crear_conexion()
+        with etapa("escribir_snapshot", log=True, filas=len(df_final)):
+            escribir_snapshot(
+                df_final, ruta=mercado["snapshot"], **senales_para_sellar(mercado["destino"], cargada),
+            )
+    except Exception as e:
+        print(f"⚠️ No se pudo escribir el snapshot local: {e}")
+    return cargada
+
+
+def cargar_mysql(df_final: pd.DataFrame, tabla=MERCADO_PGY["destino"]):
+    try:
+        # LOAD DATA necesita allow_local_infile: conexión dedicada fuera del pool
+        conexion = crear_conexion(allow_local_infile=True) if USE_LOAD_DATA_INFILE else crear_conexion()
         if conexion is None:
             print("❌ No se pudo conectar a Railway para escribir la tabla.")
-            return
+            return False
+
+        # Tabla y rollups se publican en el mismo RENAME: nunca se ven de versiones distintas
+        resultado = cargar_tabla_atomica(
+            conexion, df_final, tabla, usar_load_data=USE_LOAD_DATA_INFILE, con_rollups=True,
+        )
+        if resultado["rollups"] is not None:
+            registrar("rollups", **resultado["rollups"])
+        conexion.close()
 
-        cursor = conexion.cursor()
-
-        cursor.execute("DROP TABLE IF EXISTS GENERAL_LTV_PGY_CLEAN;")
-        cursor.execute("""
-            CREATE TABLE GENERAL_LTV_PGY_CLEAN (
-                date DATETIME,
-                country VARCHAR(100),
-                affiliate VARCHAR(150),
-                usd_total DECIMAL(18,2),
-                count_ftd INT,
-                general_ltv DECIMAL(18,4)
-            );
-        """)
-        conexion.commit()
-
-        insert_sql = """
-            INSERT INTO GENERAL_LTV_PGY_CLEAN
-            (date, country, affiliate, usd_total, count_ftd, general_ltv)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-
-        data = [
-            (
-                row["date"],
-                row["country"],
-                row["affiliate"],
-                float(row["usd_total"]),
-                int(row["count_ftd"]),
-                float(row["general_ltv"]),
-            )
-            for _, row in df_final.iterrows()
-        ]
+        print(f"✅ Tabla {tabla} creada y poblada correctamente en Railway.")
+        return True
+    except Exception as e:
+        print(f"⚠️ Error al crear {tabla}: {e}")
+        return False
 
-        cursor.executemany(insert_sql, data)
-        conexion.commit()
+
+def actualizar_rollups(conexion, tabla, fechas=None):
+    """
+    Rollups diario / mensual / total de la tabla: completos, o solo los días y meses
+    de `fechas` (lote incremental). Si fallan, la carga sigue siendo válida: el
+    dashboard detecta rollups desactualizados y usa la tabla.
+    """
+    try:
+        with etapa("rollups", log=True) as medida:
+            if fechas is None:
+                medida.update(reconstruir_rollups(conexion, tabla))
+            else:
+                medida.update(actualizar_rollups_por_fechas(conexion, tabla, fechas))
+    except Exception as e:
+        conexion.rollback()
+        print(f"⚠️ No se pudieron actualizar los rollups de {tabla}: {e}")
+
+
+def actualizar_incremental_mysql(df_nuevo: pd.DataFrame, tabla=MERCADO_PGY["destino"],
+                                 refresco_completo=REFRESCO_COMPLETO):
+    """Upsert de las claves (date, country, affiliate) afectadas y de sus días / meses en los rollups."""
+    try:
+        conexion = crear_conexion()
+        if conexion is None:
+            print("❌ No se pudo conectar a Railway para escribir la tabla.")
+            return False
+
+        upsert_por_claves(conexion, df_nuevo, tabla)
+        actualizar_rollups(conexion, tabla, None if refresco_completo else df_nuevo["date"])
         conexion.close()
 
-        print("✅ Tabla GENERAL_LTV_PGY_CLEAN creada y poblada correctamente en Railway.")
+        print(f"✅ {tabla} actualizada en modo incremental.")
+        return True
     except Exception as e:
-        print(f"⚠️ Error al crear GENERAL_LTV_CLEAN: {e}")
+        print(f"⚠️ Error en la carga incremental de {tabla}: {e}")
+        return False
 
 
-if __name__ == "__main__":
-    _, df_raw = leer_tabla_original()
-    if not df_raw.empty:
-        df_final = limpiar_general_ltv(df_raw)
-        guardar_y_cargar_mysql(df_final)
+def refrescar_copias_locales(mercado=MERCADO_PGY, df_nuevo=None, senal_previa=None, completo=REFRESCO_COMPLETO):
+    """
+    Después de un upsert, CSV y snapshot quedan atrás de la tabla destino. Si el snapshot
+    estaba sellado con la señal que tenía la tabla antes del upsert (senal_previa), la
+    tabla es ese snapshot más el lote (el upsert solo agrega filas): se anexa df_nuevo a
+    ambos y se re-sella. Si no, o con completo, se rehacen leyendo la tabla entera.
+    Si no se puede, el snapshot se borra para que el dashboard no lo prefiera a la base.
+    """
+    meta = metadatos_snapshot(mercado["snapshot"])
+    parche = (not completo and df_nuevo is not None and senal_previa is not None
+              and meta is not None and meta["senal_db"] == list(senal_previa))
+    try:
+        with etapa("refrescar_copias", log=True, parche=parche) as medida:
+            senal = senal_tabla(mercado["destino"])
+            if parche:
+                df = df_nuevo
+                df.to_csv(mercado["csv"], mode="a", header=False, index=False, encoding="utf-8-sig")
+                anexar_snapshot(df, ruta=mercado["snapshot"], senal_db=senal)
+            else:
+                with obtener_engine().connect() as conexion:
+                    df = pd.read_sql(f"SELECT * FROM {mercado['destino']} ORDER BY date", conexion)
+                df["date"] = pd.to_datetime(df["date"])
+                for col in ["usd_total", "count_ftd", "general_ltv"]:
+                    df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+                df.to_csv(mercado["csv"], index=False, encoding="utf-8-sig")
+                escribir_snapshot(df, ruta=mercado["snapshot"], senal_db=senal)
+            medida["filas"] = len(df)
+            print(f"💾 Vista previa guardada: {mercado['csv']}")
+        return True
+    except Exception as e:
+        print(f"⚠️ No se pudieron refrescar las copias locales de {mercado['destino']}: {e}")
+        if os.path.exists(mercado["snapshot"]):
+            os.remove(mercado["snapshot"])
+            print(f"🗑️ Snapshot {mercado['snapshot']} eliminado: ya no refleja {mercado['destino']}.")
+        return False
+
 
-        print("\nPrimeras filas del resultado final:")
-        print(df_final.head(15))
+def guardar_y_cargar_por_bloques(bloques, mercado=MERCADO_PGY):
+    """
+    Como guardar_y_cargar_mysql, pero cada bloque limpio va directo al CSV, al snapshot
+    y a la tabla staging; nada se publica si la lectura se corta a mitad de camino.
+    """
+    bloques = iter(bloques)
+    primero = next(bloques, None)
+    if primero is None:
+        print(f"⚠️ {mercado['origen']} no devolvió filas: no se reemplaza nada.")
+        return False
+
+    snapshot = EscritorSnapshot(mercado["snapshot"])
+    completo = False
+    with open(mercado["csv"], "w", encoding="utf-8-sig", newline="") as csv:
+        def salida():
+            nonlocal completo
+            for i, bloque in enumerate(itertools.chain([primero], bloques)):
+                bloque.to_csv(csv, index=False, header=(i == 0))
+                snapshot.escribir(bloque)
+                yield bloque
+            completo = True
+
+        bloques_salida = salida()
+        cargada = cargar_mysql(bloques_salida, mercado["destino"])
+        # Si la base falló, se terminan de escribir CSV y snapshot igual
+        try:
+            for _ in bloques_salida:
+                pass
+        except Exception as e:
+            print(f"❌ Error leyendo {mercado['origen']}: {e}")
+
+    if not completo:
+        snapshot.descartar()
+        print(f"❌ Lectura incompleta de {mercado['origen']}: no se publica el snapshot.")
+        return False
+    print(f"💾 Vista previa guardada: {mercado['csv']}")
+    try:
+        snapshot.cerrar(**senales_para_sellar(mercado["destino"], cargada))
+    except Exception as e:
+        print(f"⚠️ No se pudo escribir el snapshot local: {e}")
+    return cargada
+
+
+def ejecutar_streaming(tamano_bloque=CHUNK_SIZE, mercado=MERCADO_PGY):
+    estado = {}
+    try:
+        # Lectura, limpieza y carga se intercalan bloque a bloque: se miden juntas
+        with etapa("streaming", log=True, tamano_bloque=tamano_bloque) as medida:
+            cargada = medida["ok"] = guardar_y_cargar_por_bloques(
+                limpiar_por_bloques(
+                    leer_tabla_por_bloques(tamano_bloque, mercado["origen"]),
+                    filas_a_saltar=mercado["filas_a_saltar"], estado=estado,
+                ),
+                mercado,
+            )
+            medida.update(filas_entrada=estado.get("filas_leidas"), filas=estado.get("filas_limpias"))
+    except Exception as e:
+        print(f"❌ No se pudo leer de Railway: {e}")
+        return {"filas": 0, "cargada": False}
+
+    print(f"✅ {mercado['destino']} generado por bloques: {estado['filas_leidas']} filas leídas, "
+          f"{estado['filas_limpias']} registros.")
+    if cargada and estado["marca"] is not None:
+        guardar_claves_vistas(estado["vistas"], ruta_claves(mercado))
+        guardar_marca_agua(estado["marca"], mercado["marca_agua"])
+    return {"filas": estado["filas_limpias"], "cargada": cargada}
+
+
+def ejecutar_completo(mercado=MERCADO_PGY):
+    with etapa("leer_tabla", log=True) as medida:
+        _, df_raw = leer_tabla_original(mercado["origen"])
+        medida["filas"] = len(df_raw)
+    if df_raw.empty:
+        return {"filas": 0, "cargada": False}
+
+    filas_a_saltar = mercado["filas_a_saltar"]
+    estado = {}
+    df_final = limpiar_general_ltv(df_raw, filas_a_saltar=filas_a_saltar, estado=estado)
+    cargada = guardar_y_cargar_mysql(df_final, mercado)
+    if cargada:
+        guardar_claves_vistas(estado["vistas"], ruta_claves(mercado))
+        saltadas = filas_a_saltar if len(df_raw) > filas_a_saltar else 0
+        guardar_marca_agua(calcular_marca_agua(df_raw, filas_saltadas=saltadas), mercado["marca_agua"])
+
+    print("\nPrimeras filas del resultado final:")
+    print(df_final.head(15))
+    return {"filas": len(df_final), "cargada": cargada}
+
+
+def ejecutar_incremental(marca, mercado=MERCADO_PGY, refresco_completo=REFRESCO_COMPLETO):
+    vistas = leer_claves_vistas(ruta_claves(mercado))
+    if vistas is None:
+        # Sin las claves ya cargadas el dedupe no sería el de la carga completa
+        print(f"⚠️ Falta {ruta_claves(mercado)}: se hace una carga completa de {mercado['destino']}.")
+        return ejecutar_completo(mercado)
+
+    with etapa("leer_incremental", log=True) as medida:
+        _, df_raw = leer_tabla_incremental(marca, mercado["origen"])
+        medida["filas"] = len(df_raw)
+    if df_raw.empty:
+        print(f"✅ Sin filas nuevas en {mercado['origen']}.")
+        return {"filas": 0, "cargada": True}
+
+    estado = {"vistas": vistas}
+    df_nuevo = limpiar_general_ltv(df_raw, filas_a_saltar=0, pais_inicial=marca.get("ultimo_pais"), estado=estado)
+    # Con esta señal se sabe si el snapshot local estaba al día antes del upsert
+    senal_previa = senal_tabla(mercado["destino"])
+    with etapa("upsert_mysql", log=True, filas=len(df_nuevo)) as medida:
+        cargada = medida["ok"] = actualizar_incremental_mysql(df_nuevo, mercado["destino"], refresco_completo)
+    if cargada:
+        guardar_claves_vistas(estado["vistas"], ruta_claves(mercado))
+        guardar_marca_agua(calcular_marca_agua(df_raw, marca), mercado["marca_agua"])
+        refrescar_copias_locales(mercado, df_nuevo, senal_previa, completo=refresco_completo)
+
+    print("\nPrimeras filas del lote incremental:")
+    print(df_nuevo.head(15))
+    return {"filas": len(df_nuevo), "cargada": cargada}
+
+
+def ejecutar_mercado(mercado, full_rebuild=False, streaming=False, tamano_bloque=CHUNK_SIZE,
+                     refresco_completo=REFRESCO_COMPLETO):
+    """
+    Corre el ETL de un mercado (completo, streaming o incremental según su marca de agua).
+    Nunca lanza: los errores quedan en el resumen para no frenar a los demás mercados.
+    """
+    inicio = time.perf_counter()
+    resumen = {"mercado": mercado["nombre"], "origen": mercado["origen"], "destino": mercado["destino"]}
+    CONTEXTO["mercado"] = mercado["nombre"]
+    try:
+        marca = None if full_rebuild else leer_marca_agua(mercado["marca_agua"])
+        incremental = marca and (marca.get("ultimo_id") is not None or marca.get("ultima_fecha_registro") is not None)
+        if not incremental or not os.path.exists(ruta_claves(mercado)):
+            modo = "streaming" if streaming else "completo"
+            resultado = ejecutar_streaming(tamano_bloque, mercado) if streaming else ejecutar_completo(mercado)
+        else:
+            modo = "incremental"
+            resultado = ejecutar_incremental(marca, mercado, refresco_completo)
+        resumen.update(resultado, modo=modo, ok=resultado["cargada"],
+                       error=None if resultado["cargada"] else "sin carga en la tabla destino")
+    except Exception as e:
+        print(f"❌ [{mercado['nombre']}] Error inesperado: {e}")
+        resumen.update(filas=0, cargada=False, ok=False, error=str(e))
+    resumen["segundos"] = round(time.perf_counter() - inicio, 2)
+    registrar("mercado", **{k: v for k, v in resumen.items() if k != "mercado"})
+    return resumen
+
+
+def ejecutar_mercados(mercados, procesos=None, **opciones):
+    """
+    Procesa los mercados en paralelo (un proceso por mercado, hasta `procesos` a la vez).
+    El tiempo total tiende al del mercado más lento en lugar de la suma.
+    """
+    inicio = time.perf_counter()
+    procesos = min(procesos or len(mercados), len(mercados))
+    if procesos <= 1:
+        resumenes = [ejecutar_mercado(m, **opciones) for m in mercados]
+    else:
+        resumenes = []
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = {pool.submit(ejecutar_mercado, m, **opciones): m for m in mercados}
+            for futuro in as_completed(futuros):
+                mercado = futuros[futuro]
+                try:
+                    resumenes.append(futuro.result())
+                except Exception as e:
+                    # El proceso del mercado murió (p. ej. sin memoria): los demás siguen
+                    resumenes.append({
+                        "mercado": mercado["nombre"], "origen": mercado["origen"], "destino": mercado["destino"],
+                        "filas": 0, "cargada": False, "ok": False, "error": repr(e), "segundos": None,
+                    })
+
+    total = time.perf_counter() - inicio
+    print("\n===> Resumen por mercado")
+    for r in sorted(resumenes, key=lambda r: r["mercado"]):
+        estado = "✅" if r["ok"] else "❌"
+        segundos = f"{r['segundos']:.2f}s" if r["segundos"] is not None else "-"
+        print(f"   {estado} {r['mercado']:<8} {r['origen']} -> {r['destino']}: "
+              f"{r['filas']} filas, {segundos}" + (f" ({r['error']})" if r["error"] else ""))
+    suma = sum(r["segundos"] or 0 for r in resumenes)
+    print(f"   ⏱️ Total {total:.2f}s con {procesos} proceso(s) (suma por mercado {suma:.2f}s)")
+    return resumenes
+
+
+def cargar_config(ruta):
+    """
+    JSON con la lista de mercados y, opcionalmente, la cantidad de procesos:
+    {"procesos": 4, "mercados": [{"origen": "general_ltv_peru", "destino": "GENERAL_LTV_PER_CLEAN",
+                                  "filas_a_saltar": 0}, ...]}
+    """
+    with open(ruta, encoding="utf-8") as f:
+        config = json.load(f)
+    if isinstance(config, list):
+        config = {"mercados": config}
+    return [definir_mercado(**m) for m in config["mercados"]], config.get("procesos")
+
+
+def parsear_mercado(texto):
+    """origen:destino[:filas_a_saltar]"""
+    partes = texto.split(":")
+    if len(partes) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"Formato esperado origen:destino[:filas_a_saltar], no {texto!r}")
+    return definir_mercado(*partes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETL general_ltv_* -> GENERAL_LTV_*_CLEAN (por defecto Paraguay)")
+    parser.add_argument(
+        "--full-rebuild", action="store_true",
+        help="Relee toda la tabla original y reemplaza la tabla destino (comportamiento clásico).",
+    )
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="En la carga completa, lee y escribe por bloques con memoria acotada.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Filas por bloque en --streaming.")
+    parser.add_argument(
+        "--refresco-completo", action="store_true", default=REFRESCO_COMPLETO,
+        help="En modo incremental, rehace CSV, snapshot y rollups desde la tabla destino completa.",
+    )
+    parser.add_argument("--config", help="JSON con los mercados a procesar (ver cargar_config).")
+    parser.add_argument(
+        "--mercado", action="append", type=parsear_mercado, default=[],
+        help="Par origen:destino[:filas_a_saltar]; se puede repetir.",
+    )
+    parser.add_argument("--procesos", type=int, help="Mercados en paralelo (por defecto, todos a la vez).")
+    args = parser.parse_args()
+
+    mercados, procesos = (cargar_config(args.config) if args.config else ([], None))
+    mercados += args.mercado
+    resumenes = ejecutar_mercados(
+        mercados or [MERCADO_PGY], args.procesos or procesos,
+        full_rebuild=args.full_rebuild, streaming=args.streaming, tamano_bloque=args.chunk_size,
+        refresco_completo=args.refresco_completo,
+    )
+    raise SystemExit(0 if all(r["ok"] for r in resumenes) else 1)
@@ -0,0 +1,32 @@
+import gc
+
+# ======================================================
+#  OBL DIGITAL — Hooks de gunicorn para el dashboard (se lee solo desde este directorio)
+#
+#  Arranque sin esperar a la base, con el frame compartido entre workers:
+#    LTV_ARRANQUE=snapshot gunicorn dashboard_LTV_app:server --preload
+#  El master importa la app (copia local limpia, sin consultar MySQL) antes del fork;
+#  cada worker descarta el pool SQL heredado y lee la base en segundo plano apenas arranca.
+# ======================================================
+
+
+def when_ready(server):
+    # Con --preload el dataset ya está en el master: el GC no vuelve a tocar esos
+    # objetos y sus páginas siguen compartidas (copy-on-write) tras el fork
+    if server.cfg.preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Con --preload el master pudo abrir conexiones del pool antes del fork (p. ej. el
+    # arranque desde la base): compartir esos sockets entre procesos corrompe el protocolo
+    from conexion_mysql import descartar_pool_heredado
+
+    descartar_pool_heredado()
+
+
+def post_worker_init(worker):
+    # Sin esperar al primer request: refresco (y primera lectura de la base) por worker
+    from dashboard_LTV_app import datos
+
+    datos.iniciar()
@@ -0,0 +1,97 @@
+import re
+import numpy as np
+import pandas as pd
+
+# ======================================================
+#  OBL DIGITAL — Normalización de montos (ETL + Dashboard)
+# ======================================================
+
+_NUMERO_VALIDO = r"-?(?:[0-9]+\.?[0-9]*|\.[0-9]+)"
+
+
+def limpiar_monto(valor):
+    """Normaliza montos estilo Power BI (TOTAL AMOUNT, GENERAL LTV)."""
+    if pd.isna(valor):
+        return 0.0
+    s = str(valor).strip()
+    if s == "":
+        return 0.0
+
+    s = re.sub(r"[^\d,.\-]", "", s)
+
+    if "." in s and "," in s:
+        if s.rfind(",") > s.rfind("."):
+            s = s.replace(".", "").replace(",", ".")
+        else:
+            s = s.replace(",", "")
+    elif "," in s and "." not in s:
+        partes = s.split(",")
+        s = s.replace(",", ".") if len(partes[-1]) == 2 else s.replace(",", "")
+    elif s.count(".") > 1:
+        s = s.replace(".", "")
+
+    try:
+        return float(s)
+    except Exception:
+        return 0.0
+
+
+def _a_float(s):
+    try:
+        return float(s)
+    except Exception:
+        return 0.0
+
+
+def _normalizar_unicos(valores: pd.Series) -> np.ndarray:
+    """Aplica las reglas de coma/punto de limpiar_monto con operaciones de texto vectorizadas."""
+    s = valores.astype(str).str.strip().str.replace(r"[^\d,.\-]", "", regex=True)
+
+    tiene_punto = s.str.contains(".", regex=False)
+    tiene_coma = s.str.contains(",", regex=False)
+    ultima_coma = s.str.rfind(",")
+
+    # 1.234,56 -> 1234.56
+    europeo = tiene_punto & tiene_coma & (ultima_coma > s.str.rfind("."))
+    # 1,234.56 -> 1234.56
+    americano = tiene_punto & tiene_coma & ~europeo
+    # 1234,56 -> 1234.56  |  1,234 -> 1234
+    solo_coma = tiene_coma & ~tiene_punto
+    coma_decimal = solo_coma & ((s.str.len() - ultima_coma - 1) == 2)
+    # 1.234.567 -> 1234567
+    miles_punto = ~tiene_coma & (s.str.count(r"\.") > 1)
+
+    s = s.mask(europeo, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    s = s.mask(americano | (solo_coma & ~coma_decimal), s.str.replace(",", "", regex=False))
+    s = s.mask(coma_decimal, s.str.replace(",", ".", regex=False))
+    s = s.mask(miles_punto, s.str.replace(".", "", regex=False))
+
+    resultado = np.zeros(len(s), dtype=float)
+    validos = s.str.fullmatch(_NUMERO_VALIDO).to_numpy(dtype=bool)
+    resultado[validos] = s[validos].astype(float).to_numpy()
+
+    # Lo que no es un número simple (vacíos, basura, dígitos no ASCII) sigue la ruta escalar
+    resto = ~validos & (s != "").to_numpy(dtype=bool)
+    if resto.any():
+        resultado[resto] = [_a_float(v) for v in s[resto]]
+    return resultado
+
+
+def parse_amounts(serie: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de limpiar_monto para una Series completa.
+    Cada texto distinto se parsea una sola vez y el resultado se
+    reparte a todas las filas que lo repiten.
+    """
+    claves = serie
+    if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) != "string":
+        # factorize junta objetos iguales con distinto texto (1000 y Decimal("1E+3"), 1 y True):
+        # se agrupa por el texto, que es lo que parsea limpiar_monto
+        claves = serie.where(serie.isna(), serie.astype(str))
+    codigos, unicos = pd.factorize(claves, use_na_sentinel=True)
+    valores = _normalizar_unicos(pd.Series(unicos, dtype=object))
+
+    montos = np.zeros(len(codigos), dtype=float)
+    presentes = codigos >= 0
+    montos[presentes] = valores[codigos[presentes]]
+    return pd.Series(montos, index=serie.index, name=serie.name)
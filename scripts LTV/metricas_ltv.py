@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ======================================================
+#  OBL DIGITAL — Tiempos por etapa, histogramas y /metrics (formato texto de Prometheus)
+# ======================================================
+
+# Requests más lentos que esto (ms) se registran con sus filtros; 0 = desactivado
+SLOW_REQUEST_MS = float(os.getenv("LTV_SLOW_REQUEST_MS", "0"))
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_BYTES = (1_000, 10_000, 100_000, 500_000, 1_000_000, 5_000_000, 20_000_000)
+
+# Campos que se agregan a cada línea estructurada (p. ej. el mercado que procesa el ETL)
+CONTEXTO = {}
+
+_local = threading.local()
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    escapar = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{n}="{escapar(v)}"' for n, v in zip(nombres, valores)) + "}"
+
+
+class Histograma:
+    """Histograma acumulativo por combinación de etiquetas (por proceso)."""
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre, self.ayuda = nombre, ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = {"conteos": [0] * len(self.buckets), "suma": 0.0, "total": 0}
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie["conteos"][i] += 1
+            serie["suma"] += valor
+            serie["total"] += 1
+
+    def texto(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = {clave: dict(serie, conteos=list(serie["conteos"])) for clave, serie in self._series.items()}
+        for clave, serie in sorted(series.items()):
+            for limite, conteo in zip(self.buckets, serie["conteos"]):
+                etiquetas = _etiquetas(self.etiquetas + ("le",), clave + (repr(float(limite)),))
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {conteo}")
+            etiquetas = _etiquetas(self.etiquetas + ("le",), clave + ("+Inf",))
+            lineas.append(f"{self.nombre}_bucket{etiquetas} {serie['total']}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {serie['suma']:.6f}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {serie['total']}")
+        return "\n".join(lineas)
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre, self.ayuda = nombre, ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, cantidad=1, **etiquetas):
+        clave = tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def texto(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self._lock:
+            valores = dict(self._valores)
+        for clave, valor in sorted(valores.items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}")
+        return "\n".join(lineas)
+
+
+class Lectura:
+    """Valor que otro módulo ya lleva (contador o gauge): se lee recién al armar /metrics."""
+
+    def __init__(self, nombre, ayuda, leer, tipo="counter", etiquetas=()):
+        self.nombre, self.ayuda, self.tipo = nombre, ayuda, tipo
+        self.etiquetas = tuple(etiquetas)
+        self.leer = leer  # () -> {(valores de las etiquetas): valor}
+
+    def texto(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for clave, valor in sorted(self.leer().items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}")
+        return "\n".join(lineas)
+
+
+ETAPAS = Histograma("ltv_etapa_segundos", "Duración de cada etapa instrumentada.", ["etapa"])
+REQUESTS = Histograma(
+    "ltv_request_segundos", "Latencia por ruta y, en callbacks de Dash, por salida.", ["ruta", "salida", "estado"]
+)
+RESPUESTAS = Histograma(
+    "ltv_respuesta_bytes", "Tamaño del cuerpo de la respuesta.", ["ruta", "salida"], buckets=BUCKETS_BYTES
+)
+LENTOS = Contador("ltv_requests_lentos_total", "Requests por encima de LTV_SLOW_REQUEST_MS.", ["ruta", "salida"])
+
+METRICAS = [ETAPAS, REQUESTS, RESPUESTAS, LENTOS]
+
+
+def exponer_caches(caches: dict):
+    """Hits, misses, coalescidos y entradas de cada CacheResultados ({nombre: cache}) en /metrics."""
+    def por_cache(valor):
+        return lambda: {(nombre,): valor(cache) for nombre, cache in caches.items()}
+
+    METRICAS.extend([
+        Lectura("ltv_cache_hits_total", "Resultados servidos desde la cache.",
+                por_cache(lambda c: c.hits), etiquetas=["cache"]),
+        Lectura("ltv_cache_misses_total", "Resultados calculados por no estar en la cache.",
+                por_cache(lambda c: c.misses), etiquetas=["cache"]),
+        Lectura("ltv_cache_coalescidos_total", "Pedidos que esperaron un cálculo igual en curso.",
+                por_cache(lambda c: c.coalescidos), etiquetas=["cache"]),
+        Lectura("ltv_cache_entradas", "Entradas guardadas en la cache.",
+                por_cache(lambda c: c.estadisticas()["entradas"]), tipo="gauge", etiquetas=["cache"]),
+    ])
+
+
+def exponer_pool(estadisticas):
+    """Conexiones nuevas, préstamos y conexiones en uso del pool SQL (estadisticas_pool) en /metrics."""
+    def campo(nombre):
+        return lambda: {(): estadisticas()[nombre]}
+
+    METRICAS.extend([
+        Lectura("ltv_db_conexiones_nuevas_total", "Conexiones abiertas contra la base.", campo("conexiones_nuevas")),
+        Lectura("ltv_db_checkouts_total", "Préstamos de conexiones del pool.", campo("checkouts")),
+        Lectura("ltv_db_conexiones_en_uso", "Conexiones del pool prestadas en este momento.",
+                campo("en_uso"), tipo="gauge"),
+        Lectura("ltv_db_conexion_segundos_promedio", "Tiempo medio de apertura de una conexión.",
+                campo("segundos_conexion_promedio"), tipo="gauge"),
+    ])
+
+
+def texto_prometheus():
+    return "\n".join(m.texto() for m in METRICAS) + "\n"
+
+
+def registrar(evento, **campos):
+    """Línea estructurada (JSON) en el log."""
+    print("📏 " + json.dumps({"evento": evento, **CONTEXTO, **campos}, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def etapa(nombre, log=False, **campos):
+    """
+    Mide el bloque y lo suma al histograma de etapas y al desglose del request en curso.
+    Devuelve un dict donde el bloque puede anotar datos (p. ej. medida["filas"] = n);
+    con log=True se emite como línea estructurada al terminar.
+    """
+    medida = dict(campos)
+    inicio = time.perf_counter()
+    try:
+        yield medida
+    finally:
+        segundos = time.perf_counter() - inicio
+        ETAPAS.observar(segundos, etapa=nombre)
+        desglose = getattr(_local, "etapas", None)
+        if desglose is not None:
+            desglose[nombre] = round(desglose.get(nombre, 0.0) + segundos * 1000, 3)
+        if log:
+            registrar("etapa", etapa=nombre, segundos=round(segundos, 4), **medida)
+
+
+def _filtros_del_request(cuerpo):
+    """Entradas de un callback de Dash como {"id.propiedad": valor}."""
+    entradas = {}
+    for entrada in (cuerpo or {}).get("inputs", []) + (cuerpo or {}).get("state", []):
+        if isinstance(entrada, dict) and "id" in entrada:
+            entradas[f"{entrada['id']}.{entrada.get('property')}"] = entrada.get("value")
+    return entradas
+
+
+def instrumentar_servidor(server, ruta_metricas="/metrics", slow_ms=SLOW_REQUEST_MS):
+    """Histogramas por request, log opcional de requests lentos y la ruta /metrics."""
+    from flask import Response, request
+
+    @server.before_request
+    def _inicio_request():
+        _local.inicio = time.perf_counter()
+        _local.etapas = {}
+
+    @server.after_request
+    def _fin_request(respuesta):
+        inicio = getattr(_local, "inicio", None)
+        if inicio is None or request.path == ruta_metricas:
+            return respuesta
+        segundos = time.perf_counter() - inicio
+        etapas, _local.etapas, _local.inicio = _local.etapas, None, None
+
+        ruta = request.url_rule.rule if request.url_rule is not None else "sin_ruta"
+        cuerpo = request.get_json(silent=True) if request.is_json else None
+        salida = (cuerpo or {}).get("output", "") if isinstance(cuerpo, dict) else ""
+
+        REQUESTS.observar(segundos, ruta=ruta, salida=salida, estado=respuesta.status_code)
+        # Respuestas en streaming: no se lee el cuerpo para medirlo
+        if not respuesta.is_streamed:
+            RESPUESTAS.observar(respuesta.calculate_content_length() or 0, ruta=ruta, salida=salida)
+
+        if slow_ms and segundos * 1000 >= slow_ms:
+            LENTOS.incrementar(ruta=ruta, salida=salida)
+            registrar(
+                "request_lento", ruta=ruta, salida=salida, ms=round(segundos * 1000, 1),
+                estado=respuesta.status_code, filtros=_filtros_del_request(cuerpo), etapas_ms=etapas,
+            )
+        return respuesta
+
+    @server.route(ruta_metricas)
+    def _metricas():
+        # Por proceso: con varios workers de gunicorn, cada scrape ve el worker que lo atendió
+        return Response(texto_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    return server
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# ======================================================
+#  OBL DIGITAL — Motor de filtros en memoria (fecha + dimensiones)
+# ======================================================
+
+DIMENSIONES = ["country", "affiliate", "source"]
+
+
+class MotorFiltros:
+    """
+    Índice construido una vez por carga de datos:
+    - filas ordenadas por fecha, así un rango de fechas es un rango de posiciones (searchsorted);
+    - códigos categóricos por dimensión y, por cada valor, el array ordenado de posiciones donde aparece.
+    Una combinación de filtros se resuelve intersectando posiciones, sin copiar el frame completo.
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensiones=DIMENSIONES):
+        if df["date"].is_monotonic_increasing and df.index.equals(pd.RangeIndex(len(df))):
+            # Ya ordenado (snapshot del ETL): sin copia, las columnas siguen mapeadas
+            self.df = df
+        else:
+            self.df = df.sort_values("date", kind="stable").reset_index(drop=True)
+        self.fechas = self.df["date"].to_numpy(dtype="datetime64[ns]")
+        self.dimensiones = [d for d in dimensiones if d in self.df.columns]
+
+        self.codigos = {}
+        self.categorias = {}
+        self.posiciones = {}
+        for dim in self.dimensiones:
+            cat = pd.Categorical(self.df[dim])
+            codigos = cat.codes.astype(np.int32)
+            orden = np.argsort(codigos, kind="stable")
+            cortes = np.searchsorted(codigos[orden], np.arange(len(cat.categories) + 1))
+
+            self.codigos[dim] = codigos
+            self.categorias[dim] = pd.Index(cat.categories)
+            self.posiciones[dim] = [orden[cortes[k]:cortes[k + 1]] for k in range(len(cat.categories))]
+
+    def __len__(self):
+        return len(self.df)
+
+    def rango_fechas(self, start, end):
+        """Rango [inicio, fin) de posiciones con start <= date <= end."""
+        if not (start and end):
+            return 0, len(self.df)
+        inicio = np.searchsorted(self.fechas, np.datetime64(pd.to_datetime(start), "ns"), side="left")
+        fin = np.searchsorted(self.fechas, np.datetime64(pd.to_datetime(end), "ns"), side="right")
+        return int(inicio), int(max(inicio, fin))
+
+    def _codigos_seleccionados(self, dim, valores):
+        codigos = self.categorias[dim].get_indexer(list(valores))
+        return codigos[codigos >= 0]
+
+    def posiciones_filtradas(self, start=None, end=None, **filtros) -> np.ndarray:
+        """Posiciones (ordenadas por fecha) que cumplen el rango de fechas y los filtros por dimensión."""
+        inicio, fin = self.rango_fechas(start, end)
+        activos = {dim: vals for dim, vals in filtros.items() if vals and dim in self.codigos}
+        if not activos:
+            return np.arange(inicio, fin)
+
+        seleccion = {dim: self._codigos_seleccionados(dim, vals) for dim, vals in activos.items()}
+        if any(len(c) == 0 for c in seleccion.values()):
+            return np.empty(0, dtype=np.int64)
+
+        # Partimos del filtro más selectivo (menos filas) y recortamos al rango de fechas
+        tamanos = {
+            dim: sum(len(self.posiciones[dim][k]) for k in codigos)
+            for dim, codigos in seleccion.items()
+        }
+        base = min(tamanos, key=tamanos.get)
+        candidatas = np.sort(np.concatenate([self.posiciones[base][k] for k in seleccion[base]]))
+        candidatas = candidatas[np.searchsorted(candidatas, inicio):np.searchsorted(candidatas, fin)]
+
+        # El resto de dimensiones se valida con una tabla booleana sobre los códigos
+        for dim, codigos in seleccion.items():
+            if dim == base or len(candidatas) == 0:
+                continue
+            permitido = np.zeros(len(self.categorias[dim]) + 1, dtype=bool)
+            permitido[codigos] = True  # el último slot (código -1 = nulo) queda en False
+            candidatas = candidatas[permitido[self.codigos[dim][candidatas]]]
+        return candidatas
+
+    def filtrar(self, start=None, end=None, affiliates=None, sources=None, countries=None) -> pd.DataFrame:
+        """Mismos filtros que actualizar_dashboard; solo copia las filas seleccionadas."""
+        posiciones = self.posiciones_filtradas(
+            start, end, affiliate=affiliates, source=sources, country=countries
+        )
+        if len(posiciones) and posiciones[-1] - posiciones[0] + 1 == len(posiciones):
+            # Rango contiguo (solo filtro de fechas): vista sin copia
+            return self.df.iloc[posiciones[0]:posiciones[-1] + 1]
+        return self.df.take(posiciones)
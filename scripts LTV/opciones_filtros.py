@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# ======================================================
+#  OBL DIGITAL — Opciones en cascada de los dropdowns (índice de co-ocurrencias por mes)
+# ======================================================
+
+DIMENSIONES = ["country", "affiliate", "source"]
+
+
+class IndiceOpciones:
+    """
+    Combinaciones distintas (mes, country, affiliate, source) presentes en el dataset,
+    ordenadas por mes. Las opciones de cada dropdown para un rango de fechas y los
+    valores elegidos en los otros dropdowns salen de este índice (miles de filas,
+    no millones): un corte por mes y una tabla booleana por dimensión, sin recorrer el frame.
+    El rango se resuelve por mes completo: las opciones pueden incluir un valor que
+    solo aparece en los días del mes que quedan fuera, nunca omiten uno que sí aparece.
+    """
+
+    def __init__(self, meses, codigos: dict, categorias: dict):
+        self.dimensiones = list(codigos)
+        self.categorias = {dim: pd.Index(categorias[dim]) for dim in self.dimensiones}
+
+        # Filas con alguna dimensión nula no cuentan (tampoco en los agregados)
+        validas = np.ones(len(meses), dtype=bool)
+        for dim in self.dimensiones:
+            validas &= np.asarray(codigos[dim]) >= 0
+        meses = np.asarray(meses, dtype="datetime64[M]")[validas]
+        self.meses = np.unique(meses)
+
+        # Una clave entera por combinación: np.unique deduplica y ordena por mes en un paso
+        clave = np.searchsorted(self.meses, meses).astype(np.int64)
+        for dim in self.dimensiones:
+            clave = clave * len(self.categorias[dim]) + np.asarray(codigos[dim])[validas]
+        clave = np.unique(clave)
+
+        self.codigos = {}
+        for dim in reversed(self.dimensiones):
+            n = len(self.categorias[dim])
+            self.codigos[dim] = (clave % n).astype(np.int32)
+            clave //= n
+        self.cortes = np.searchsorted(clave, np.arange(len(self.meses) + 1))
+
+    @classmethod
+    def desde_motor(cls, motor):
+        """Reutiliza los códigos categóricos del MotorFiltros (sin volver a factorizar)."""
+        return cls(motor.fechas, motor.codigos, motor.categorias)
+
+    @classmethod
+    def desde_frame(cls, df: pd.DataFrame, dimensiones=DIMENSIONES):
+        """Desde un frame con date y dimensiones (p. ej. las combinaciones que devuelve la base)."""
+        dims = [d for d in dimensiones if d in df.columns]
+        codigos, categorias = {}, {}
+        for dim in dims:
+            cat = pd.Categorical(df[dim].astype(object))
+            codigos[dim], categorias[dim] = cat.codes, cat.categories
+        return cls(pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]"), codigos, categorias)
+
+    def __len__(self):
+        return int(self.cortes[-1])
+
+    def _tramo(self, start, end):
+        if not (start and end) or not len(self.meses):
+            return 0, len(self)
+        desde = np.searchsorted(self.meses, np.datetime64(pd.to_datetime(start), "M"), side="left")
+        hasta = np.searchsorted(self.meses, np.datetime64(pd.to_datetime(end), "M"), side="right")
+        return int(self.cortes[desde]), int(self.cortes[max(desde, hasta)])
+
+    def opciones(self, start=None, end=None, affiliates=None, sources=None, countries=None) -> dict:
+        """
+        {dimensión: valores} que coexisten, en el rango de fechas, con lo elegido en
+        las otras dimensiones. Cada dropdown se acota por los demás, no por sí mismo:
+        se puede seguir agregando valores a una selección.
+        """
+        lo, hi = self._tramo(start, end)
+        elegidos = {"affiliate": affiliates, "source": sources, "country": countries}
+
+        permitidos = {}
+        for dim in self.dimensiones:
+            if elegidos.get(dim):
+                codigos = self.categorias[dim].get_indexer([str(v) for v in elegidos[dim]])
+                tabla = np.zeros(len(self.categorias[dim]), dtype=bool)
+                tabla[codigos[codigos >= 0]] = True
+                permitidos[dim] = tabla
+
+        resultado = {dim: [] for dim in DIMENSIONES}
+        for dim in self.dimensiones:
+            mascara = None
+            for otra, tabla in permitidos.items():
+                if otra != dim:
+                    cumple = tabla[self.codigos[otra][lo:hi]]
+                    mascara = cumple if mascara is None else mascara & cumple
+            codigos = self.codigos[dim][lo:hi]
+            if mascara is not None:
+                codigos = codigos[mascara]
+            presentes = np.bincount(codigos, minlength=len(self.categorias[dim])) > 0
+            resultado[dim] = self.categorias[dim][presentes].tolist()
+        return resultado
@@ -0,0 +1,114 @@
+import functools
+import gzip
+import hashlib
+import os
+
+from cache_resultados import SingleFlight
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se negocia gzip
+    brotli = None
+
+# ======================================================
+#  OBL DIGITAL — Respuestas del servidor: motor JSON, compresión y callbacks coalescidos
+# ======================================================
+
+# Respuestas JSON más chicas que esto (bytes) viajan sin comprimir; 0 = sin compresión
+COMPRIMIR_MIN_BYTES = int(os.getenv("LTV_COMPRIMIR_MIN_BYTES", "1024"))
+NIVEL_GZIP = int(os.getenv("LTV_NIVEL_GZIP", "6"))
+NIVEL_BROTLI = int(os.getenv("LTV_NIVEL_BROTLI", "5"))
+
+# Motor con el que plotly.io.json (y con él Dash) serializa callbacks y layout: "json" u "orjson".
+# Con las figuras de este dashboard (arrays de numpy) el camino orjson de plotly 5.24 resultó
+# más lento que json; "auto" elegiría orjson solo por estar instalado.
+JSON_ENGINE = os.getenv("LTV_JSON_ENGINE", "json")
+
+# Callbacks idénticos (mismo cuerpo) en curso al mismo tiempo se calculan una sola vez
+SINGLE_FLIGHT = os.getenv("LTV_SINGLE_FLIGHT", "1") == "1"
+CALLBACKS_EN_CURSO = SingleFlight()
+
+
+def configurar_json(engine=JSON_ENGINE):
+    """Fija el motor de plotly.io.json para que no dependa de qué paquetes hay instalados."""
+    import plotly.io.json as plotly_json
+
+    plotly_json.config.default_engine = engine
+    return engine
+
+
+def elegir_codificacion(aceptadas: str):
+    """br (si hay brotli) o gzip según Accept-Encoding; None si el cliente no acepta ninguna."""
+    calidades = {}
+    for parte in (aceptadas or "").split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        q = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                q = float(parametros.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if nombre:
+            calidades[nombre.lower()] = q
+
+    for codificacion in (["br"] if brotli is not None else []) + ["gzip"]:
+        if calidades.get(codificacion, calidades.get("*", 0)) > 0:
+            return codificacion
+    return None
+
+
+def comprimir(datos: bytes, codificacion):
+    if codificacion == "br":
+        return brotli.compress(datos, quality=NIVEL_BROTLI)
+    return gzip.compress(datos, compresslevel=NIVEL_GZIP)
+
+
+def comprimir_respuestas(server, minimo=COMPRIMIR_MIN_BYTES):
+    """
+    Comprime las respuestas JSON (callbacks, layout, dependencias) con br o gzip según
+    Accept-Encoding. Registrarlo después de instrumentar_servidor: los hooks after_request
+    corren en orden inverso y las métricas ven así los bytes que viajan.
+    """
+    from flask import request
+
+    @server.after_request
+    def _comprimir(respuesta):
+        if (not minimo or respuesta.is_streamed or respuesta.direct_passthrough
+                or respuesta.status_code != 200 or "Content-Encoding" in respuesta.headers
+                or respuesta.mimetype != "application/json"):
+            return respuesta
+        respuesta.vary.add("Accept-Encoding")
+        codificacion = elegir_codificacion(request.headers.get("Accept-Encoding", ""))
+        datos = respuesta.get_data()
+        if codificacion is None or len(datos) < minimo:
+            return respuesta
+        respuesta.set_data(comprimir(datos, codificacion))
+        respuesta.headers["Content-Encoding"] = codificacion
+        return respuesta
+
+    return server
+
+
+def coalescer_callbacks(server, ruta="_dash-update-component"):
+    """
+    Requests idénticos a la ruta de callbacks de Dash (mismo cuerpo: salida, entradas y
+    quién disparó) que llegan mientras uno igual está en curso esperan su respuesta.
+    Por proceso: con varios workers de gunicorn, cada uno coalesce sus hilos.
+    """
+    from flask import Response, request
+
+    endpoint = next(r.endpoint for r in server.url_map.iter_rules() if r.rule.endswith(ruta))
+    vista = server.view_functions[endpoint]
+
+    def congelar(*args, **kwargs):
+        respuesta = server.make_response(vista(*args, **kwargs))
+        return respuesta.get_data(), respuesta.status_code, list(respuesta.headers.items())
+
+    @functools.wraps(vista)
+    def _coalescida(*args, **kwargs):
+        clave = hashlib.sha1(request.get_data()).hexdigest()
+        datos, estado, encabezados = CALLBACKS_EN_CURSO.ejecutar(clave, lambda: congelar(*args, **kwargs))
+        return Response(datos, status=estado, headers=encabezados)
+
+    server.view_functions[endpoint] = _coalescida
+    return server
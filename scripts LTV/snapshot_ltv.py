@@ -0,0 +1,211 @@
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+from conexion_mysql import obtener_engine
+
+# ======================================================
+#  OBL DIGITAL — Snapshot columnar local (Arrow IPC / Feather v2, memory-mapped)
+# ======================================================
+
+SNAPSHOT_PATH = os.getenv("LTV_SNAPSHOT_PATH", "GENERAL_LTV_snapshot.arrow")
+
+# Subir cuando cambien columnas o tipos: los lectores ignoran snapshots de otra versión
+SCHEMA_VERSION = 1
+
+# Snapshot escrito sin poder ver la tabla (la base no respondía): se prefiere a la base
+# solo durante estas horas desde que se escribió
+SIN_SENAL_HORAS = float(os.getenv("LTV_SNAPSHOT_SIN_SENAL_HORAS", "24"))
+
+TIPOS = {
+    "date": pa.timestamp("ns"),
+    "country": pa.string(),
+    "affiliate": pa.string(),
+    "source": pa.string(),
+    "usd_total": pa.float64(),
+    "count_ftd": pa.float64(),
+    "general_ltv": pa.float64(),
+}
+
+
+def senal_tabla(tabla):
+    """Filas y fecha máxima de la tabla en la base; None si no hay conexión."""
+    try:
+        with obtener_engine().connect() as conexion:
+            fila = conexion.exec_driver_sql(f"SELECT COUNT(*), MAX(date) FROM {tabla}").fetchone()
+            return ("sql", int(fila[0]), str(fila[1]))
+    except Exception:
+        return None
+
+
+def senales_para_sellar(tabla, cargada):
+    """
+    Señales con las que se sella un snapshot: senal_db si la tabla recibió estos mismos
+    datos; si no, senal_previa (cómo estaba la tabla al escribirlo, None si no respondía).
+    """
+    senal = senal_tabla(tabla)
+    return {"senal_db": senal} if cargada else {"senal_previa": senal}
+
+
+def _esquema(columnas, senal_db=None, senal_previa=None):
+    return pa.schema([(c, TIPOS[c]) for c in TIPOS if c in columnas]).with_metadata({
+        "ltv_schema_version": str(SCHEMA_VERSION),
+        "ltv_generado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ltv_escrito": repr(time.time()),
+        "ltv_senal_db": json.dumps(list(senal_db) if senal_db else None),
+        "ltv_senal_previa": json.dumps(list(senal_previa) if senal_previa else None),
+    })
+
+
+def escribir_snapshot(df: pd.DataFrame, ruta=SNAPSHOT_PATH, senal_db=None, senal_previa=None):
+    """
+    Escribe df tipado y sin compresión (así se puede mapear sin copiar).
+    senal_db: senal_tabla() de la base que contiene estos mismos datos, o None si
+    la base no llegó a actualizarse (el snapshot es más nuevo que la tabla); en ese
+    caso senal_previa es la señal que tenía la tabla al escribirlo, si respondía.
+    """
+    esquema = _esquema(df.columns, senal_db, senal_previa)
+    tabla = pa.Table.from_pandas(df[esquema.names], schema=esquema, preserve_index=False)
+
+    # Escritura atómica: los workers con el archivo anterior mapeado siguen leyendo el viejo
+    temporal = f"{ruta}.tmp"
+    with pa.OSFile(temporal, "wb") as archivo:
+        with pa.ipc.new_file(archivo, esquema) as escritor:
+            escritor.write_table(tabla)
+    os.replace(temporal, ruta)
+    print(f"💾 Snapshot guardado: {ruta} ({len(df)} filas, esquema v{SCHEMA_VERSION})")
+
+
+class EscritorSnapshot:
+    """
+    Escribe el snapshot bloque a bloque (modo streaming del ETL). La señal de la base
+    se conoce recién al final: cerrar() re-sella el archivo copiando los bloques
+    ya escritos, mapeados en memoria, sin volver a cargarlos todos a la vez.
+    """
+
+    def __init__(self, ruta=SNAPSHOT_PATH):
+        self.ruta = ruta
+        self._bloques = f"{ruta}.bloques"
+        self._archivo = None
+        self._escritor = None
+        self.filas = 0
+
+    def escribir(self, df: pd.DataFrame):
+        if self._escritor is None:
+            self._esquema = _esquema(df.columns)
+            self._archivo = pa.OSFile(self._bloques, "wb")
+            self._escritor = pa.ipc.new_file(self._archivo, self._esquema)
+        self._escritor.write_table(
+            pa.Table.from_pandas(df[self._esquema.names], schema=self._esquema, preserve_index=False)
+        )
+        self.filas += len(df)
+
+    def _cerrar_archivo(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            self._archivo.close()
+            self._escritor = None
+
+    def cerrar(self, senal_db=None, senal_previa=None):
+        """Publica el snapshot con las señales finales (misma semántica que escribir_snapshot)."""
+        if self._archivo is None:
+            return
+        self._cerrar_archivo()
+        lector = pa.ipc.open_file(pa.memory_map(self._bloques))
+        esquema = _esquema(lector.schema.names, senal_db, senal_previa)
+
+        temporal = f"{self.ruta}.tmp"
+        with pa.OSFile(temporal, "wb") as archivo:
+            with pa.ipc.new_file(archivo, esquema) as escritor:
+                for i in range(lector.num_record_batches):
+                    escritor.write_batch(lector.get_batch(i))
+        del lector
+        os.replace(temporal, self.ruta)
+        os.remove(self._bloques)
+        print(f"💾 Snapshot guardado: {self.ruta} ({self.filas} filas, esquema v{SCHEMA_VERSION})")
+
+    def descartar(self):
+        """Lectura incompleta: no se publica nada."""
+        self._cerrar_archivo()
+        if os.path.exists(self._bloques):
+            os.remove(self._bloques)
+
+
+def anexar_snapshot(df: pd.DataFrame, ruta=SNAPSHOT_PATH, senal_db=None):
+    """
+    Agrega df al final del snapshot y lo re-sella con senal_db (un archivo IPC no admite
+    agregar en el lugar): los bloques existentes se copian mapeados en memoria, sin
+    convertirlos a pandas, y df se suma como un bloque más.
+    """
+    lector = pa.ipc.open_file(pa.memory_map(ruta))
+    esquema = _esquema(lector.schema.names, senal_db)
+    filas = 0
+
+    temporal = f"{ruta}.tmp"
+    with pa.OSFile(temporal, "wb") as archivo:
+        with pa.ipc.new_file(archivo, esquema) as escritor:
+            for i in range(lector.num_record_batches):
+                bloque = lector.get_batch(i)
+                escritor.write_batch(bloque)
+                filas += bloque.num_rows
+            escritor.write_table(pa.Table.from_pandas(df[esquema.names], schema=esquema, preserve_index=False))
+    del lector
+    os.replace(temporal, ruta)
+    print(f"💾 Snapshot actualizado: {ruta} ({filas} + {len(df)} filas, esquema v{SCHEMA_VERSION})")
+
+
+def metadatos_snapshot(ruta=SNAPSHOT_PATH):
+    """Metadatos del snapshot (solo lee el esquema) o None si no existe o es de otra versión."""
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with pa.memory_map(ruta) as archivo:
+            meta = pa.ipc.open_file(archivo).schema.metadata or {}
+    except Exception as e:
+        print(f"⚠️ Snapshot ilegible ({ruta}): {e}")
+        return None
+    meta = {k.decode(): v.decode() for k, v in meta.items()}
+    if meta.get("ltv_schema_version") != str(SCHEMA_VERSION):
+        print(f"⚠️ Snapshot {ruta} con esquema v{meta.get('ltv_schema_version')}, se esperaba v{SCHEMA_VERSION}.")
+        return None
+    mtime = os.path.getmtime(ruta)
+    return {
+        "version": SCHEMA_VERSION,
+        "generado": meta.get("ltv_generado"),
+        # Snapshots anteriores a ltv_escrito: la fecha del archivo
+        "escrito": float(meta.get("ltv_escrito") or mtime),
+        "senal_db": json.loads(meta.get("ltv_senal_db", "null")),
+        "senal_previa": json.loads(meta.get("ltv_senal_previa", "null")),
+        "mtime": mtime,
+    }
+
+
+def snapshot_vigente(meta, senal_db, ahora=None) -> bool:
+    """
+    El snapshot es tan o más nuevo que la tabla (senal_db: su señal actual, None si no responde):
+    - sellado con la señal de la tabla: vale mientras la tabla tenga esa misma señal;
+    - escrito cuando la base no recibió la carga: vale mientras la tabla siga como estaba
+      al escribirlo (senal_previa) o, si entonces no respondía, durante SIN_SENAL_HORAS;
+    - sin base a la que comparar, la copia local es lo más nuevo que hay.
+    """
+    if meta is None:
+        return False
+    if senal_db is None:
+        return True
+    if meta["senal_db"] is not None:
+        return meta["senal_db"] == list(senal_db)
+    if meta["senal_previa"] is not None:
+        return meta["senal_previa"] == list(senal_db)
+    return (time.time() if ahora is None else ahora) - meta["escrito"] < SIN_SENAL_HORAS * 3600
+
+
+def leer_snapshot(ruta=SNAPSHOT_PATH) -> pd.DataFrame:
+    """
+    Lee el snapshot mapeado en memoria: las columnas numéricas y de fecha sin nulos
+    quedan como vistas sobre las páginas del archivo, compartidas entre workers.
+    """
+    # El mapa se libera cuando ya no quedan columnas que lo referencien
+    tabla = pa.ipc.open_file(pa.memory_map(ruta)).read_all()
+    return tabla.to_pandas(split_blocks=True)
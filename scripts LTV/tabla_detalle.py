@@ -0,0 +1,102 @@
+import math
+import pandas as pd
+
+# ======================================================
+#  OBL DIGITAL — Paginación, orden y filtro server-side de tabla-detalle
+# ======================================================
+
+# Operadores de filter_query de dash_table (mismo formato que la documentación de Dash)
+OPERADORES = [
+    ["ge ", ">="],
+    ["le ", "<="],
+    ["lt ", "<"],
+    ["gt ", ">"],
+    ["ne ", "!="],
+    ["eq ", "="],
+    ["contains "],
+    ["datestartswith "],
+]
+
+
+def _separar_filtro(parte):
+    for grupo in OPERADORES:
+        for operador in grupo:
+            if operador not in parte:
+                continue
+            nombre, valor = parte.split(operador, 1)
+            nombre = nombre[nombre.find("{") + 1: nombre.rfind("}")]
+            texto = valor.strip()
+            if texto and texto[0] == texto[-1] and texto[0] in ("'", '"', "`"):
+                texto = valor = texto[1:-1].replace("\\" + texto[0], texto[0])
+            else:
+                try:
+                    valor = float(texto)
+                except ValueError:
+                    valor = texto
+            return nombre, grupo[0].strip(), valor, texto
+    return None, None, None, None
+
+
+def _como_texto(serie: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.strftime("%Y-%m-%d")
+    return serie.astype(str)
+
+
+def filtrar_tabla(df: pd.DataFrame, filter_query: str) -> pd.DataFrame:
+    if not filter_query:
+        return df
+    for parte in filter_query.split(" && "):
+        columna, operador, valor, texto = _separar_filtro(parte)
+        if columna not in df.columns:
+            continue
+        serie = df[columna]
+        if operador in ("eq", "ne", "lt", "le", "gt", "ge"):
+            if (isinstance(valor, str) or pd.api.types.is_datetime64_any_dtype(serie)
+                    or isinstance(serie.dtype, pd.CategoricalDtype)):
+                serie, valor = _como_texto(serie), texto
+            mascara = {
+                "eq": serie == valor, "ne": serie != valor,
+                "lt": serie < valor, "le": serie <= valor,
+                "gt": serie > valor, "ge": serie >= valor,
+            }[operador]
+        elif operador == "contains":
+            mascara = _como_texto(serie).str.contains(texto, case=False, regex=False, na=False)
+        elif operador == "datestartswith":
+            mascara = _como_texto(serie).str.startswith(texto, na=False)
+        else:
+            continue
+        df = df.loc[mascara.to_numpy()]
+    return df
+
+
+def ordenar_tabla(df: pd.DataFrame, sort_by) -> pd.DataFrame:
+    columnas = [s for s in (sort_by or []) if s.get("column_id") in df.columns]
+    if not columnas:
+        return df
+    return df.sort_values(
+        [s["column_id"] for s in columnas],
+        ascending=[s.get("direction") == "asc" for s in columnas],
+        kind="stable",
+    )
+
+
+def pagina_tabla(detalle: pd.DataFrame, page_current, page_size, sort_by=None, filter_query=""):
+    """
+    Filtra, ordena y recorta solo la página pedida.
+    Devuelve (registros de la página, total de filas, total de páginas, página efectiva).
+    """
+    page_size = page_size or 15
+    df = ordenar_tabla(filtrar_tabla(detalle, filter_query), sort_by)
+    total = len(df)
+    paginas = max(1, math.ceil(total / page_size))
+    pagina = min(max(page_current or 0, 0), paginas - 1)
+
+    return registros_tabla(df.iloc[pagina * page_size:(pagina + 1) * page_size]), total, paginas, pagina
+
+
+def registros_tabla(pagina: pd.DataFrame):
+    """Filas de la página tal como las muestra la DataTable."""
+    tabla = pagina.copy()
+    tabla["date"] = tabla["date"].dt.strftime("%Y-%m-%d")
+    return tabla.round(2).to_dict("records")
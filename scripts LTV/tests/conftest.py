@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+# ======================================================
+#  OBL DIGITAL — Pruebas (desde "scripts LTV": python -m pytest -q)
+#
+#  Los módulos leen DB_URL y sus rutas al importarse: el entorno apunta a un
+#  SQLite y a archivos en un directorio temporal antes de importar nada.
+#  Las pruebas nunca tocan Railway.
+# ======================================================
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark.bench_ltv import configurar_entorno  # noqa: E402
+
+configurar_entorno(tempfile.mkdtemp(prefix="pruebas_ltv_"))
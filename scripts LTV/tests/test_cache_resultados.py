@@ -0,0 +1,79 @@
+import os
+import stat
+import threading
+
+import pandas as pd
+import pytest
+
+import metricas_ltv
+from cache_resultados import CacheResultados, normalizar_filtros
+
+
+@pytest.fixture
+def metricas(monkeypatch):
+    # exponer_caches agrega a METRICAS: cada prueba trabaja sobre una copia
+    monkeypatch.setattr(metricas_ltv, "METRICAS", list(metricas_ltv.METRICAS))
+    return metricas_ltv
+
+
+def test_filtros_equivalentes_comparten_clave():
+    a = normalizar_filtros("2024-01-01", "2024-01-31T00:00:00", ["b", "a", "a"], None, [])
+    b = normalizar_filtros("2024-01-01 00:00:00", "2024-01-31", ["a", "b"], [], None)
+    assert a == b
+
+
+@pytest.mark.parametrize("backend", ["memoria", "sqlite"])
+def test_hits_misses_y_cambio_de_version(tmp_path, backend):
+    cache = CacheResultados(backend=backend, ruta=str(tmp_path / "cache.sqlite"))
+    cache.usar_version("v1")
+    filtros = normalizar_filtros(None, None, ["a"], None, None)
+    valor = {"totales": pd.DataFrame({"usd_total": [1.5]})}
+
+    assert cache.obtener_o_calcular(filtros, lambda: valor) is valor
+    guardado = cache.obtener_o_calcular(filtros, lambda: pytest.fail("debió salir de la cache"))
+    pd.testing.assert_frame_equal(guardado["totales"], valor["totales"])
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.usar_version("v2")
+    assert cache.estadisticas()["entradas"] == 0
+
+
+@pytest.mark.skipif(os.name != "posix", reason="permisos POSIX")
+def test_archivo_sqlite_solo_del_usuario(tmp_path):
+    ruta = tmp_path / "cache.sqlite"
+    CacheResultados(backend="sqlite", ruta=str(ruta))
+    assert stat.S_IMODE(ruta.stat().st_mode) == 0o600
+
+
+def test_contadores_de_cache_en_metrics(metricas):
+    cache = CacheResultados()
+    cache.usar_version("v1")
+    filtros = normalizar_filtros(None, None, None, None, None)
+    for _ in range(3):
+        cache.obtener_o_calcular(filtros, lambda: {"total": 1})
+
+    metricas.exponer_caches({"resultados": cache})
+    texto = metricas.texto_prometheus()
+    assert 'ltv_cache_hits_total{cache="resultados"} 2' in texto
+    assert 'ltv_cache_misses_total{cache="resultados"} 1' in texto
+    assert 'ltv_cache_entradas{cache="resultados"} 1' in texto
+    assert "# TYPE ltv_cache_entradas gauge" in texto
+
+
+def test_contadores_exactos_con_hilos_concurrentes():
+    cache = CacheResultados()
+    cache.usar_version("v1")
+    filtros = normalizar_filtros(None, None, None, None, None)
+    cache.obtener_o_calcular(filtros, lambda: {"total": 1})
+
+    def consultar():
+        for _ in range(2_000):
+            cache.obtener_o_calcular(filtros, lambda: pytest.fail("debió salir de la cache"))
+
+    hilos = [threading.Thread(target=consultar) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert (cache.hits, cache.misses) == (16_000, 1)
+    assert cache.estadisticas()["hit_rate"] == pytest.approx(16_000 / 16_001)
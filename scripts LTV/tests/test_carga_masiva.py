@@ -0,0 +1,211 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import pytest
+
+import carga_masiva
+import datos_dashboard
+from benchmark.generador_raw import agregar_source
+from carga_masiva import COLUMNAS_CLEAN, _cargar_con_load_data, cargar_tabla_atomica, reconstruir_rollups
+from conexion_mysql import crear_conexion
+from consultas_sql import ConsultasSQL
+
+COLUMNAS = COLUMNAS_CLEAN + [("source", "VARCHAR(100)")]
+
+
+class CursorLoadData:
+    """Guarda la sentencia y el archivo que recibiría MySQL (el archivo se borra al terminar)."""
+
+    def execute(self, sql):
+        self.sql = sql
+        ruta = sql.split("INFILE '", 1)[1].split("'\n", 1)[0].replace("''", "'")
+        with open(ruta, encoding="utf-8", newline="") as tsv:
+            self.contenido = tsv.read()
+
+
+def _df():
+    return pd.DataFrame({
+        "date": pd.to_datetime(["2024-03-01", None]),
+        "country": ["Peru", None],
+        "affiliate": ['C:\\afiliados\\n"uno"', "NULL"],
+        "usd_total": [10.5, np.nan],
+        "count_ftd": [1.0, np.nan],
+        "general_ltv": [10.5, 0.0],
+    }, index=[7, 7])
+
+
+def test_load_data_sin_escapes_y_con_null_explicito():
+    cursor = CursorLoadData()
+    _cargar_con_load_data(cursor, "STAGING", _df(), COLUMNAS_CLEAN)
+
+    assert "ESCAPED BY ''" in cursor.sql
+    assert cursor.contenido == (
+        '2024-03-01 00:00:00\t"Peru"\t"C:\\afiliados\\n""uno"""\t10.5\t1\t10.5\n'
+        'NULL\tNULL\t"NULL"\tNULL\t0\t0.0\n'
+    )
+
+
+def test_ruta_windows_con_barras_normales(monkeypatch):
+    ruta = "C:\\Users\\o'brien\\AppData\\Local\\Temp\\tmp1.tsv"
+
+    class Temporal:
+        name = ruta
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    class Cursor:
+        def execute(self, sql):
+            self.sql = sql
+
+    borrados = []
+    monkeypatch.setattr(carga_masiva.tempfile, "NamedTemporaryFile", lambda *a, **k: Temporal())
+    monkeypatch.setattr(carga_masiva.os, "remove", borrados.append)
+    cursor = Cursor()
+    _cargar_con_load_data(cursor, "STAGING", _df().iloc[:0], COLUMNAS_CLEAN)
+
+    assert "INFILE 'C:/Users/o''brien/AppData/Local/Temp/tmp1.tsv'" in cursor.sql
+    assert borrados == [ruta]
+
+
+class CursorMySQL:
+    """Cursor de una conexión no SQLite: registra las sentencias; existen las tablas de `vivas`."""
+
+    def __init__(self, vivas):
+        self.vivas, self.sentencias, self._fila = set(vivas), [], None
+
+    def execute(self, sql, params=None):
+        self.sentencias.append(sql)
+        self._fila = (params[0],) if sql.startswith("SHOW TABLES") and params[0] in self.vivas else None
+
+    def fetchone(self):
+        return self._fila
+
+
+class ConexionMySQL:
+    def commit(self):
+        pass
+
+
+def test_tabla_y_rollups_en_un_solo_rename():
+    tabla = "GENERAL_LTV_X_CLEAN"
+    rollups = [carga_masiva.nombre_rollup(tabla, nivel) for nivel in carga_masiva.ROLLUPS]
+    cursor = CursorMySQL([tabla, *rollups[:2]])
+    pares = [(t, f"{t}_staging", f"{t}_old") for t in [tabla, *rollups]]
+    carga_masiva._intercambiar_tablas(cursor, ConexionMySQL(), pares)
+
+    renames = [s for s in cursor.sentencias if s.startswith("RENAME")]
+    assert renames == ["RENAME TABLE " + ", ".join(
+        [f"{tabla} TO {tabla}_old", f"{tabla}_staging TO {tabla}"]
+        + [f"{r} TO {r}_old, {r}_staging TO {r}" for r in rollups[:2]]
+        + [f"{rollups[2]}_staging TO {rollups[2]}"]
+    )]
+
+
+def _clean(filas, semilla):
+    rng = np.random.default_rng(semilla)
+    df = pd.DataFrame({
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 60, filas), unit="D"),
+        "country": rng.choice(["Peru", "Brazil"], filas),
+        "affiliate": rng.choice([f"Aff {i}" for i in range(5)], filas),
+        "usd_total": rng.integers(0, 1_000, filas).astype(float),
+        "count_ftd": rng.integers(0, 3, filas).astype(float),
+    })
+    df["general_ltv"] = 0.0
+    return agregar_source(df, semilla)
+
+
+@pytest.fixture
+def conexion():
+    conexion = crear_conexion()
+    yield conexion
+    conexion.close()
+
+
+def test_rollups_publicados_con_la_tabla(conexion, monkeypatch):
+    tabla = "GENERAL_LTV_ROLLUPS_CLEAN"
+    resultado = cargar_tabla_atomica(conexion, _clean(500, 1), tabla, COLUMNAS, con_rollups=True)
+    assert set(resultado["rollups"]) == set(carga_masiva.ROLLUPS)
+    assert set(ConsultasSQL(tabla).rollups) == set(carga_masiva.ROLLUPS)
+
+    # Si los rollups fallan se publica igual la tabla; los anteriores quedan fuera por desactualizados
+    def falla(*args, **kwargs):
+        raise RuntimeError("sin espacio")
+
+    monkeypatch.setattr(carga_masiva, "_preparar_rollups", falla)
+    resultado = cargar_tabla_atomica(conexion, _clean(300, 2), tabla, COLUMNAS, con_rollups=True)
+    assert resultado["rollups"] is None
+    consultas = ConsultasSQL(tabla)
+    assert consultas.rollups == {}
+    assert consultas.resumen()["total_usd"] == pytest.approx(_clean(300, 2)["usd_total"].sum())
+
+
+def test_rollups_publicados_despues_cambian_la_senal_sql(conexion, monkeypatch):
+    tabla = "GENERAL_LTV_SENAL_CLEAN"
+    monkeypatch.setattr(datos_dashboard, "BACKEND", "sql")
+    monkeypatch.setattr(datos_dashboard, "TABLA_CLEAN", tabla)
+    cargar_tabla_atomica(conexion, _clean(400, 3), tabla, COLUMNAS)
+    sin_rollups = datos_dashboard.senal_cambio()
+    assert ConsultasSQL(tabla).rollups == {}
+
+    reconstruir_rollups(conexion, tabla)
+    assert datos_dashboard.senal_cambio() != sin_rollups
+    assert set(ConsultasSQL(tabla).rollups) == set(carga_masiva.ROLLUPS)
+
+
+@pytest.fixture
+def sqlite(tmp_path):
+    conexion = sqlite3.connect(tmp_path / "carga.db")
+    sentencias = []
+    conexion.set_trace_callback(sentencias.append)
+    yield conexion, sentencias
+    conexion.close()
+
+
+def _filas(conexion, tabla):
+    return pd.read_sql(f"SELECT * FROM {tabla}", conexion)
+
+
+def test_carga_atomica_por_lotes(sqlite):
+    conexion, sentencias = sqlite
+    df = _clean(1_234, 4)
+    resultado = cargar_tabla_atomica(conexion, df, "GENERAL_LTV_LOTES_CLEAN", COLUMNAS, tamano_lote=100)
+
+    inserts = [s for s in sentencias if s.lstrip().startswith("INSERT INTO GENERAL_LTV_LOTES_CLEAN_staging")]
+    assert len(inserts) == 13
+    assert resultado["filas"] == 1_234
+    assert resultado["filas_por_segundo"] == pytest.approx(resultado["filas"] / resultado["segundos"])
+
+    cargada = _filas(conexion, "GENERAL_LTV_LOTES_CLEAN")
+    assert len(cargada) == 1_234
+    assert cargada["usd_total"].sum() == pytest.approx(df["usd_total"].sum())
+    tablas = dict(conexion.execute("SELECT name, type FROM sqlite_master WHERE tbl_name LIKE 'GENERAL_LTV_LOTES%'")
+                  .fetchall())
+    # Los índices viajan con el RENAME; no quedan staging ni tabla anterior
+    assert sum(tipo == "index" for tipo in tablas.values()) == len(carga_masiva.INDICES_CLEAN)
+    assert [n for n, tipo in tablas.items() if tipo == "table"] == ["GENERAL_LTV_LOTES_CLEAN"]
+
+
+def test_carga_atomica_cortada_conserva_la_tabla(sqlite):
+    conexion, _ = sqlite
+    tabla = "GENERAL_LTV_CORTE_CLEAN"
+    anterior = _clean(300, 5)
+    cargar_tabla_atomica(conexion, anterior, tabla, COLUMNAS)
+
+    def bloques():
+        yield _clean(200, 6)
+        raise ConnectionError("se cortó la lectura del origen")
+
+    with pytest.raises(ConnectionError):
+        cargar_tabla_atomica(conexion, bloques(), tabla, COLUMNAS, tamano_lote=50)
+    assert len(_filas(conexion, tabla)) == 300
+    assert _filas(conexion, tabla)["usd_total"].sum() == pytest.approx(anterior["usd_total"].sum())
+
+    # La siguiente carga completa reemplaza la tabla (y el staging que quedó a medias)
+    resultado = cargar_tabla_atomica(conexion, iter([_clean(200, 6), _clean(100, 7)]), tabla, COLUMNAS)
+    assert resultado["filas"] == len(_filas(conexion, tabla)) == 300
@@ -0,0 +1,107 @@
+import os
+import threading
+
+import pytest
+from sqlalchemy import text
+
+import conexion_mysql
+import metricas_ltv
+
+
+def test_sin_password_ni_db_url_falla_con_mensaje_claro(monkeypatch):
+    monkeypatch.setattr(conexion_mysql, "DB_URL", None)
+    monkeypatch.setitem(conexion_mysql.DB_CONFIG, "password", None)
+    with pytest.raises(RuntimeError, match="DB_PASSWORD"):
+        conexion_mysql._url()
+
+
+def test_db_url_tiene_prioridad(monkeypatch):
+    monkeypatch.setitem(conexion_mysql.DB_CONFIG, "password", None)
+    assert str(conexion_mysql._url()).startswith("sqlite:///")
+
+
+@pytest.mark.parametrize("opciones", [{}, {"allow_local_infile": True}])
+def test_crear_conexion_usa_db_url(opciones):
+    # Con opciones del conector MySQL tampoco sale de la base de DB_URL
+    conexion = conexion_mysql.crear_conexion(**opciones)
+    assert conexion is not None
+    try:
+        cursor = conexion.cursor()
+        cursor.execute("SELECT sqlite_version()")
+        assert cursor.fetchone()[0]
+        cursor.close()
+    finally:
+        conexion.close()
+
+
+def test_conexion_db_commit_y_rollback():
+    with conexion_mysql.conexion_db() as conexion:
+        conexion.cursor().execute("CREATE TABLE IF NOT EXISTS prueba_tx (n INTEGER)")
+        conexion.cursor().execute("DELETE FROM prueba_tx")
+    with pytest.raises(ZeroDivisionError):
+        with conexion_mysql.conexion_db() as conexion:
+            conexion.cursor().execute("INSERT INTO prueba_tx VALUES (1)")
+            1 / 0
+    with conexion_mysql.conexion_db() as conexion:
+        conexion.cursor().execute("INSERT INTO prueba_tx VALUES (2)")
+    with conexion_mysql.obtener_engine().connect() as conexion:
+        assert [n for (n,) in conexion.execute(text("SELECT n FROM prueba_tx"))] == [2]
+
+
+def test_estadisticas_del_pool_en_metrics(monkeypatch):
+    monkeypatch.setattr(metricas_ltv, "METRICAS", list(metricas_ltv.METRICAS))
+    antes = conexion_mysql.estadisticas_pool()["checkouts"]
+    for _ in range(3):
+        with conexion_mysql.obtener_engine().connect() as conexion:
+            conexion.execute(text("SELECT 1"))
+
+    estadisticas = conexion_mysql.estadisticas_pool()
+    assert estadisticas["checkouts"] == antes + 3
+    assert estadisticas["en_uso"] == 0
+
+    metricas_ltv.exponer_pool(conexion_mysql.estadisticas_pool)
+    texto = metricas_ltv.texto_prometheus()
+    assert f"ltv_db_checkouts_total {antes + 3}" in texto
+    assert "ltv_db_conexiones_en_uso 0" in texto
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requiere fork")
+def test_worker_forkeado_no_reusa_conexiones_del_master():
+    engine = conexion_mysql.obtener_engine()
+    with engine.connect() as conexion:
+        conexion.execute(text("SELECT 1"))
+    en_el_pool = engine.pool.checkedin()
+    assert en_el_pool >= 1
+
+    pid = os.fork()
+    if pid == 0:
+        codigo = 1
+        try:
+            conexion_mysql.descartar_pool_heredado()
+            heredadas = conexion_mysql.obtener_engine().pool.checkedin()
+            with conexion_mysql.obtener_engine().connect() as conexion:
+                conexion.execute(text("SELECT 1"))
+            codigo = 0 if heredadas == 0 else 2
+        finally:
+            os._exit(codigo)
+
+    _, estado = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(estado) == 0
+    # El master conserva sus conexiones: dispose(close=False) no las cierra desde el hijo
+    assert engine.pool.checkedin() == en_el_pool
+
+
+def test_checkouts_exactos_con_hilos_concurrentes():
+    antes = conexion_mysql.estadisticas_pool()["checkouts"]
+
+    def consultar():
+        for _ in range(200):
+            with conexion_mysql.obtener_engine().connect() as conexion:
+                conexion.execute(text("SELECT 1"))
+
+    hilos = [threading.Thread(target=consultar) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert conexion_mysql.estadisticas_pool()["checkouts"] == antes + 1_600
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cubo_ltv import calcular_ltv, ranking_afiliados, top_n_con_otros
+
+
+@pytest.fixture(scope="module")
+def por_country_affiliate():
+    rng = np.random.default_rng(13)
+    filas = 400
+    df = pd.DataFrame({
+        "country": rng.choice(["Peru", "Brazil", "Mexico"], filas),
+        "affiliate": rng.choice([f"Aff {i:02d}" for i in range(60)], filas),
+        "usd_total": rng.integers(0, 10_000, filas).astype(float),
+        "count_ftd": rng.integers(0, 5, filas).astype(float),
+    }).groupby(["country", "affiliate"], as_index=False).sum()
+    df["general_ltv"] = calcular_ltv(df["usd_total"], df["count_ftd"])
+    return df
+
+
+@pytest.fixture(scope="module")
+def ranking(por_country_affiliate):
+    por_affiliate = por_country_affiliate.groupby("affiliate", as_index=False)[["usd_total", "count_ftd"]].sum()
+    por_affiliate["general_ltv"] = calcular_ltv(por_affiliate["usd_total"], por_affiliate["count_ftd"])
+    return ranking_afiliados(por_affiliate)
+
+
+@pytest.mark.parametrize("n, desde", [(10, 0), (25, 0), (10, 10), (5, 50)])
+@pytest.mark.parametrize("por", [(), ("country",)])
+def test_otros_cuadra_con_el_total(por_country_affiliate, ranking, n, desde, por):
+    df = por_country_affiliate if por else por_country_affiliate.drop(columns="country")
+    resultado, hay_otros = top_n_con_otros(df, ranking, n, desde=desde, por=por)
+    assert hay_otros
+
+    # Los de arriba son los del tramo pedido y Other suma el resto: el total es el de
+    # todo el ranking desde `desde` (los anteriores quedan fuera en el drill-down)
+    incluidos = df[df["affiliate"].isin(ranking[desde:])]
+    visibles = set(resultado["affiliate"]) - {"Other"}
+    assert visibles == set(ranking[desde:desde + n]) & set(df["affiliate"])
+    for columna in ["usd_total", "count_ftd"]:
+        assert resultado[columna].sum() == pytest.approx(incluidos[columna].sum())
+
+    otros = resultado[resultado["affiliate"] == "Other"]
+    resto = incluidos[incluidos["affiliate"].isin(ranking[desde + n:])]
+    assert len(otros) == (len(resto[list(por)].drop_duplicates()) if por else 1)
+    assert otros["usd_total"].sum() == pytest.approx(resto["usd_total"].sum())
+    assert otros["general_ltv"].to_numpy() == pytest.approx(calcular_ltv(otros["usd_total"], otros["count_ftd"]))
+
+
+def test_sin_resto_no_hay_otros(por_country_affiliate, ranking):
+    resultado, hay_otros = top_n_con_otros(por_country_affiliate, ranking, len(ranking))
+    assert not hay_otros
+    assert resultado["usd_total"].sum() == pytest.approx(por_country_affiliate["usd_total"].sum())
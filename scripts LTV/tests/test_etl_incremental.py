@@ -0,0 +1,129 @@
+import uuid
+
+import pandas as pd
+import pytest
+
+import carga_masiva
+import generar_ltv_master_PGY as etl
+from benchmark.generador_raw import generar_raw
+from carga_masiva import ROLLUPS, nombre_rollup, reconstruir_rollups
+from conexion_mysql import crear_conexion, obtener_engine
+from snapshot_ltv import leer_snapshot, metadatos_snapshot, senal_tabla, snapshot_vigente
+
+FILAS_INICIALES = 2_000
+
+
+@pytest.fixture
+def mercado(tmp_path, request):
+    # Una tabla por prueba (y por parámetro)
+    nombre = f"{request.node.originalname.replace('test_', '')[:20]}_{uuid.uuid4().hex[:6]}".upper()
+    mercado = etl.definir_mercado(
+        f"raw_{nombre}", f"GENERAL_LTV_{nombre}_CLEAN", filas_a_saltar=0, nombre=nombre,
+        csv=str(tmp_path / "preview.csv"), snapshot=str(tmp_path / "snapshot.arrow"),
+        marca_agua=str(tmp_path / "marca.json"),
+    )
+    df_raw = generar_raw(3_000, semilla=8)
+    df_raw.iloc[:FILAS_INICIALES].to_sql(mercado["origen"], obtener_engine(), index=False)
+    assert etl.ejecutar_completo(mercado)["cargada"]
+    # Filas nuevas en el origen después de la carga completa
+    df_raw.iloc[FILAS_INICIALES:].to_sql(mercado["origen"], obtener_engine(), index=False, if_exists="append")
+    return mercado
+
+
+def _tabla(destino):
+    with obtener_engine().connect() as conexion:
+        return pd.read_sql(f"SELECT * FROM {destino}", conexion)
+
+
+@pytest.mark.parametrize("refresco_completo", [False, True])
+def test_incremental_refresca_csv_y_snapshot(mercado, monkeypatch, refresco_completo):
+    antes = metadatos_snapshot(mercado["snapshot"])
+    if not refresco_completo:
+        # El snapshot estaba al día: se parchea con el lote, sin releer la tabla destino
+        monkeypatch.setattr(etl, "escribir_snapshot", lambda *a, **k: pytest.fail("releyó la tabla"))
+    resultado = etl.ejecutar_incremental(
+        etl.leer_marca_agua(mercado["marca_agua"]), mercado, refresco_completo=refresco_completo,
+    )
+    assert resultado["cargada"] and resultado["filas"] > 0
+
+    senal = senal_tabla(mercado["destino"])
+    meta = metadatos_snapshot(mercado["snapshot"])
+    assert meta["senal_db"] == list(senal) != antes["senal_db"]
+    assert snapshot_vigente(meta, senal)
+
+    tabla = _tabla(mercado["destino"])
+    assert len(leer_snapshot(mercado["snapshot"])) == len(tabla)
+    assert len(pd.read_csv(mercado["csv"])) == len(tabla)
+    with open(mercado["csv"], encoding="utf-8-sig") as csv:
+        assert "\ufeff" not in csv.read()
+    assert leer_snapshot(mercado["snapshot"])["usd_total"].sum() == pytest.approx(tabla["usd_total"].sum())
+
+
+@pytest.mark.parametrize("refresco_completo", [False, True])
+def test_sin_poder_refrescar_se_borra_el_snapshot(mercado, monkeypatch, refresco_completo):
+    def falla(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(etl, "escribir_snapshot", falla)
+    monkeypatch.setattr(etl, "anexar_snapshot", falla)
+    resultado = etl.ejecutar_incremental(
+        etl.leer_marca_agua(mercado["marca_agua"]), mercado, refresco_completo=refresco_completo,
+    )
+    assert resultado["cargada"]
+    assert metadatos_snapshot(mercado["snapshot"]) is None
+
+
+def test_incremental_igual_a_reconstruccion_completa(mercado, tmp_path):
+    origen = obtener_engine()
+    raw = pd.read_sql(f"SELECT * FROM {mercado['origen']} ORDER BY id", origen)
+    cargadas = raw.iloc[:FILAS_INICIALES]
+    con_miles = cargadas[cargadas["afiliado"].astype(str).str.fullmatch(r"\d{1,3}(,\d{3})+\.\d{2}")].head(40)
+    # Mismo monto con el otro formato: la carga completa conserva ambas filas
+    otro_formato = con_miles.iloc[:20].assign(
+        afiliado=con_miles["afiliado"].iloc[:20].str.translate(str.maketrans(",.", ".,")),
+    )
+    # Repeticiones exactas de filas ya cargadas: la carga completa las descarta
+    extra = pd.concat([otro_formato, con_miles.iloc[20:]], ignore_index=True)
+    extra["id"] = raw["id"].max() + 1 + pd.RangeIndex(len(extra))
+    extra.to_sql(mercado["origen"], origen, index=False, if_exists="append")
+
+    assert etl.ejecutar_incremental(etl.leer_marca_agua(mercado["marca_agua"]), mercado)["cargada"]
+
+    completo = etl.definir_mercado(
+        mercado["origen"], f"{mercado['destino']}_COMPLETO", filas_a_saltar=0,
+        csv=str(tmp_path / "completo.csv"), snapshot=str(tmp_path / "completo.arrow"),
+        marca_agua=str(tmp_path / "completo.json"),
+    )
+    assert etl.ejecutar_completo(completo)["cargada"]
+
+    incremental, reconstruida = _tabla(mercado["destino"]), _tabla(completo["destino"])
+    assert len(incremental) == len(reconstruida)
+    orden = list(reconstruida.columns)
+    pd.testing.assert_frame_equal(
+        incremental.sort_values(orden).reset_index(drop=True),
+        reconstruida.sort_values(orden).reset_index(drop=True),
+    )
+
+
+def _rollups(tabla):
+    with obtener_engine().connect() as conexion:
+        return {
+            nivel: _ordenado(pd.read_sql(f"SELECT * FROM {nombre_rollup(tabla, nivel)}", conexion))
+            for nivel in ROLLUPS
+        }
+
+
+def _ordenado(df):
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_rollups_incrementales_iguales_a_reconstruirlos(mercado, monkeypatch):
+    monkeypatch.setattr(carga_masiva, "reconstruir_rollups", lambda *a: pytest.fail("reconstruyó los rollups"))
+    assert etl.ejecutar_incremental(etl.leer_marca_agua(mercado["marca_agua"]), mercado)["cargada"]
+    parcheados = _rollups(mercado["destino"])
+
+    conexion = crear_conexion()
+    reconstruir_rollups(conexion, mercado["destino"])
+    conexion.close()
+    for nivel, rollup in _rollups(mercado["destino"]).items():
+        pd.testing.assert_frame_equal(parcheados[nivel], rollup, check_dtype=False)
@@ -0,0 +1,63 @@
+import io
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from flask import Flask
+
+from cubo_ltv import CuboLTV
+from exportar_detalle import registrar_exportacion
+
+
+@pytest.fixture
+def cliente():
+    df = pd.DataFrame({
+        "date": pd.to_datetime(["2024-03-01", "2024-03-02", "2024-03-20"]),
+        "country": ["Peru", "Brazil", "Peru"],
+        "affiliate": ["Aff 1", "Aff 2", "Aff 1"],
+        "source": ["Meta", "Google", "Meta"],
+        "usd_total": [10.0, 20.5, 5.0],
+        "count_ftd": [1.0, 0.0, 1.0],
+        "general_ltv": [0.0, 0.0, 0.0],
+    })
+    cubo = CuboLTV(df)
+    ds = SimpleNamespace(fecha_min=df["date"].min(), fecha_max=df["date"].max())
+    datos = SimpleNamespace(actual=lambda: ds)
+
+    def calcular_detalle(ds, start, end, affiliates, sources, countries):
+        return cubo.detalle_filtrado(start, end, affiliates, sources, countries)
+
+    app = Flask(__name__)
+    registrar_exportacion(app, datos, calcular_detalle)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("consulta", [
+    "start_date=2024-13-01&end_date=2024-03-31",
+    "start_date=2024-03-01&end_date=nada",
+    "start_date=NaT&end_date=2024-03-31",
+    "start_date=2024-03-01T00:00:00%2B03:00&end_date=2024-03-31",
+    'start_date=2024-03-01"&end_date=2024-03-31',
+])
+@pytest.mark.parametrize("formato", ["csv", "parquet"])
+def test_fechas_invalidas_devuelven_400(cliente, formato, consulta):
+    respuesta = cliente.get(f"/export/detalle.{formato}?{consulta}")
+    assert respuesta.status_code == 400
+
+
+def test_csv_del_rango_pedido(cliente):
+    respuesta = cliente.get("/export/detalle.csv?start_date=2024-03-01T00:00:00&end_date=2024-03-05&country=Peru")
+    assert respuesta.status_code == 200
+    assert 'filename="general_ltv_detalle_2024-03-01_2024-03-05.csv"' in respuesta.headers["Content-Disposition"]
+    df = pd.read_csv(io.StringIO(respuesta.get_data(as_text=True)))
+    assert df[["date", "country", "usd_total"]].values.tolist() == [["2024-03-01", "Peru", 10.0]]
+
+
+def test_parquet_sin_rango_exporta_todo(cliente):
+    respuesta = cliente.get("/export/detalle.parquet")
+    assert respuesta.status_code == 200
+    assert pd.read_parquet(io.BytesIO(respuesta.get_data()))["usd_total"].sum() == pytest.approx(35.5)
+
+
+def test_formato_desconocido_404(cliente):
+    assert cliente.get("/export/detalle.xlsx").status_code == 404
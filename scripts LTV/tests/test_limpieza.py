@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import generar_ltv_master_PGY as etl
+from benchmark.generador_raw import generar_raw
+from limpieza_montos import limpiar_monto
+
+
+def limpiar_fila_a_fila(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """limpiar_general_ltv original (apply por fila): la referencia de la versión vectorizada."""
+    df = df_raw.drop(columns=[c for c in ["id", "fecha_registro", "general_ltv"] if c in df_raw.columns])
+    df = df.rename(columns={
+        "pais": "country_affiliate",
+        "fecha": "date",
+        "afiliado": "total_amount",
+        "usd_total": "ftds",
+        "count_ftd": "general_ltv_raw",
+    })
+    if len(df) > etl.ROWS_TO_SKIP:
+        df = df.iloc[etl.ROWS_TO_SKIP:].reset_index(drop=True)
+
+    df["country_affiliate"] = df["country_affiliate"].astype(str).str.strip()
+    df["tipo"] = df["country_affiliate"].apply(lambda v: "PAIS" if v in etl.POSSIBLE_COUNTRIES else "AFILIADO")
+    df["PaisTemp"] = df.apply(lambda r: r["country_affiliate"] if r["tipo"] == "PAIS" else pd.NA, axis=1)
+    df["PaisTemp"] = df["PaisTemp"].ffill()
+    df["affiliate"] = df.apply(lambda r: r["country_affiliate"] if r["tipo"] == "AFILIADO" else pd.NA, axis=1)
+
+    df["country"] = df["PaisTemp"]
+    df.loc[df["country"].isna() & df["affiliate"].isin(etl.POSSIBLE_COUNTRIES), "country"] = df["affiliate"]
+    df.loc[df["affiliate"].isin(etl.POSSIBLE_COUNTRIES), "affiliate"] = pd.NA
+
+    up_aff = df["affiliate"].astype(str).str.strip().str.upper()
+    up_country_aff = df["country_affiliate"].astype(str).str.strip().str.upper()
+    df = df[
+        (~df["affiliate"].isna()) &
+        (up_aff != "TOTAL GENERAL") &
+        (up_country_aff != "TOTAL GENERAL") &
+        (~df["affiliate"].isin(etl.POSSIBLE_COUNTRIES))
+    ].copy()
+
+    df["date_str"] = df["date"].astype(str)
+    df["total_amount_str"] = df["total_amount"].astype(str)
+    df = df.drop_duplicates(subset=etl.CLAVES_DEDUPE).reset_index(drop=True)
+
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df = df[df["date"].notna()].copy()
+    df["usd_total"] = df["total_amount"].apply(limpiar_monto)
+    df["count_ftd"] = pd.to_numeric(df["ftds"], errors="coerce").fillna(0).astype(float)
+    df["general_ltv"] = pd.to_numeric(df["general_ltv_raw"], errors="coerce").fillna(0.0)
+    df["general_ltv"] = df.apply(
+        lambda r: (r["usd_total"] / r["count_ftd"]) if r["count_ftd"] not in (0, None) else r["general_ltv"],
+        axis=1,
+    ).fillna(0.0)
+
+    df["country"] = df["country"].astype(str).str.strip().str.title()
+    df["affiliate"] = df["affiliate"].astype(str).str.strip().str.title()
+    df = df[["date", "country", "affiliate", "usd_total", "count_ftd", "general_ltv"]].copy()
+    return df.sort_values("date").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("filas, semilla", [(500, 0), (5_000, 1), (20_000, 2)])
+def test_limpieza_vectorizada_igual_a_fila_a_fila(filas, semilla):
+    # 500 filas: menos que ROWS_TO_SKIP, sin skip
+    df_raw = generar_raw(filas, semilla)
+    assert_frame_equal(etl.limpiar_general_ltv(df_raw), limpiar_fila_a_fila(df_raw))
+
+
+def test_clasificar_filas_arrastra_el_pais_del_lote_anterior():
+    df_raw = generar_raw(3_000, 3)
+    corte = 2_000
+    df_raw.loc[corte, "pais"] = "aff 999"  # la primera fila del segundo tramo no es encabezado
+
+    completo = etl.clasificar_filas(df_raw, 0)
+    primero = etl.clasificar_filas(df_raw.iloc[:corte], 0)
+    paises = df_raw["pais"].iloc[:corte]
+    pais_previo = paises[paises.isin(etl.POSSIBLE_COUNTRIES)].iloc[-1]
+    segundo = etl.clasificar_filas(df_raw.iloc[corte:].reset_index(drop=True), 0, pais_inicial=pais_previo)
+
+    unidos = pd.concat([primero, segundo], ignore_index=True)
+    assert_frame_equal(unidos, completo.reset_index(drop=True))
@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import generar_ltv_master_PGY as etl
+from benchmark.generador_raw import generar_raw
+
+FILAS = 12_000
+
+
+@pytest.fixture(scope="module")
+def df_raw():
+    return generar_raw(FILAS, semilla=4)
+
+
+@pytest.fixture(scope="module")
+def en_memoria(df_raw):
+    return etl.limpiar_general_ltv(df_raw)
+
+
+def _canonico(df):
+    # El streaming no ordena por fecha: se comparan las mismas filas en un orden fijo
+    return df.sort_values(list(df.columns), kind="mergesort").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("tamano", [
+    500,                        # el skip cruza tres bloques
+    1_000,                      # el skip termina a mitad del segundo bloque
+    etl.ROWS_TO_SKIP,           # el skip ocupa exactamente el primer bloque
+    etl.ROWS_TO_SKIP + 1,       # el primer bloque deja una sola fila
+    4_096,
+    FILAS,                      # un único bloque
+])
+def test_por_bloques_igual_a_en_memoria(df_raw, en_memoria, tamano):
+    bloques = (df_raw.iloc[i:i + tamano] for i in range(0, len(df_raw), tamano))
+    estado = {}
+    por_bloques = pd.concat(list(etl.limpiar_por_bloques(bloques, estado=estado)), ignore_index=True)
+
+    assert_frame_equal(_canonico(por_bloques), _canonico(en_memoria))
+    assert estado["filas_leidas"] == FILAS
+    assert estado["filas_limpias"] == len(en_memoria)
+    assert estado["marca"] == etl.calcular_marca_agua(df_raw, filas_saltadas=etl.ROWS_TO_SKIP)
+
+
+def test_dataset_mas_corto_que_el_skip():
+    df_raw = generar_raw(800, semilla=5)
+    bloques = (df_raw.iloc[i:i + 300] for i in range(0, len(df_raw), 300))
+    por_bloques = pd.concat(list(etl.limpiar_por_bloques(bloques)), ignore_index=True)
+    assert_frame_equal(_canonico(por_bloques), _canonico(etl.limpiar_general_ltv(df_raw)))
+
+
+def test_duplicados_entre_bloques_se_emiten_una_vez():
+    df_raw = generar_raw(3_000, semilla=6)
+    # La segunda mitad repite la primera (mismo texto de fecha, país/afiliado y monto)
+    repetido = pd.concat([df_raw, df_raw.iloc[etl.ROWS_TO_SKIP:]], ignore_index=True)
+    bloques = (repetido.iloc[i:i + 700] for i in range(0, len(repetido), 700))
+    por_bloques = pd.concat(list(etl.limpiar_por_bloques(bloques)), ignore_index=True)
+    assert len(por_bloques) == len(etl.limpiar_general_ltv(repetido)) == len(etl.limpiar_general_ltv(df_raw))
+
+
+def test_lectura_por_paginas_de_id(monkeypatch):
+    from conexion_mysql import obtener_engine
+
+    df_raw = generar_raw(2_500, semilla=9)
+    df_raw.to_sql("raw_paginas", obtener_engine(), index=False)
+    leidas = []
+    read_sql = pd.read_sql
+
+    def read_sql_contado(*args, **kwargs):
+        # Cada consulta devuelve un DataFrame ya materializado: nunca más de un bloque
+        assert "chunksize" not in kwargs
+        resultado = read_sql(*args, **kwargs)
+        leidas.append(len(resultado))
+        return resultado
+
+    monkeypatch.setattr(etl.pd, "read_sql", read_sql_contado)
+    bloques = list(etl.leer_tabla_por_bloques(1_000, "raw_paginas"))
+
+    assert leidas == [1_000, 1_000, 500]
+    leido = pd.concat(bloques, ignore_index=True)
+    assert leido["id"].tolist() == df_raw["id"].tolist()
+    assert leido["pais"].tolist() == df_raw["pais"].tolist()
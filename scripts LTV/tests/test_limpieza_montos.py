@@ -0,0 +1,59 @@
+import random
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from limpieza_montos import limpiar_monto, parse_amounts
+
+# Dígitos ASCII (más probables), separadores, símbolos y dígitos no ASCII (árabe, fullwidth, devanagari, superíndice)
+CARACTERES = list("0123456789") * 3 + list(",.,.-  $€+E\ta") + ["٣", "５", "१", "²"]
+DECIMALES = ["1234.50", "-0.01", "1E+3", "0", "10", "1.0", "12345678.9", "NaN"]
+
+
+def valor_al_azar(rng: random.Random):
+    k = rng.random()
+    if k < 0.05:
+        return None
+    if k < 0.10:
+        return float("nan")
+    if k < 0.13:
+        return pd.NA
+    if k < 0.25:
+        return Decimal(rng.choice(DECIMALES))
+    if k < 0.35:
+        return rng.choice([rng.randint(-10**6, 10**6), round(rng.uniform(-1e5, 1e5), rng.randint(0, 3)),
+                           1000, 1, 1e20, -0.0, True])
+    return "".join(rng.choice(CARACTERES) for _ in range(rng.randint(0, 12)))
+
+
+@pytest.mark.parametrize("semilla", range(50))
+def test_parse_amounts_igual_a_limpiar_monto(semilla):
+    rng = random.Random(semilla)
+    corpus = [valor_al_azar(rng) for _ in range(400)]
+    # Repetidos: cada texto distinto se parsea una vez y se reparte a sus filas
+    corpus += rng.sample(corpus, 100)
+
+    esperado = np.array([limpiar_monto(v) for v in corpus])
+    obtenido = parse_amounts(pd.Series(corpus, dtype=object))
+    np.testing.assert_array_equal(obtenido.to_numpy(), esperado)
+
+
+@pytest.mark.parametrize("corpus", [
+    [1000, Decimal("1E+3")],
+    [Decimal("1E+3"), 1000],
+    [1, True],
+    ["1.234,56", "1,234.56", "1234,56", "1,234", "1.234.567", "$ 12", "", "  "],
+])
+def test_valores_iguales_con_distinto_texto(corpus):
+    esperado = [limpiar_monto(v) for v in corpus]
+    assert parse_amounts(pd.Series(corpus, dtype=object)).tolist() == esperado
+
+
+def test_conserva_indice_y_nombre():
+    serie = pd.Series(["1,50", None], index=[10, 20], name="total_amount")
+    resultado = parse_amounts(serie)
+    assert resultado.index.tolist() == [10, 20]
+    assert resultado.name == "total_amount"
+    assert resultado.tolist() == [1.5, 0.0]
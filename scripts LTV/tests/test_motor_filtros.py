@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from motor_filtros import MotorFiltros
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(11)
+    filas = 5_000
+    df = pd.DataFrame({
+        # Desordenado a propósito: el motor ordena por fecha
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 120, filas), unit="D"),
+        "country": rng.choice(["Peru", "Brazil", "Mexico"], filas),
+        "affiliate": rng.choice([f"aff {i}" for i in range(20)], filas).astype(object),
+        "source": rng.choice(["Meta", "Google", "Email"], filas),
+        "usd_total": rng.integers(0, 1_000, filas).astype(float),
+        "count_ftd": rng.integers(0, 3, filas).astype(float),
+    })
+    df.loc[rng.random(filas) < 0.02, "affiliate"] = None
+    return df
+
+
+@pytest.fixture(scope="module")
+def motor(df):
+    return MotorFiltros(df)
+
+
+def _referencia(df, start=None, end=None, affiliates=None, sources=None, countries=None):
+    mascara = pd.Series(True, index=df.index)
+    if start and end:
+        mascara &= (df["date"] >= pd.to_datetime(start)) & (df["date"] <= pd.to_datetime(end))
+    for columna, valores in [("affiliate", affiliates), ("source", sources), ("country", countries)]:
+        if valores:
+            mascara &= df[columna].isin(valores)
+    return df[mascara].sort_values("date", kind="stable").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("start, end", [
+    (None, None), ("2024-02-01", "2024-02-29"), ("2024-01-15", "2024-01-15"),
+    ("2024-03-10", "2024-01-01"), ("2023-01-01", "2023-12-31"),
+])
+@pytest.mark.parametrize("filtros", [
+    {},
+    {"affiliates": ["aff 3"]},
+    {"affiliates": ["aff 1", "aff 7", "no existe"], "countries": ["Peru"]},
+    {"sources": ["Meta", "Email"], "countries": ["Brazil", "Mexico"], "affiliates": ["aff 2", "aff 9"]},
+    {"affiliates": ["no existe"]},
+    {"countries": []},
+])
+def test_filtrar_igual_a_indexado_booleano(df, motor, start, end, filtros):
+    filtrado = motor.filtrar(start, end, **filtros).reset_index(drop=True)
+    assert_frame_equal(filtrado, _referencia(df, start, end, **filtros))
+
+
+def test_solo_fechas_devuelve_vista_contigua(motor):
+    filtrado = motor.filtrar("2024-02-01", "2024-02-29")
+    assert np.shares_memory(filtrado["usd_total"].to_numpy(), motor.df["usd_total"].to_numpy())
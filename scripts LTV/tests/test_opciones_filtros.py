@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from motor_filtros import MotorFiltros
+from opciones_filtros import DIMENSIONES, IndiceOpciones
+
+ELEGIDOS = {"affiliate": "affiliates", "source": "sources", "country": "countries"}
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(14)
+    filas = 4_000
+    df = pd.DataFrame({
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 180, filas), unit="D"),
+        "country": rng.choice(["Peru", "Brazil", "Mexico", "Chile"], filas),
+        "affiliate": rng.choice([f"aff {i}" for i in range(80)], filas).astype(object),
+        "source": rng.choice(["Meta", "Google", "Email", "Tiktok"], filas),
+    })
+    df.loc[rng.random(filas) < 0.02, "affiliate"] = None
+    return df
+
+
+@pytest.fixture(scope="module", params=["motor", "frame"])
+def indice(request, df):
+    if request.param == "motor":
+        return IndiceOpciones.desde_motor(MotorFiltros(df))
+    return IndiceOpciones.desde_frame(df)
+
+
+def _referencia(df, start, end, **filtros):
+    """unique() de cada dimensión en el frame filtrado por las otras dimensiones."""
+    df = df.dropna(subset=DIMENSIONES)
+    if start and end:
+        df = df[(df["date"] >= pd.to_datetime(start)) & (df["date"] <= pd.to_datetime(end))]
+    resultado = {}
+    for dim in DIMENSIONES:
+        mascara = pd.Series(True, index=df.index)
+        for otra, parametro in ELEGIDOS.items():
+            if otra != dim and filtros.get(parametro):
+                mascara &= df[otra].isin(filtros[parametro])
+        resultado[dim] = sorted(df.loc[mascara, dim].unique())
+    return resultado
+
+
+FILTROS = [
+    {},
+    {"countries": ["Peru"]},
+    {"countries": ["Peru", "Chile"], "sources": ["Meta"]},
+    {"affiliates": ["aff 1", "aff 2", "no existe"], "sources": ["Email", "Google"]},
+    {"affiliates": ["no existe"]},
+]
+
+
+@pytest.mark.parametrize("start, end", [(None, None), ("2024-02-01", "2024-03-31"), ("2024-06-01", "2024-06-30")])
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_meses_completos_igual_a_unique_del_frame_filtrado(df, indice, start, end, filtros):
+    assert indice.opciones(start, end, **filtros) == _referencia(df, start, end, **filtros)
+
+
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_rango_a_mitad_de_mes_nunca_omite_valores(df, indice, filtros):
+    # Se resuelve por mes completo: incluye lo del rango exacto y no más que sus meses
+    opciones = indice.opciones("2024-02-10", "2024-03-05", **filtros)
+    exacto = _referencia(df, "2024-02-10", "2024-03-05", **filtros)
+    meses = _referencia(df, "2024-02-01", "2024-03-31", **filtros)
+    for dim in DIMENSIONES:
+        assert set(exacto[dim]) <= set(opciones[dim]) <= set(meses[dim])
@@ -0,0 +1,129 @@
+import gzip
+import json
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify, request
+
+import respuestas_http
+from cache_resultados import SingleFlight
+
+HILOS = 8
+
+
+def _en_paralelo(funcion, hilos=HILOS):
+    resultados, errores = [None] * hilos, []
+
+    def correr(i):
+        try:
+            resultados[i] = funcion()
+        except Exception as e:
+            errores.append(e)
+
+    threads = [threading.Thread(target=correr, args=(i,)) for i in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return resultados, errores
+
+
+def _esperar(condicion, segundos=5):
+    limite = time.monotonic() + segundos
+    while not condicion():
+        assert time.monotonic() < limite, "timeout"
+        time.sleep(0.005)
+
+
+def test_llamadas_identicas_concurrentes_corren_una_vez():
+    vuelo = SingleFlight()
+    llamadas = []
+    soltar = threading.Event()
+
+    def calcular():
+        llamadas.append(1)
+        soltar.wait(5)
+        return {"total": 42}
+
+    # El primero queda calculando hasta que los demás están esperando su resultado
+    threading.Thread(target=lambda: _esperar(lambda: vuelo.coalescidos == HILOS - 1) or soltar.set()).start()
+    resultados, errores = _en_paralelo(lambda: vuelo.ejecutar("clave", calcular))
+
+    assert not errores
+    assert len(llamadas) == 1
+    assert resultados == [{"total": 42}] * HILOS
+    # Terminado el vuelo la clave se libera: la próxima llamada vuelve a calcular
+    assert vuelo.ejecutar("clave", lambda: "otra vez") == "otra vez"
+
+
+def test_el_error_del_lider_llega_a_todos():
+    vuelo = SingleFlight()
+    soltar = threading.Event()
+
+    def falla():
+        soltar.wait(5)
+        raise ValueError("sin base")
+
+    threading.Thread(target=lambda: _esperar(lambda: vuelo.coalescidos == HILOS - 1) or soltar.set()).start()
+    _, errores = _en_paralelo(lambda: vuelo.ejecutar("clave", falla))
+    assert len(errores) == HILOS and all(isinstance(e, ValueError) for e in errores)
+
+
+def test_callbacks_identicos_coalescidos(monkeypatch):
+    monkeypatch.setattr(respuestas_http, "CALLBACKS_EN_CURSO", SingleFlight())
+    app = Flask(__name__)
+    llamadas = []
+    soltar = threading.Event()
+
+    @app.route("/_dash-update-component", methods=["POST"])
+    def callback():
+        llamadas.append(request.get_json())
+        soltar.wait(5)
+        return jsonify(respuesta=request.get_json()["x"])
+
+    respuestas_http.coalescer_callbacks(app)
+    cliente = app.test_client()
+    vuelo = respuestas_http.CALLBACKS_EN_CURSO
+    threading.Thread(target=lambda: _esperar(lambda: vuelo.coalescidos == HILOS - 1) or soltar.set()).start()
+    respuestas, errores = _en_paralelo(lambda: cliente.post("/_dash-update-component", json={"x": 1}))
+
+    assert not errores and len(llamadas) == 1
+    assert [r.get_json() for r in respuestas] == [{"respuesta": 1}] * HILOS
+    # Un cuerpo distinto no espera al anterior
+    assert cliente.post("/_dash-update-component", json={"x": 2}).get_json() == {"respuesta": 2}
+
+
+@pytest.fixture
+def cliente_comprimido(monkeypatch):
+    monkeypatch.setattr(respuestas_http, "brotli", None)
+    app = Flask(__name__)
+    cuerpo = {"filas": [{"affiliate": f"Aff {i}", "usd_total": i * 1.5} for i in range(500)]}
+
+    @app.route("/grande")
+    def grande():
+        return jsonify(cuerpo)
+
+    @app.route("/chico")
+    def chico():
+        return jsonify(ok=True)
+
+    respuestas_http.comprimir_respuestas(app, minimo=1024)
+    return app.test_client(), cuerpo
+
+
+def test_gzip_solo_si_el_cliente_lo_acepta(cliente_comprimido):
+    cliente, cuerpo = cliente_comprimido
+
+    comprimida = cliente.get("/grande", headers={"Accept-Encoding": "gzip, deflate"})
+    assert comprimida.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in comprimida.headers["Vary"]
+    assert json.loads(gzip.decompress(comprimida.get_data())) == cuerpo
+
+    for encabezados in [{}, {"Accept-Encoding": "identity"}, {"Accept-Encoding": "gzip;q=0"}]:
+        plana = cliente.get("/grande", headers=encabezados)
+        assert "Content-Encoding" not in plana.headers
+        assert plana.get_json() == cuerpo
+
+    chica = cliente.get("/chico", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in chica.headers
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import snapshot_ltv
+from snapshot_ltv import EscritorSnapshot, escribir_snapshot, leer_snapshot, metadatos_snapshot, snapshot_vigente
+
+SENAL = ("sql", 100, "2024-03-31 00:00:00")
+SENAL_NUEVA = ("sql", 120, "2024-04-02 00:00:00")
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "date": pd.to_datetime(["2024-03-01", "2024-03-02"]),
+        "country": ["Peru", "Brazil"],
+        "affiliate": ["Aff 1", "Aff 2"],
+        "usd_total": [10.0, 20.5],
+        "count_ftd": [1.0, 0.0],
+        "general_ltv": [10.0, 0.0],
+    })
+
+
+def _meta(ruta, df, **senales):
+    escribir_snapshot(df, ruta=str(ruta), **senales)
+    return metadatos_snapshot(str(ruta))
+
+
+def test_ida_y_vuelta(tmp_path, df):
+    escribir_snapshot(df, ruta=str(tmp_path / "s.arrow"), senal_db=SENAL)
+    assert_frame_equal(leer_snapshot(str(tmp_path / "s.arrow")), df)
+
+
+def test_sellado_con_la_tabla(tmp_path, df):
+    meta = _meta(tmp_path / "s.arrow", df, senal_db=SENAL)
+    assert snapshot_vigente(meta, SENAL)
+    assert not snapshot_vigente(meta, SENAL_NUEVA)
+    # Base caída: la copia local es lo más nuevo que hay
+    assert snapshot_vigente(meta, None)
+
+
+def test_sin_carga_vale_mientras_la_tabla_no_cambie(tmp_path, df):
+    meta = _meta(tmp_path / "s.arrow", df, senal_previa=SENAL)
+    assert meta["senal_db"] is None
+    assert snapshot_vigente(meta, SENAL)
+    assert not snapshot_vigente(meta, SENAL_NUEVA)
+
+
+def test_sin_senal_alguna_vence_por_tiempo(tmp_path, df):
+    meta = _meta(tmp_path / "s.arrow", df)
+    plazo = snapshot_ltv.SIN_SENAL_HORAS * 3600
+    assert snapshot_vigente(meta, SENAL, ahora=meta["escrito"] + plazo - 1)
+    assert not snapshot_vigente(meta, SENAL, ahora=meta["escrito"] + plazo + 1)
+
+
+def test_escritor_por_bloques_sella_al_cerrar(tmp_path, df):
+    ruta = str(tmp_path / "s.arrow")
+    escritor = EscritorSnapshot(ruta)
+    escritor.escribir(df.iloc[:1])
+    escritor.escribir(df.iloc[1:])
+    escritor.cerrar(senal_previa=SENAL)
+
+    assert_frame_equal(leer_snapshot(ruta), df)
+    meta = metadatos_snapshot(ruta)
+    assert (meta["senal_db"], meta["senal_previa"]) == (None, list(SENAL))
@@ -0,0 +1,65 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tabla_detalle import pagina_tabla, registros_tabla
+
+
+@pytest.fixture(scope="module")
+def detalle():
+    rng = np.random.default_rng(12)
+    filas = 1_003
+    df = pd.DataFrame({
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 60, filas), unit="D"),
+        "country": pd.Categorical(rng.choice(["Peru", "Brazil", "Mexico"], filas)),
+        "affiliate": rng.choice([f"Aff {i}" for i in range(30)], filas),
+        "usd_total": rng.integers(0, 500, filas) + 0.25,
+        "count_ftd": rng.integers(0, 4, filas).astype(float),
+    })
+    df["general_ltv"] = (df["usd_total"] / df["count_ftd"].where(df["count_ftd"] > 0)).fillna(0.0)
+    return df.sort_values(["date", "country", "affiliate"]).reset_index(drop=True)
+
+
+def _pagina(df, pagina, tamano):
+    return registros_tabla(df.iloc[pagina * tamano:(pagina + 1) * tamano])
+
+
+@pytest.mark.parametrize("sort_by", [
+    None,
+    [{"column_id": "usd_total", "direction": "desc"}],
+    [{"column_id": "country", "direction": "asc"}, {"column_id": "count_ftd", "direction": "desc"}],
+    [{"column_id": "no_existe", "direction": "asc"}],
+])
+@pytest.mark.parametrize("pagina, tamano", [(0, 15), (7, 15), (66, 15), (3, 100), (0, 2_000)])
+def test_pagina_igual_a_sort_values_e_iloc(detalle, sort_by, pagina, tamano):
+    columnas = [s for s in sort_by or [] if s["column_id"] in detalle.columns]
+    referencia = detalle.sort_values(
+        [s["column_id"] for s in columnas], ascending=[s["direction"] == "asc" for s in columnas], kind="stable",
+    ) if columnas else detalle
+
+    registros, total, paginas, efectiva = pagina_tabla(detalle, pagina, tamano, sort_by)
+    assert (total, paginas, efectiva) == (len(detalle), math.ceil(len(detalle) / tamano), pagina)
+    assert registros == _pagina(referencia, pagina, tamano)
+
+
+def test_pagina_fuera_de_rango_va_a_la_ultima(detalle):
+    registros, total, paginas, efectiva = pagina_tabla(detalle, 10_000, 15)
+    assert efectiva == paginas - 1 == 66
+    assert registros == _pagina(detalle, 66, 15) and len(registros) == total % 15
+
+
+@pytest.mark.parametrize("filter_query, mascara", [
+    ("{country} eq 'Peru'", lambda df: df["country"] == "Peru"),
+    ("{usd_total} ge 250", lambda df: df["usd_total"] >= 250),
+    ("{affiliate} contains 'aff 1' && {count_ftd} gt 1",
+     lambda df: df["affiliate"].str.contains("aff 1", case=False) & (df["count_ftd"] > 1)),
+    ("{date} datestartswith '2024-02'", lambda df: df["date"].dt.strftime("%Y-%m").eq("2024-02")),
+])
+def test_filtro_igual_a_mascara(detalle, filter_query, mascara):
+    sort_by = [{"column_id": "usd_total", "direction": "asc"}]
+    esperado = detalle[mascara(detalle)].sort_values("usd_total", kind="stable")
+    registros, total, _, _ = pagina_tabla(detalle, 1, 20, sort_by, filter_query)
+    assert total == len(esperado)
+    assert registros == _pagina(esperado, 1, 20)